@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+
+RANKINGS = ('frequency', 'confidence')
+
+
+def sample_matrix(rows, min_width=0):
+    """
+    matrix, present = sample_matrix(rows, min_width)
+
+    (len(rows), longest row or min_width) object array of ragged rows (e.g.
+    the sampled answers of each question), padded with None, and the
+    boolean mask of the real entries.
+    """
+    lengths = np.array([len(row) for row in rows], dtype=np.int64)
+    present = np.arange(max(lengths.max(initial=0), min_width)) < lengths[:, None]
+    matrix = np.full(present.shape, None, dtype=object)
+    # fromiter keeps entries that are themselves lists as single objects
+    matrix[present] = np.fromiter((x for row in rows for x in row), dtype=object, count=int(lengths.sum()))
+    return matrix, present
+
+
+def vote(answers, confidences=None, present=None, rank_by='frequency'):
+    """
+    winners, agreement, mean_confidence = vote(answers, confidences, present, rank_by)
+
+    Aggregates the sampled answers of many questions at once.
+
+    INPUTS
+    answers:     (items x samples) array of answers; any hashable values,
+                 compared as Python objects (so True and 1 are one answer,
+                 as in a dict or Counter)
+    confidences: (items x samples) float array of the confidence of each
+                 sample, or None
+    present:     (items x samples) boolean mask of the samples to use
+                 (default: all); items without samples get no winner
+    rank_by:     'frequency'  --> the winner is the most frequent answer
+                 'confidence' --> the winner is the answer with the highest
+                                  mean confidence over its samples
+
+    Ties are broken deterministically. With rank_by = 'frequency', equally
+    frequent answers are decided by the first sample in which they appear.
+    With rank_by = 'confidence', equal mean confidences are decided first
+    by frequency, then by the first sample. Ties are exact float equality
+    of the means, which are summed in sample order.
+
+    OUTPUTS
+    winners:         object array (items,) of the winning answers (None for
+                     items without samples)
+    agreement:       share of the item's samples that gave the winner (NaN
+                     for items without samples)
+    mean_confidence: mean confidence of the winner's samples (NaN without
+                     confidences or samples)
+
+    Answers are factorized to integer codes once. Counts, confidence sums
+    and first occurrences then come from one np.unique / np.bincount
+    group-by over (item, answer code) pairs, with no Python loop over items.
+    """
+    if rank_by not in RANKINGS:
+        raise ValueError(f"rank_by must be one of {RANKINGS}, not {rank_by!r}")
+    answers = np.asarray(answers, dtype=object)
+    n_items = answers.shape[0]
+    if present is None:
+        present = np.ones(answers.shape, dtype=bool)
+    if rank_by == 'confidence' and confidences is None:
+        raise ValueError("rank_by = 'confidence' needs confidences")
+
+    winners = np.full(n_items, None, dtype=object)
+    agreement = np.full(n_items, np.nan)
+    mean_confidence = np.full(n_items, np.nan)
+    # samples in row-major order, so within an item they keep their order
+    item, sample = np.nonzero(present)
+    if len(item) == 0:
+        return winners, agreement, mean_confidence
+    codes, uniques = pd.factorize(answers[item, sample], use_na_sentinel=False)
+
+    # group-by (item, answer code)
+    groups, first, inverse, counts = np.unique(item * len(uniques) + codes, return_index=True,
+                                               return_inverse=True, return_counts=True)
+    group_item, group_code = groups // len(uniques), groups % len(uniques)
+    first_sample = sample[first]
+    if confidences is not None:
+        sums = np.bincount(inverse, weights=np.asarray(confidences, dtype=float)[item, sample], minlength=len(groups))
+        means = sums / counts
+    else:
+        means = np.full(len(groups), np.nan)
+
+    # best group of each item first; np.lexsort sorts by its last key first
+    if rank_by == 'frequency':
+        order = np.lexsort((first_sample, -counts, group_item))
+    else:
+        order = np.lexsort((first_sample, -counts, -means, group_item))
+    best = order[np.r_[True, group_item[order][1:] != group_item[order][:-1]]]
+
+    items = group_item[best]
+    winners[items] = uniques[group_code[best]]
+    agreement[items] = counts[best] / np.bincount(item, minlength=n_items)[items]
+    mean_confidence[items] = means[best]
+    return winners, agreement, mean_confidence
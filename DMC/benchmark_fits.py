@@ -0,0 +1,192 @@
+import io
+import json
+import time
+import argparse
+import warnings
+import contextlib
+import numpy as np
+from meta_d_prime import Meta_d_prime
+from power_analysis import model_probabilities, simulate_count_tables
+
+
+def random_parameters(rng, nRatings):
+    # true parameters of one simulated observer: d', meta-d' (at most d',
+    # the upper bound of the fit), type 1 criterion c and the type 2
+    # criteria, as offsets from the type 1 criterion of the meta-d' model.
+    # the type 2 criteria span about the same range whatever the number of
+    # ratings
+    d = rng.uniform(0.5, 2.5)
+    meta_d = d * rng.uniform(0.4, 1.0)
+    c = rng.uniform(-0.3, 0.3)
+    spacing = 2.5 / max(nRatings - 1, 1)
+    t2c_rS1 = -np.cumsum(spacing * rng.uniform(0.6, 1.4, nRatings-1))[::-1]
+    t2c_rS2 = np.cumsum(spacing * rng.uniform(0.6, 1.4, nRatings-1))
+    return {'d': d, 'meta_d': meta_d, 'c': c, 't2c_rS1': t2c_rS1, 't2c_rS2': t2c_rS2}
+
+
+def simulate_tables(rng, n_tables, n_trials, nRatings, padCells=1):
+    # [(true parameters, nR_S1, nR_S2)], the counts of n_trials trials per
+    # stimulus of each simulated observer (see power_analysis.model_probabilities),
+    # padded as trials2counts(padCells = padCells) would
+    padAmount = 1/(2*nRatings) if padCells else 0
+    tables = []
+    for _ in range(n_tables):
+        params = random_parameters(rng, nRatings)
+        pS1, pS2 = model_probabilities(**params)
+        nR_S1, nR_S2 = simulate_count_tables(rng, 1, n_trials, pS1, pS2, padAmount)
+        tables.append((params, nR_S1[0].tolist(), nR_S2[0].tolist()))
+    return tables
+
+
+def fit_tables(tables, beta=0.0, p=0, solver='trust-constr', time_budget=None):
+    # fits every table; returns {'time', 'success', 'meta_da', 'M_ratio'} and
+    # the true meta-d' / M_ratio, one entry per table. an exception or a
+    # non-finite meta-d' counts as a failed fit
+    meta_d_prime_computer = Meta_d_prime()
+    r = {'time': [], 'success': [], 'meta_da': [], 'M_ratio': [], 'true_meta_d': [], 'true_M_ratio': []}
+    for params, nR_S1, nR_S2 in tables:
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                fit = meta_d_prime_computer.fit_meta_d_MLE(nR_S1, nR_S2, beta, p, solver=solver, time_budget=time_budget)
+            meta_da, M_ratio = fit['meta_da'], fit['M_ratio']
+            success = bool(fit['success']) and np.isfinite(meta_da)
+        except Exception:
+            meta_da, M_ratio, success = np.nan, np.nan, False
+        r['time'].append(time.perf_counter() - start)
+        r['success'].append(success)
+        r['meta_da'].append(meta_da)
+        r['M_ratio'].append(M_ratio)
+        r['true_meta_d'].append(params['meta_d'])
+        r['true_M_ratio'].append(params['meta_d'] / params['d'])
+    return {k: np.array(v, dtype=float) for k, v in r.items()}
+
+
+def summarize(r):
+    # fits per second, latency percentiles, failure rate and recovery error
+    # (over the successful fits) of one fit_tables result
+    ok = r['success'] > 0
+    meta_d_error = r['meta_da'][ok] - r['true_meta_d'][ok]
+    M_ratio_error = r['M_ratio'][ok] - r['true_M_ratio'][ok]
+    return {
+        'n_fits': len(r['time']),
+        'fits_per_sec': len(r['time']) / np.sum(r['time']),
+        'p50_s': float(np.percentile(r['time'], 50)),
+        'p99_s': float(np.percentile(r['time'], 99)),
+        'failure_rate': float(1 - np.mean(ok)),
+        'meta_d_bias': float(np.mean(meta_d_error)) if ok.any() else np.nan,
+        'meta_d_mae': float(np.mean(np.abs(meta_d_error))) if ok.any() else np.nan,
+        'M_ratio_mae': float(np.mean(np.abs(M_ratio_error))) if ok.any() else np.nan,
+    }
+
+
+def benchmark(n_trials_values=(50, 200, 1000), nRatings_values=(2, 4, 6, 10), n_tables=10, beta=0.0, p=0,
+              seed=0, solver='trust-constr', time_budget=None):
+    # summarize(fit_tables(...)) for every (n_trials, nRatings) cell of the
+    # grid; each cell has its own seeded tables, so cells can be rerun alone
+    results = {}
+    for nRatings in nRatings_values:
+        for n_trials in n_trials_values:
+            rng = np.random.default_rng([seed, n_trials, nRatings])
+            tables = simulate_tables(rng, n_tables, n_trials, nRatings)
+            results[(n_trials, nRatings)] = summarize(fit_tables(tables, beta, p, solver, time_budget))
+    return results
+
+
+def benchmark_batch(n_tables=40, n_trials=200, nRatings=4, beta=0.5, p=0, seed=0, batch_size=64):
+    # fit_meta_d_MLE_batch against a loop of fit_meta_d_MLE on the same
+    # simulated tables: {'batch_s', 'loop_s', 'speedup' (loop_s / batch_s),
+    # 'max_meta_da_diff', 'same_success'}
+    tables = simulate_tables(np.random.default_rng([seed, n_trials, nRatings]), n_tables, n_trials, nRatings)
+    nR_S1 = np.array([table[1] for table in tables])
+    nR_S2 = np.array([table[2] for table in tables])
+    meta_d_prime_computer = Meta_d_prime()
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        start = time.perf_counter()
+        batch = meta_d_prime_computer.fit_meta_d_MLE_batch(nR_S1, nR_S2, beta, p, batch_size=batch_size)
+        batch_s = time.perf_counter() - start
+        start = time.perf_counter()
+        fits = [meta_d_prime_computer.fit_meta_d_MLE(list(a), list(b), beta, p) for a, b in zip(nR_S1, nR_S2)]
+        loop_s = time.perf_counter() - start
+    return {'batch_s': batch_s, 'loop_s': loop_s, 'speedup': loop_s / batch_s,
+            'max_meta_da_diff': float(np.nanmax(np.abs(batch['meta_da'] - [fit['meta_da'] for fit in fits]))),
+            'same_success': bool(np.all(batch['success'] == [fit['success'] for fit in fits]))}
+
+
+def report(results, baseline=None):
+    header = (f"{'n_trials':>9}{'nRatings':>9}{'fits/s':>9}{'p50 s':>9}{'p99 s':>9}{'failed':>8}"
+              f"{'meta-d bias':>13}{'meta-d MAE':>12}{'M_ratio MAE':>13}")
+    print(header + (f"{'p50 vs base':>13}" if baseline else ''))
+    for (n_trials, nRatings), s in results.items():
+        line = (f"{n_trials:>9}{nRatings:>9}{s['fits_per_sec']:>9.1f}{s['p50_s']:>9.3f}{s['p99_s']:>9.3f}"
+                f"{s['failure_rate']:>8.2f}{s['meta_d_bias']:>13.3f}{s['meta_d_mae']:>12.3f}{s['M_ratio_mae']:>13.3f}")
+        if baseline:
+            base = baseline.get(f"{n_trials},{nRatings}")
+            line += f"{s['p50_s'] / base['p50_s']:>12.2f}x" if base else f"{'-':>13}"
+        print(line)
+
+
+def to_json(results):
+    return {f"{n_trials},{nRatings}": s for (n_trials, nRatings), s in results.items()}
+
+
+def regressions(results, baseline, max_slowdown=1.5, max_failure_increase=0.05):
+    # cells whose median latency grew by more than max_slowdown times, or
+    # whose failure rate grew by more than max_failure_increase, against a
+    # baseline saved with --save
+    found = []
+    for key, s in to_json(results).items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if s['p50_s'] > max_slowdown * base['p50_s']:
+            found.append(f"{key}: p50 {base['p50_s']:.3f}s -> {s['p50_s']:.3f}s")
+        if s['failure_rate'] > base['failure_rate'] + max_failure_increase:
+            found.append(f"{key}: failure rate {base['failure_rate']:.2f} -> {s['failure_rate']:.2f}")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="speed and parameter recovery of fit_meta_d_MLE on simulated SDT observers")
+    parser.add_argument("--n_trials", type=int, nargs="+", default=[50, 200, 1000], help="trials per stimulus")
+    parser.add_argument("--nRatings", type=int, nargs="+", default=[2, 4, 6, 10])
+    parser.add_argument("--n_tables", type=int, default=10, help="simulated observers per grid cell")
+    parser.add_argument("--beta", type=float, default=0.0)
+    parser.add_argument("--p", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--solver", type=str, default="trust-constr")
+    parser.add_argument("--time_budget", type=float, default=None, help="seconds per fit")
+    parser.add_argument("--save", type=str, default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON file from --save to compare against")
+    parser.add_argument("--max_slowdown", type=float, default=1.5)
+    parser.add_argument("--batch", action="store_true",
+                        help="compare fit_meta_d_MLE_batch with a loop of single fits instead "
+                             "(n_tables tables of the first n_trials / nRatings)")
+    args = parser.parse_args()
+
+    if args.batch:
+        r = benchmark_batch(args.n_tables, args.n_trials[0], args.nRatings[0], args.beta, args.p, args.seed)
+        print(f"batch {r['batch_s']:.2f}s  loop {r['loop_s']:.2f}s  speedup {r['speedup']:.2f}x  "
+              f"max |meta_da difference| {r['max_meta_da_diff']:.2g}  same success {r['same_success']}")
+        if r['speedup'] < 1:
+            print("REGRESSION the batch is slower than a loop of single fits")
+            raise SystemExit(1)
+        raise SystemExit(0)
+
+    results = benchmark(args.n_trials, args.nRatings, args.n_tables, args.beta, args.p, args.seed, args.solver, args.time_budget)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(to_json(results), f, indent=2)
+    if baseline:
+        found = regressions(results, baseline, args.max_slowdown)
+        for line in found:
+            print("REGRESSION", line)
+        if found:
+            raise SystemExit(1)
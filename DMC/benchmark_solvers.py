@@ -0,0 +1,98 @@
+import io
+import time
+import argparse
+import contextlib
+import numpy as np
+from meta_d_prime import Meta_d_prime
+from power_analysis import model_probabilities, simulate_count_tables
+
+
+def simulate_counts(rng, nRatings, n_trials):
+    # count table of an equal-variance SDT observer with random d', type 1
+    # criterion and type 2 criteria, n_trials trials per stimulus. the type 2
+    # criteria span about the same range whatever the number of ratings
+    d = rng.uniform(0.5, 2.5)
+    c = rng.uniform(-0.5, 0.5)
+    spacing = 3 / (nRatings-1)
+    t2c_rS1 = -np.cumsum(spacing * rng.uniform(0.2, 0.8, nRatings-1))[::-1]
+    t2c_rS2 = np.cumsum(spacing * rng.uniform(0.2, 0.8, nRatings-1))
+    # meta-d' = d': the type 2 criteria are offsets from c
+    pS1, pS2 = model_probabilities(d, d, c, t2c_rS1, t2c_rS2)
+    nR_S1, nR_S2 = simulate_count_tables(rng, 1, n_trials, pS1, pS2, 1/(2*nRatings))
+    return nR_S1[0].tolist(), nR_S2[0].tolist()
+
+
+def benchmark(n_tables=20, nRatings=4, n_trials=200, beta=0.5, seed=0, solvers=('trust-constr', 'L-BFGS-B')):
+    # fits the same simulated tables with every solver; returns
+    # {solver: {'time', 'meta_da', 'logL', 'success'}} with one entry per table
+    rng = np.random.default_rng(seed)
+    tables = [simulate_counts(rng, nRatings, n_trials) for _ in range(n_tables)]
+    meta_d_prime_computer = Meta_d_prime()
+    results = {}
+    for solver in solvers:
+        results[solver] = {'time': [], 'meta_da': [], 'logL': [], 'success': []}
+        for nR_S1, nR_S2 in tables:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                fit = meta_d_prime_computer.fit_meta_d_MLE(nR_S1, nR_S2, beta, 0, solver=solver)
+            results[solver]['time'].append(time.perf_counter() - start)
+            results[solver]['meta_da'].append(fit['meta_da'])
+            results[solver]['logL'].append(fit['logL'])
+            results[solver]['success'].append(fit['success'])
+        results[solver] = {k: np.array(v) for k, v in results[solver].items()}
+    return results
+
+
+def benchmark_nratings(nRatings_values=(4, 10, 20, 30, 50), n_tables=5, n_trials=2000, beta=0.5, seed=0,
+                       solvers=('trust-constr', 'L-BFGS-B'), time_budget=120):
+    # fit time against the number of rating levels; returns
+    # {(solver, nRatings): {'time', 'nit', 'success'}} with one entry per table
+    meta_d_prime_computer = Meta_d_prime()
+    results = {}
+    for nRatings in nRatings_values:
+        rng = np.random.default_rng(seed)
+        tables = [simulate_counts(rng, nRatings, n_trials) for _ in range(n_tables)]
+        for solver in solvers:
+            r = {'time': [], 'nit': [], 'success': []}
+            for nR_S1, nR_S2 in tables:
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fit = meta_d_prime_computer.fit_meta_d_MLE(nR_S1, nR_S2, beta, 0, solver=solver, time_budget=time_budget)
+                r['time'].append(time.perf_counter() - start)
+                r['nit'].append(fit['telemetry']['nit'])
+                r['success'].append(fit['success'])
+            results[(solver, nRatings)] = {k: np.array(v) for k, v in r.items()}
+    return results
+
+
+def report_nratings(results):
+    print(f"{'solver':<14}{'nRatings':>9}{'median s/fit':>14}{'max s/fit':>11}{'median nit':>12}{'success':>9}")
+    for (solver, nRatings), r in results.items():
+        print(f"{solver:<14}{nRatings:>9}{np.median(r['time']):>14.3f}{np.max(r['time']):>11.3f}"
+              f"{np.median(r['nit']):>12.0f}{np.mean(r['success']):>9.2f}")
+
+
+def report(results, reference='trust-constr'):
+    ref = results[reference]
+    print(f"{'solver':<14}{'median s/fit':>14}{'mean s/fit':>12}{'success':>9}{'|d meta_da| med':>17}{'max':>10}{'lower/equal loss':>18}")
+    for solver, r in results.items():
+        diff = np.abs(r['meta_da'] - ref['meta_da'])
+        not_worse = np.mean(r['logL'] <= ref['logL'] + 1e-6)
+        print(f"{solver:<14}{np.median(r['time']):>14.3f}{np.mean(r['time']):>12.3f}{np.mean(r['success']):>9.2f}"
+              f"{np.median(diff):>17.2e}{np.max(diff):>10.2e}{not_worse:>18.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compare fit_meta_d_MLE solvers on simulated count tables")
+    parser.add_argument("--n_tables", type=int, default=20)
+    parser.add_argument("--nRatings", type=int, default=4)
+    parser.add_argument("--n_trials", type=int, default=200)
+    parser.add_argument("--beta", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--nRatings_sweep", type=int, nargs="+",
+                        help="instead, report fit time against these numbers of rating levels (e.g. 4 10 20 50)")
+    args = parser.parse_args()
+    if args.nRatings_sweep:
+        report_nratings(benchmark_nratings(args.nRatings_sweep, args.n_tables, args.n_trials, args.beta, args.seed))
+    else:
+        report(benchmark(args.n_tables, args.nRatings, args.n_trials, args.beta, args.seed))
@@ -1,157 +1,327 @@
 import os
 import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 from Prompt import myPrompt
 from LLM import LLM
 from myDatasets import myDatasets
 import re
 from discretize import Discretizer
+from aggregation import sample_matrix, vote
 from meta_d_prime import Meta_d_prime
+from results_store import ResultsStore
 # from plotter import Plotter
 import time
 import datetime
 import numpy as np
-from interval import Interval
 from collections import Counter
+from functools import lru_cache
 import pandas as pd
 from sklearn.metrics import roc_auc_score
 from sklearn.metrics import brier_score_loss
 
-def comp_meta_d(file_path, confidence_extract_methods, prompting, beta, p, num_bins=4, discre_type="equal_width", padCells=1):
-    # reading parsed data
-    answers  = []
-    labels = []
-    probs = []
-    with open(file_path, 'r')  as f:
-        for line in f:
-            line = json.loads(line)
-            if confidence_extract_methods == "verb_confidence":
-                if prompting in ["vanilla", "self_probing", "multi_steps", "cot"]:
-                    if line["answer"] is not None and line["prob"] is not None:
-                        if line["prob"] in Interval(0.0, 1.0):
-                            assert line["prob"] in Interval(0.0, 1.0), f"Incorrect prob, file_path: {file_path}, prob={line['prob']}"
-                            answers.append(line["answer"])
-                            labels.append(line["label"])
-                            probs.append(line["prob"])
-                elif prompting == "topk":
-                    if all(x is not None for x in line["answers"]) and all(x is not None for x in line["probs"]):
-                        incorrect_prob = False
-                        for prob in line["probs"]:
-                            if (prob in Interval(0.0, 1.0)) == False:
-                                incorrect_prob = True
-                        if incorrect_prob == False:
-                            ans_list = line["answers"]
-                            prob_list = line["probs"]
-                            if prob_list[0] or prob_list[1]:
-                                assert (prob_list[0] in Interval(0.0, 1.0)) and (prob_list[1] in Interval(0.0, 1.0)), f"Incorrect prob, file_path: {file_path}, prob={prob_list}"
-                                prob_list = [-1.0 if x is None else x for x in prob_list]
-                                max_prob_idx = prob_list.index(max(prob_list))
-                                answers.append(ans_list[max_prob_idx])
-                                labels.append(line["label"])
-                                probs.append(prob_list[max_prob_idx])
-            elif confidence_extract_methods in ["consis_confidence", "consis_disturb_confidence", "consis_misleading_confidence"]:
-                if prompting == "zero_shot":
-                    if all(x is not None for x in line["answers"]):
-                        counter = Counter(line["answers"])
-                        total = len(line["answers"])
-                        freqs = {key: value / total for key, value in counter.items()}
-                        most_freq_ans = max(freqs, key=freqs.get)
-                        most_freq_score = freqs[most_freq_ans]
-                        answers.append(most_freq_ans)
-                        probs.append(most_freq_score)
-                        labels.append(line["label"])
-            elif confidence_extract_methods == "verbis_confidence":
-                if prompting == "vanilla":
-                    is_nonsense = False
-                    incorrect_prob = False
-                    for item in line["answers"]:
-                        if all(x is not None for x in item) == False:
-                            is_nonsense = True
-                            break
-                        if item[1] is not None and (item[1] in Interval(0.0, 1.0)) == False:
-                            incorrect_prob = True
-                            break
-
-                    if is_nonsense == False and incorrect_prob == False:
-                        unique_answers = list(set([x[0] for x in line["answers"]]))
-                        conf_score = []
-                        for unique_answer in unique_answers:
-                            num = 0
-                            conf_sum = 0
-                            for answer in line["answers"]:
-                                if unique_answer == answer[0]:
-                                    num = num + 1
-                                    conf_sum = conf_sum + answer[1]
-                                    assert answer[1] in Interval(0.0, 1.0), f"Incorrect prob, file_path: {file_path}, prob={answer[1]}"
-                            
-                            conf_score.append(conf_sum / num)
-                        assert len(unique_answers) == len(conf_score), f"compute error: verbis_confidence vanilla"
-                        if len(unique_answers) == 1:
-                            answers.append(unique_answers[0])
-                            probs.append(conf_score[0])
-                            labels.append(line["label"])
-                        else:
-                            max_prob_idx = conf_score.index(max(conf_score))
-                            answers.append(unique_answers[max_prob_idx])
-                            probs.append(conf_score[max_prob_idx])
-                            labels.append(line["label"])
-                elif prompting == "topk":
-                    is_nonsense = False
-                    incorrect_prob = False
-                    for Item in line["answers"]:
-                        for item in Item:
-                            if all(x is not None for x in item) == False:
-                                is_nonsense = True
-                                break
-                        for p in Item[1]:
-                            if p is not None and (p in Interval(0.0, 1.0)) == False:
-                                incorrect_prob = True
-                                break
-
-                    if is_nonsense == False and incorrect_prob == False:
-                        top1_answers = []
-                        for answer in line["answers"]:
-                            max_prob_idx = answer[1].index(max(answer[1]))
-                            top1_answers.append([answer[0][max_prob_idx], answer[1][max_prob_idx]])
-                        unique_answers = list(set([x[0] for x in top1_answers]))
-                        conf_score = []
-                        for unique_answer in unique_answers:
-                            num = 0
-                            conf_sum = 0
-                            for answer in top1_answers:
-                                if unique_answer == answer[0]:
-                                    num = num + 1
-                                    conf_sum = conf_sum + answer[1]
-                                    assert answer[1] in Interval(0.0, 1.0), f"Incorrect prob, file_path: {file_path}, prob={answer[1]}"
-                            
-                            conf_score.append(conf_sum / num)
-                        assert len(unique_answers) == len(conf_score), f"compute error: verbis_confidence vanilla"
-                        if len(unique_answers) == 1:
-                            answers.append(unique_answers[0])
-                            probs.append(conf_score[0])
-                            labels.append(line["label"])
-                        else:
-                            max_prob_idx = conf_score.index(max(conf_score))
-                            answers.append(unique_answers[max_prob_idx])
-                            probs.append(conf_score[max_prob_idx])
-                            labels.append(line["label"])
+def _column(values):
+    # typed NumPy array of one field over all lines: bool, int, float or str
+    # when every non-None value has that type, objects otherwise (e.g. mixed
+    # answer types). None entries (of invalid lines) become False / 0 / NaN / ''
+    kinds = {type(v) for v in values if v is not None}
+    for dtype, fill, types in ((bool, False, {bool}), (np.int64, 0, {bool, int}),
+                               (float, np.nan, {bool, int, float}), (str, '', {str})):
+        if kinds <= types:
+            return np.array([fill if v is None else v for v in values], dtype=dtype)
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _probs(values):
+    # float64 array of probabilities, NaN for a missing (None) one
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _in_unit_interval(probs):
+    # vectorized 0 <= prob <= 1; NaN (a missing prob) is outside
+    return (probs >= 0.0) & (probs <= 1.0)
+
+
+def load_parsed(file_path, confidence_extract_methods, prompting):
+    """
+    answers, labels, probs, valid = load_parsed(file_path, confidence_extract_methods, prompting)
+
+    Reads a parsed JSONL file into one entry per line: the answer, label and
+    confidence (prob) of the question, as typed NumPy arrays (see _column;
+    probs are float64), and the boolean mask of the lines comp_meta_d uses.
+
+    The file is decoded in one json.loads call. Each line only contributes
+    its fields (for topk, the top-ranked answer; for consistency and
+    verbalized-sampling methods, the answer and confidence aggregated over
+    the samples of all lines at once by aggregation.vote, with its
+    tie-breaking); probabilities are then checked against [0, 1] with
+    vectorized masks.
+    A line is valid if none of its answers or probabilities is missing and
+    all its probabilities lie in [0, 1] (NaN probabilities are invalid).
+    Unknown method / prompting combinations give no valid lines.
+    """
+    with open(file_path, 'r') as f:
+        lines = json.loads('[' + ','.join(line for line in f if line.strip()) + ']')
+    n = len(lines)
+    labels = _column([line["label"] for line in lines])
+
+    if confidence_extract_methods == "verb_confidence" and prompting in ["vanilla", "self_probing", "multi_steps", "cot"]:
+        answers = [line["answer"] for line in lines]
+        probs = _probs([line["prob"] for line in lines])
+        valid = np.array([a is not None for a in answers], dtype=bool) & _in_unit_interval(probs)
+
+    elif confidence_extract_methods == "verb_confidence" and prompting == "topk":
+        # (lines, k) array of the ranked probs, NaN-padded; a line is kept if
+        # all its probs are in [0, 1] and one of the first two is non-zero,
+        # and gives its most probable answer (the first one on ties)
+        lengths = np.array([len(line["probs"]) for line in lines], dtype=np.int64)
+        ranked = np.full((n, max(lengths.max(initial=0), 2)), np.nan)
+        for i, line in enumerate(lines):
+            ranked[i, :lengths[i]] = _probs(line["probs"])
+        present = np.arange(ranked.shape[1]) < lengths[:, None]
+        in_range = np.all(_in_unit_interval(ranked) | ~present, axis=1) & (lengths > 0)
+        padded = np.where(present, ranked, 0.0)
+        best = np.argmax(np.where(present, ranked, -np.inf), axis=1)
+        has_answers = np.array([all(x is not None for x in line["answers"]) for line in lines], dtype=bool)
+        valid = has_answers & in_range & ((padded[:, 0] != 0) | (padded[:, 1] != 0))
+        answers = [line["answers"][j] if ok else None for line, j, ok in zip(lines, best, valid)]
+        probs = np.where(valid, padded[np.arange(n), best], np.nan)
+
+    elif confidence_extract_methods in ["consis_confidence", "consis_disturb_confidence", "consis_misleading_confidence"] and prompting == "zero_shot":
+        # the most frequent of the sampled answers, with its frequency as the
+        # confidence (ties: see aggregation.vote)
+        sampled, present = sample_matrix([line["answers"] for line in lines])
+        valid = present.any(axis=1) & ~np.any(present & np.equal(sampled, None), axis=1)
+        answers, probs, _ = vote(sampled, present=present & valid[:, None], rank_by='frequency')
+
+    elif confidence_extract_methods == "verbis_confidence" and prompting in ["vanilla", "topk"]:
+        # (answer, prob) samples of each question, for topk the top-ranked
+        # answer of each sample (the first one on ties); the answer with the
+        # highest mean prob wins (ties: see aggregation.vote). a question is
+        # kept if none of its answers or probs is missing and all its probs,
+        # not only the top-ranked ones, are in [0, 1]
+        if prompting == "vanilla":
+            samples, present = sample_matrix([line["answers"] for line in lines])
+            sampled, sampled_probs = np.full(samples.shape, None, dtype=object), np.full(samples.shape, np.nan)
+            sampled[present] = np.fromiter((item[0] for item in samples[present]), dtype=object, count=present.sum())
+            sampled_probs[present] = _probs([item[1] for item in samples[present]])
+            ok = ~np.equal(sampled, None) & _in_unit_interval(sampled_probs)
+        else:
+            # one row per sample of every question, with its ranked answers
+            ranked_answers, ranked_present = sample_matrix([Item[0] for line in lines for Item in line["answers"]], 1)
+            ranked_probs, _ = sample_matrix([Item[1] for line in lines for Item in line["answers"]], 1)
+            ranked_probs = np.where(np.equal(ranked_probs, None), np.nan, ranked_probs).astype(float)
+            top = np.argmax(np.where(ranked_present, ranked_probs, -np.inf), axis=1)
+            rows = np.arange(len(top))
+            ok_rows = ranked_present.any(axis=1) & np.all(
+                ~ranked_present | (~np.equal(ranked_answers, None) & _in_unit_interval(ranked_probs)), axis=1)
+            # back to (questions x samples)
+            samples, present = sample_matrix([line["answers"] for line in lines])
+            sampled, sampled_probs = np.full(present.shape, None, dtype=object), np.full(present.shape, np.nan)
+            sampled[present] = ranked_answers[rows, top]
+            sampled_probs[present] = ranked_probs[rows, top]
+            ok = np.zeros(present.shape, dtype=bool)
+            ok[present] = ok_rows
+        valid = present.any(axis=1) & np.all(~present | ok, axis=1)
+        answers, _, probs = vote(sampled, sampled_probs, present & valid[:, None], rank_by='confidence')
+
+    else:
+        answers, probs, valid = [None] * n, np.full(n, np.nan), np.zeros(n, dtype=bool)
+
+    return _column(list(answers)), labels, probs, valid
+
+
+@lru_cache(maxsize=256)
+def _aggregate(file_path, file_stamp, confidence_extract_methods, prompting, num_bins, discre_type, padCells):
+    # reading parsed data: typed arrays of the valid lines, used as they are
+    # for discretization, accuracy and trials2counts
+    answers, labels, probs, valid = load_parsed(file_path, confidence_extract_methods, prompting)
+    answers, labels, probs = answers[valid], labels[valid], probs[valid]
 
     # discretize prob
     discretizer = Discretizer()
     discre_probs = discretizer.apply(num_bins=num_bins, data=probs, discre_type=discre_type)
 
     # compute accuracy rate
-    accuracy_rate = np.sum(np.array(answers) == np.array(labels)) / len(answers)
+    accuracy_rate = np.sum(answers == labels) / len(answers)
+
+    # count tables
+    nR_S1, nR_S2 = Meta_d_prime().trials2counts(stimID=labels, response=answers, rating=discre_probs, nRatings=num_bins, padCells=padCells)
+
+    # the cached arrays are never handed out (aggregate returns copies), and
+    # read-only so that nothing here changes them by mistake
+    for array in (answers, labels, probs, discre_probs):
+        array.flags.writeable = False
+    return answers, labels, probs, discre_probs, accuracy_rate, tuple(nR_S1), tuple(nR_S2)
+
+
+def aggregate(file_path, confidence_extract_methods, prompting, num_bins=4, discre_type="equal_width", padCells=1):
+    """
+    answers, labels, probs, discre_probs, accuracy_rate, nR_S1, nR_S2 = aggregate(file_path, confidence_extract_methods, prompting, ...)
+
+    Everything comp_meta_d computes before the fit, none of which depends on
+    beta or p: the answers, labels and probs of the valid lines (see
+    load_parsed), the discretized probs, the accuracy and the count tables.
+
+    Results are memoized in this process (the last 256 files / settings),
+    keyed by the absolute path, the modification time and size of the file,
+    the method, prompting, num_bins, discre_type and padCells, so refits of
+    a file with other beta / p only pay for the fit, and an edited file is
+    read again. Every call returns its own copies of the arrays and count
+    tables, so callers may change them without affecting other calls.
+    """
+    stat = os.stat(file_path)
+    answers, labels, probs, discre_probs, accuracy_rate, nR_S1, nR_S2 = _aggregate(
+        os.path.abspath(file_path), (stat.st_mtime_ns, stat.st_size), confidence_extract_methods, prompting,
+        num_bins, discre_type, padCells)
+    return answers.copy(), labels.copy(), probs.copy(), discre_probs.copy(), accuracy_rate, list(nR_S1), list(nR_S2)
+
+
+def comp_meta_d(file_path, confidence_extract_methods, prompting, beta, p, num_bins=4, discre_type="equal_width", padCells=1, fit_cache=None, verbose=True):
+    # aggregated data and count tables, memoized per file and settings; with
+    # verbose, the count tables and the file are printed
+    answers, labels, probs, discre_probs, accuracy_rate, nR_S1, nR_S2 = aggregate(
+        file_path, confidence_extract_methods, prompting, num_bins, discre_type, padCells)
 
     # compute meta-d-prime
     meta_d_prime_computer = Meta_d_prime()
-    nR_S1, nR_S2 = meta_d_prime_computer.trials2counts(stimID=labels, response=answers, rating=discre_probs, nRatings=num_bins, padCells=padCells)
-    print(nR_S1)
-    print(nR_S2)
-    fit = meta_d_prime_computer.fit_meta_d_MLE(nR_S1=nR_S1, nR_S2=nR_S2, beta=beta, p=p)
-    print(file_path)
+    if verbose:
+        print(nR_S1)
+        print(nR_S2)
+    if fit_cache is not None:
+        fit = fit_cache.fit_meta_d_MLE(meta_d_prime_computer, nR_S1=nR_S1, nR_S2=nR_S2, beta=beta, p=p)
+    else:
+        fit = meta_d_prime_computer.fit_meta_d_MLE(nR_S1=nR_S1, nR_S2=nR_S2, beta=beta, p=p)
+    if verbose:
+        print(file_path)
     return fit, accuracy_rate, nR_S1, nR_S2, answers, labels, discre_probs
 
+
+# parsed file of a task, relative to the working directory as the datasets
+# of myDatasets are
+DEFAULT_PATH_TEMPLATE = "./parsed/{dataset}/{confidence_extract_methods}_{prompting}.jsonl"
+
+
+def expand_grid(datasets, confidence_extract_methods, path_template=DEFAULT_PATH_TEMPLATE, betas=(0.0,), ps=(0,), num_bins=4, discre_type="equal_width", padCells=1):
+    # one task per dataset x (method, prompting) x beta x p; path_template
+    # gives the parsed file of a task, with {dataset}, {confidence_extract_methods}
+    # and {prompting} fields
+    tasks = []
+    for dataset in datasets:
+        for method, promptings in confidence_extract_methods.items():
+            for prompting in promptings:
+                file_path = path_template.format(dataset=dataset, confidence_extract_methods=method, prompting=prompting)
+                for beta in betas:
+                    for p in ps:
+                        tasks.append({'dataset': dataset, 'confidence_extract_methods': method, 'prompting': prompting,
+                                      'beta': beta, 'p': p, 'num_bins': num_bins, 'discre_type': discre_type,
+                                      'padCells': padCells, 'file_path': file_path})
+    return tasks
+
+
+# FitCache of each cache_dir in this process (one per worker)
+_fit_caches = {}
+
+
+def _run_task(args):
+    # comp_meta_d for one task of expand_grid, as a results row. module level,
+    # so that it can be sent to a process pool. the count tables are not
+    # printed, and an exception is recorded in 'error' instead of ending the sweep
+    task, cache_dir = args
+    fit_cache = None
+    if cache_dir is not None:
+        if cache_dir not in _fit_caches:
+            from fit_cache import FitCache
+            _fit_caches[cache_dir] = FitCache(cache_dir)
+        fit_cache = _fit_caches[cache_dir]
+    row = dict(task)
+    start = time.perf_counter()
+    try:
+        fit, accuracy_rate, nR_S1, nR_S2, answers, labels, discre_probs = comp_meta_d(
+            task['file_path'], task['confidence_extract_methods'], task['prompting'], task['beta'], task['p'],
+            num_bins=task['num_bins'], discre_type=task['discre_type'], padCells=task['padCells'], fit_cache=fit_cache,
+            verbose=False)
+        row.update({'n_trials': len(answers), 'accuracy': accuracy_rate, 'da': fit['da'], 'meta_da': fit['meta_da'],
+                    'M_ratio': fit['M_ratio'], 'M_diff': fit['M_diff'], 'logL': fit['logL'], 'success': fit['success'],
+                    'nR_S1': nR_S1, 'nR_S2': nR_S2, 'fit': fit, 'error': None})
+    except Exception as e:
+        row.update({'n_trials': 0, 'accuracy': np.nan, 'da': np.nan, 'meta_da': np.nan, 'M_ratio': np.nan,
+                    'M_diff': np.nan, 'logL': np.nan, 'success': False, 'nR_S1': None, 'nR_S2': None, 'fit': None,
+                    'error': f"{type(e).__name__}: {e}"})
+    row['time'] = time.perf_counter() - start
+    return row
+
+
+def _aggregation_key(task):
+    # tasks with the same key share one aggregate call
+    return (task['file_path'], task['confidence_extract_methods'], task['prompting'], task['num_bins'],
+            task['discre_type'], task['padCells'])
+
+
+def _run_tasks(args):
+    # _run_task for tasks with the same _aggregation_key, one after another in
+    # one worker, so their file is read and aggregated once
+    tasks, cache_dir = args
+    return [_run_task((task, cache_dir)) for task in tasks]
+
+
+def run_grid(tasks, n_jobs=None, cache_dir=None, progress=True, store=None):
+    """
+    results = run_grid(tasks, n_jobs, cache_dir, progress, store)
+
+    Runs comp_meta_d for every task of expand_grid on a process pool of
+    n_jobs workers (default: one per core; n_jobs = 1 runs them in this
+    process). Tasks are independent. The beta / p variants of a file (tasks
+    with the same file and aggregation settings) go to a worker together,
+    so the aggregate memoized in that worker reads and aggregates the file
+    once. These groups are submitted largest parsed file first, so that a
+    long one does not start last, and a tqdm bar shows the progress and the
+    time of the last finished task. If cache_dir is given, every worker fits
+    through a FitCache on that directory.
+
+    If store (a ResultsStore) is given, tasks whose results it already holds
+    are not run again (their stored rows are returned), and every new
+    result is added to it as soon as its task (with n_jobs = 1) or group
+    finishes.
+
+    Returns a pandas DataFrame with one row per task, in the order of tasks:
+    the task fields, then 'n_trials', 'accuracy', 'da', 'meta_da', 'M_ratio',
+    'M_diff', 'logL', 'success', the count tables 'nR_S1' / 'nR_S2', the
+    whole 'fit', 'error' (None, or the exception of a failed task) and
+    'time' (seconds spent on the task).
+    """
+    size = lambda task: os.path.getsize(task['file_path']) if os.path.exists(task['file_path']) else 0
+    rows = [None] * len(tasks)
+    if store is not None:
+        rows = [store.get(task) for task in tasks]
+    order = sorted((i for i in range(len(tasks)) if rows[i] is None), key=lambda i: -size(tasks[i]))
+    bar = tqdm(total=len(tasks), initial=len(tasks) - len(order), disable=not progress)
+
+    def done(i, row):
+        rows[i] = row
+        if store is not None:
+            store.put(row)
+        bar.set_postfix_str(f"{row['dataset']} {row['confidence_extract_methods']}/{row['prompting']} {row['time']:.1f}s")
+        bar.update(1)
+
+    if n_jobs == 1:
+        for i in order:
+            done(i, _run_task((tasks[i], cache_dir)))
+    else:
+        groups = {}
+        for i in order:
+            groups.setdefault(_aggregation_key(tasks[i]), []).append(i)
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(_run_tasks, ([tasks[i] for i in group], cache_dir)): group for group in groups.values()}
+            for future in as_completed(futures):
+                for i, row in zip(futures[future], future.result()):
+                    done(i, row)
+    bar.close()
+    return pd.DataFrame(rows)
+
 if __name__ == "__main__":
 
     datasets = ["AGIEval_sat-math", "bbh_boolean_expressions",
@@ -165,4 +335,29 @@ if __name__ == "__main__":
         "consis_disturb_confidence": ["zero_shot"],
         "consis_misleading_confidence": ["zero_shot"]
         #"verbis_confidence": ["vanilla", "topk"]
-    }      
\ No newline at end of file
+    }
+
+    parser = argparse.ArgumentParser(description="meta-d' of every dataset x confidence extraction method x prompting")
+    parser.add_argument("--path_template", type=str, default=DEFAULT_PATH_TEMPLATE,
+                        help="parsed file of a task, with {dataset}, {confidence_extract_methods} and {prompting} fields "
+                             "(default: %(default)s)")
+    parser.add_argument("--betas", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--ps", type=float, nargs="+", default=[0])
+    parser.add_argument("--num_bins", type=int, default=4)
+    parser.add_argument("--n_jobs", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--cache_dir", type=str, default=None, help="FitCache directory")
+    parser.add_argument("--store", type=str, default=None,
+                        help="SQLite ResultsStore; configurations already in it are skipped")
+    parser.add_argument("--save", type=str, default=None, help="pickle the results table to this file")
+    args = parser.parse_args()
+
+    tasks = expand_grid(datasets, confidence_extract_methods, args.path_template, args.betas, args.ps, args.num_bins)
+    store = ResultsStore(args.store) if args.store else None
+    start = time.perf_counter()
+    results = run_grid(tasks, n_jobs=args.n_jobs, cache_dir=args.cache_dir, store=store)
+    print(results[['dataset', 'confidence_extract_methods', 'prompting', 'beta', 'p', 'n_trials', 'accuracy',
+                   'meta_da', 'M_ratio', 'time', 'error']].to_string())
+    print(f"{len(tasks)} tasks, {results['error'].notna().sum()} failed, "
+          f"{results['time'].sum():.1f}s of fitting in {time.perf_counter() - start:.1f}s")
+    if args.save:
+        results.to_pickle(args.save)      
\ No newline at end of file
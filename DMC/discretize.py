@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 class Discretizer(object):
@@ -10,5 +11,6 @@ class Discretizer(object):
         if discre_type == "equal_width":
             data = pd.Series(data)
             bins = pd.cut(data, bins=num_bins, labels=[k+1 for k in range(num_bins)])
-            return list(bins)
+            # ratings 1..num_bins as an int array (0 for a missing value)
+            return bins.cat.codes.to_numpy().astype(np.int64) + 1
         
\ No newline at end of file
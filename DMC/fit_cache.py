@@ -0,0 +1,186 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+import copy
+from collections import OrderedDict
+import numpy as np
+from scipy.stats import norm
+import meta_d_prime
+import fit_result
+
+
+def fitting_code_version():
+    # hash of the fitting code, so that cached fits are invalidated whenever
+    # meta_d_prime.py or fit_result.py (the pickled MetaDFit class) changes
+    digest = hashlib.sha256()
+    for module in (meta_d_prime, fit_result):
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def cdf_name(fn):
+    # stable name of a CDF / inverse CDF callable, or None if it has none
+    # (lambdas and local functions cannot be told apart between runs)
+    owner = getattr(fn, '__self__', None)
+    name = getattr(fn, '__qualname__', getattr(fn, '__name__', None))
+    if name is None or '<' in name:
+        return None
+    if isinstance(owner, meta_d_prime.Type1Family):
+        # the name tells Student-t families with different df apart
+        return f"meta_d_prime.{owner.name}.{fn.__name__}"
+    if owner is not None and not isinstance(owner, type):
+        # bound method of a distribution object, e.g. norm.cdf
+        return f"{type(owner).__module__}.{type(owner).__name__}.{fn.__name__}"
+    return f"{getattr(fn, '__module__', '')}.{name}"
+
+
+def kwarg_key(value):
+    # stable text of a fit_meta_d_MLE keyword argument, or None if it has
+    # none: callables are named by cdf_name, arrays by their values, and
+    # objects whose repr is their memory address have no stable text
+    if callable(value):
+        return cdf_name(value)
+    if isinstance(value, np.ndarray):
+        return repr(value.tolist())
+    text = repr(value)
+    return None if ' at 0x' in text else text
+
+
+class FitCache(object):
+    """
+    Content-addressed cache of fit_meta_d_MLE results.
+
+    A fit is keyed by the counts, beta, p, s, the CDF / inverse CDF and any
+    other fit_meta_d_MLE keyword arguments, together with a version string
+    (by default a hash of meta_d_prime.py and fit_result.py, see
+    fitting_code_version). Entries are kept in an in-memory
+    LRU of max_memory fits and, if cache_dir is given, pickled to
+    cache_dir/<key[:2]>/<key>.pkl so they survive between runs.
+
+    Fits with a CDF or other keyword argument that has no stable name (e.g.
+    a lambda, see kwarg_key) are not cached, nor are fits with a callback,
+    which a cache hit would never call. get() returns a fit the caller owns:
+    a memory hit is a deep copy of the cached entry and a disk hit is freshly
+    unpickled (the memory entry is a separate copy of it).
+    """
+    def __init__(self, cache_dir=None, max_memory=4096, version=None):
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory
+        self.version = fitting_code_version() if version is None else version
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.uncacheable = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, nR_S1, nR_S2, beta, p, s=1, fncdf=norm.cdf, fninv=norm.ppf, **kwargs):
+        # hex digest identifying a fit, or None if it cannot be cached
+        if kwargs.get('callback') is not None:
+            return None
+        fncdf, fninv = meta_d_prime.resolve_type1_family(fncdf, fninv)
+        names = [cdf_name(fncdf), cdf_name(fninv)]
+        kwarg_keys = {k: kwarg_key(v) for k, v in sorted(kwargs.items())}
+        if None in names or None in kwarg_keys.values():
+            return None
+        content = {
+            'version': self.version,
+            # repr keeps every digit of the (possibly padded) counts
+            'nR_S1': [repr(float(n)) for n in nR_S1],
+            'nR_S2': [repr(float(n)) for n in nR_S2],
+            'beta': repr(float(beta)),
+            'p': repr(float(p)),
+            's': repr(float(s)),
+            'fncdf': names[0],
+            'fninv': names[1],
+            'kwargs': kwarg_keys,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    def __path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.pkl')
+
+    def get(self, key):
+        # cached fit for key, or None
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits_memory += 1
+                return copy.deepcopy(self.memory[key])
+        if self.cache_dir is not None and os.path.exists(self.__path(key)):
+            try:
+                with open(self.__path(key), 'rb') as f:
+                    fit = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                fit = None
+            if fit is not None:
+                with self.lock:
+                    self.hits_disk += 1
+                # the memory entry is a copy, so the unpickled fit is the caller's
+                self.__remember(key, fit)
+                return fit
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, fit):
+        self.__remember(key, fit)
+        if self.cache_dir is not None:
+            path = self.__path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write to a temporary file first so readers never see half a fit
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(fit, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+    def __remember(self, key, fit):
+        # callers get copies, so changes to a returned fit never reach the cache
+        fit = copy.deepcopy(fit)
+        with self.lock:
+            self.memory[key] = fit
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_memory:
+                self.memory.popitem(last=False)
+
+    def fit_meta_d_MLE(self, meta_d_prime_computer, nR_S1, nR_S2, beta, p, s=1, fncdf=norm.cdf, fninv=norm.ppf, **kwargs):
+        # meta_d_prime_computer.fit_meta_d_MLE(...), served from the cache when possible
+        key = self.key(nR_S1, nR_S2, beta, p, s=s, fncdf=fncdf, fninv=fninv, **kwargs)
+        if key is None:
+            with self.lock:
+                self.uncacheable += 1
+            return meta_d_prime_computer.fit_meta_d_MLE(nR_S1, nR_S2, beta, p, s=s, fncdf=fncdf, fninv=fninv, **kwargs)
+        fit = self.get(key)
+        if fit is None:
+            fit = meta_d_prime_computer.fit_meta_d_MLE(nR_S1, nR_S2, beta, p, s=s, fncdf=fncdf, fninv=fninv, **kwargs)
+            self.put(key, fit)
+        return fit
+
+    def stats(self):
+        with self.lock:
+            hits = self.hits_memory + self.hits_disk
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'hits_memory': self.hits_memory,
+                'hits_disk': self.hits_disk,
+                'misses': self.misses,
+                'uncacheable': self.uncacheable,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+            }
+
+    def clear(self, disk=False):
+        # drop the in-memory entries (and the on-disk store if disk is True)
+        with self.lock:
+            self.memory.clear()
+        if disk and self.cache_dir is not None:
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith('.pkl'):
+                        os.remove(os.path.join(root, name))
@@ -0,0 +1,359 @@
+import sys
+import numpy as np
+from functools import lru_cache
+
+
+# numeric fields of a fit, in the order of MetaDFit.values: scalars, then
+# vectors of nRatings-1 values each. d1, meta_d1 and meta_c1 (and s) are the
+# fields of fit['S1units']
+SCALAR_FIELDS = ('da', 's', 'meta_da', 'M_diff', 'M_ratio', 'meta_ca', 'logL', 'd1', 'meta_d1', 'meta_c1')
+VECTOR_FIELDS = ('t2ca_rS1', 't2ca_rS2', 't2c1_rS1', 't2c1_rS2',
+                 'est_HR2_rS1', 'obs_HR2_rS1', 'est_FAR2_rS1', 'obs_FAR2_rS1',
+                 'est_HR2_rS2', 'obs_HR2_rS2', 'est_FAR2_rS2', 'obs_FAR2_rS2')
+S1UNITS_FIELDS = ('d1', 'meta_d1', 's', 'meta_c1', 't2c1_rS1', 't2c1_rS2')
+# fields returned as lists by fit['...'] and to_dict(), as fit_meta_d_MLE always has
+LIST_FIELDS = VECTOR_FIELDS[4:]
+# the keys of a fit_meta_d_MLE dict, in order ('se' and the keys added by
+# multistart / sweep / bootstrap / jackknife fits are kept in extras)
+KEYS = ('da', 's', 'meta_da', 'M_diff', 'M_ratio', 'meta_ca', 't2ca_rS1', 't2ca_rS2', 'S1units',
+        'logL', 'success', 'solver', 'estimation_method', 'telemetry') + LIST_FIELDS
+
+
+@lru_cache(maxsize=None)
+def field_layout(nRatings):
+    # {field: index or slice into MetaDFit.values}, and the length of values
+    layout = {name: i for i, name in enumerate(SCALAR_FIELDS)}
+    start = len(SCALAR_FIELDS)
+    for name in VECTOR_FIELDS:
+        layout[name] = slice(start, start + nRatings - 1)
+        start += nRatings - 1
+    return layout, start
+
+
+class _PackedDict(tuple):
+    # a dict stored as (keys, values), see pack_dict
+    __slots__ = ()
+
+    def __reduce__(self):
+        # share the keys and strings again when unpickled
+        return _packed_dict, (self[0], self[1])
+
+
+@lru_cache(maxsize=None)
+def _shared_keys(keys):
+    # one keys tuple for all the dicts with the same keys
+    return keys
+
+
+def _packed_dict(keys, values):
+    values = tuple(sys.intern(v) if isinstance(v, str) else v for v in values)
+    return _PackedDict((_shared_keys(tuple(keys)), values))
+
+
+def pack_dict(d):
+    # telemetry dicts hold the same keys and a handful of distinct strings for
+    # every fit, so they are kept as (shared keys, values) tuples with
+    # interned strings; nested dicts are packed too
+    return _packed_dict(tuple(d), (pack_dict(v) if isinstance(v, dict) else v for v in d.values()))
+
+
+def unpack_dict(packed):
+    return {key: unpack_dict(value) if isinstance(value, _PackedDict) else value
+            for key, value in zip(packed[0], packed[1])}
+
+
+class _FieldList(list):
+    # fit['est_HR2_rS1'] and the other LIST_FIELDS: a list, as in the dicts
+    # fit_meta_d_MLE used to return, whose item assignments are written back
+    # into the fit. the length is fixed by nRatings, so changing it raises
+    __slots__ = ('_fit', '_name')
+
+    def __init__(self, fit, name):
+        super().__init__(getattr(fit, name).tolist())
+        self._fit = fit
+        self._name = name
+
+    def __setitem__(self, index, value):
+        items = list(self)
+        items[index] = value
+        if len(items) != len(self):
+            self._fixed_length()
+        values = getattr(self._fit, self._name)
+        values[:] = items
+        super().__setitem__(slice(None), values.tolist())
+
+    def sort(self, *args, **kwargs):
+        self[:] = sorted(self, *args, **kwargs)
+
+    def reverse(self):
+        self[:] = self[::-1]
+
+    def __reduce__(self):
+        # pickles (and copies) as a plain list
+        return list, (list(self),)
+
+    def _fixed_length(self, *args, **kwargs):
+        raise TypeError(f"the length of {self._name!r} is fixed by nRatings")
+
+    append = extend = insert = pop = remove = clear = __delitem__ = __iadd__ = __imul__ = _fixed_length
+
+
+class _S1UnitsView(dict):
+    # fit['S1units']: a dict of the S1units fields whose assignments are
+    # written back into the fit. its keys are fixed, so removing one raises
+    __slots__ = ('_fit',)
+
+    def __init__(self, fit):
+        super().__init__((name, fit[name]) for name in S1UNITS_FIELDS)
+        self._fit = fit
+
+    def __setitem__(self, key, value):
+        if key not in S1UNITS_FIELDS:
+            raise KeyError(key)
+        self._fit[key] = value
+        super().__setitem__(key, self._fit[key])
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        return self[key]
+
+    def __reduce__(self):
+        # pickles (and copies) as a plain dict
+        return dict, (dict(self),)
+
+    def _fixed_keys(self, *args, **kwargs):
+        raise TypeError("the keys of 'S1units' are fixed")
+
+    pop = popitem = clear = __delitem__ = __ior__ = _fixed_keys
+
+
+class MetaDFit(object):
+    """
+    Result of fit_meta_d_MLE.
+
+    All numeric fields share one float64 vector, values, laid out by
+    field_layout(nRatings), so a fit is one small object and one array
+    instead of a nested dict of lists and NumPy scalars. Attributes
+    (fit.meta_da, fit.t2ca_rS1, fit.est_HR2_rS1, ...) are zero-copy views
+    into values.
+
+    For backward compatibility a fit also reads and writes like the dict
+    fit_meta_d_MLE used to return: fit['meta_da'], fit['S1units']['d1'],
+    'se' in fit, fit.keys(), fit['sweep'] = {...}, with the same types as
+    before (NumPy scalars, arrays for the criteria, lists for the type 2
+    rates). fit['S1units'] and the type 2 rate lists are built on every
+    access, but assignments to them (fit['S1units']['d1'] = x,
+    fit['est_HR2_rS1'][0] = x) are written back into values; changing
+    their keys or length raises TypeError. Keys that are not fields (e.g. 'se', 'multistart', 'bootstrap')
+    are kept in extras. to_dict() returns the plain nested dict.
+
+    The optimizer telemetry is kept packed (see pack_dict); fit.telemetry
+    unpacks it into a new dict on every access.
+
+    Fits with the same number of ratings stack into a MetaDFitTable.
+    """
+    __slots__ = ('values', 'nRatings', 'success', 'solver', 'estimation_method', '_telemetry', 'extras')
+
+    def __init__(self, values, nRatings, success, solver=None, estimation_method='MLE', telemetry=None, extras=None):
+        self.values = np.asarray(values, dtype=float)
+        self.nRatings = int(nRatings)
+        self.success = bool(success)
+        self.solver = solver
+        self.estimation_method = estimation_method
+        self.telemetry = telemetry
+        self.extras = extras
+
+    @property
+    def telemetry(self):
+        return None if self._telemetry is None else unpack_dict(self._telemetry)
+
+    @telemetry.setter
+    def telemetry(self, telemetry):
+        self._telemetry = None if telemetry is None else pack_dict(telemetry)
+
+    @classmethod
+    def from_fields(cls, nRatings, success, solver=None, estimation_method='MLE', telemetry=None, extras=None, **fields):
+        # MetaDFit from keyword arguments for every name of SCALAR_FIELDS and
+        # VECTOR_FIELDS
+        layout, width = field_layout(nRatings)
+        values = np.empty(width)
+        for name, index in layout.items():
+            values[index] = fields[name]
+        return cls(values, nRatings, success, solver, estimation_method, telemetry, extras)
+
+    @classmethod
+    def from_dict(cls, fit):
+        # MetaDFit from a dict in the layout of fit_meta_d_MLE (e.g. a fit
+        # pickled before fits were MetaDFit objects)
+        if isinstance(fit, MetaDFit):
+            return fit
+        fields = {name: fit[name] for name in SCALAR_FIELDS + VECTOR_FIELDS if name in fit}
+        for name in S1UNITS_FIELDS:
+            fields[name] = fit['S1units'][name]
+        extras = {key: value for key, value in fit.items() if key not in KEYS}
+        return cls.from_fields(len(fit['t2ca_rS1']) + 1, fit['success'], fit.get('solver'),
+                               fit.get('estimation_method', 'MLE'), fit.get('telemetry'), extras or None, **fields)
+
+    def __getattr__(self, name):
+        # only called for names that are not slots: the numeric fields
+        layout = field_layout(self.nRatings)[0] if name in SCALAR_FIELDS + VECTOR_FIELDS else None
+        if layout is None:
+            raise AttributeError(name)
+        return self.values[layout[name]]
+
+    def __getitem__(self, key):
+        if key == 'S1units':
+            return _S1UnitsView(self)
+        if key in LIST_FIELDS:
+            return _FieldList(self, key)
+        if key in SCALAR_FIELDS or key in VECTOR_FIELDS:
+            return getattr(self, key)
+        if key in ('success', 'solver', 'estimation_method', 'telemetry'):
+            return getattr(self, key)
+        if self.extras is not None and key in self.extras:
+            return self.extras[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in SCALAR_FIELDS or key in VECTOR_FIELDS:
+            self.values[field_layout(self.nRatings)[0][key]] = value
+        elif key in ('success', 'solver', 'estimation_method', 'telemetry'):
+            setattr(self, key, value)
+        elif key == 'S1units':
+            for name in S1UNITS_FIELDS:
+                self[name] = value[name]
+        else:
+            if self.extras is None:
+                self.extras = {}
+            self.extras[key] = value
+
+    def __contains__(self, key):
+        return key in KEYS or (self.extras is not None and key in self.extras)
+
+    def keys(self):
+        return list(KEYS) + ([] if self.extras is None else list(self.extras))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def to_dict(self):
+        # the nested dict fit_meta_d_MLE used to return, with copies of the
+        # numeric fields
+        fit = {}
+        for key in KEYS[:KEYS.index('telemetry') + 1]:
+            fit[key] = self[key]
+        if self.extras is not None and 'se' in self.extras:
+            fit['se'] = self.extras['se']
+        fit['S1units'] = dict(fit['S1units'])
+        for key in LIST_FIELDS:
+            fit[key] = getattr(self, key).tolist()
+        for key, value in (self.extras or {}).items():
+            fit[key] = value
+        for key in ('t2ca_rS1', 't2ca_rS2'):
+            fit[key] = fit[key].copy()
+        for key in ('t2c1_rS1', 't2c1_rS2'):
+            fit['S1units'][key] = fit['S1units'][key].copy()
+        return fit
+
+    def __repr__(self):
+        return (f"MetaDFit(nRatings={self.nRatings}, da={self.da:.4g}, meta_da={self.meta_da:.4g}, "
+                f"M_ratio={self.M_ratio:.4g}, logL={self.logL:.4g}, success={self.success})")
+
+
+class MetaDFitTable(object):
+    """
+    Many fits with the same number of ratings as columns: one float64 array
+    per numeric field (shape (N,) for scalars, (N, nRatings-1) for
+    vectors), plus success, solver and nit (from the telemetry) and any
+    extra per-fit columns given to from_fits. Columns are C-contiguous, so
+    to_numpy() and to_arrow() export them without copying.
+
+    table['meta_da'] is a column, table[i] the i'th fit as a MetaDFit
+    (telemetry and extras are not kept in the table).
+    """
+    __slots__ = ('nRatings', 'columns')
+
+    def __init__(self, nRatings, columns):
+        self.nRatings = int(nRatings)
+        self.columns = columns
+
+    @classmethod
+    def from_fits(cls, fits, **extra_columns):
+        # table of MetaDFit objects (or fit_meta_d_MLE dicts); extra_columns
+        # are per-fit values, e.g. beta=[fit['sweep']['beta'] for fit in fits]
+        fits = [MetaDFit.from_dict(fit) for fit in fits]
+        if not fits:
+            raise ValueError('cannot build a table from no fits')
+        nRatings = fits[0].nRatings
+        if any(fit.nRatings != nRatings for fit in fits):
+            raise ValueError('all fits of a table must have the same number of ratings')
+        layout, _ = field_layout(nRatings)
+        values = np.stack([fit.values for fit in fits])
+        columns = {name: np.ascontiguousarray(values[:, layout[name]]) for name in SCALAR_FIELDS + VECTOR_FIELDS}
+        columns['success'] = np.array([fit.success for fit in fits], dtype=bool)
+        columns['solver'] = np.array([str(fit.solver) for fit in fits])
+        columns['nit'] = np.array([(fit.telemetry or {}).get('nit', -1) for fit in fits], dtype=np.int64)
+        for name, column in extra_columns.items():
+            column = np.asarray(column)
+            if len(column) != len(fits):
+                raise ValueError(f"column {name!r} has {len(column)} values for {len(fits)} fits")
+            columns[name] = column
+        return cls(nRatings, columns)
+
+    def __len__(self):
+        return len(self.columns['success'])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        fields = {name: self.columns[name][key] for name in SCALAR_FIELDS + VECTOR_FIELDS}
+        return MetaDFit.from_fields(self.nRatings, self.columns['success'][key], str(self.columns['solver'][key]), **fields)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def column_names(self):
+        return list(self.columns)
+
+    def to_numpy(self):
+        # {column: array}, the table's own arrays (not copies)
+        return dict(self.columns)
+
+    def to_records(self):
+        # NumPy structured array with one record per fit (a copy)
+        dtype = [(name, column.dtype, column.shape[1:]) for name, column in self.columns.items()]
+        records = np.empty(len(self), dtype=dtype)
+        for name, column in self.columns.items():
+            records[name] = column
+        return records
+
+    def to_arrow(self):
+        # pyarrow.Table of the columns; vector fields become fixed-size list
+        # columns. numeric columns share memory with the table
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError('MetaDFitTable.to_arrow needs pyarrow (pip install pyarrow)')
+        arrays = {}
+        for name, column in self.columns.items():
+            if column.ndim == 2:
+                arrays[name] = pa.FixedSizeListArray.from_arrays(pa.array(column.reshape(-1)), column.shape[1])
+            else:
+                arrays[name] = pa.array(column)
+        return pa.table(arrays)
+
+    def __repr__(self):
+        return f"MetaDFitTable({len(self)} fits, nRatings={self.nRatings}, columns={self.column_names})"
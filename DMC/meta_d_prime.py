@@ -1,10 +1,541 @@
 import numpy as np
 from scipy.stats import norm
-from scipy.optimize import Bounds, LinearConstraint, minimize, SR1, NonlinearConstraint
+from scipy.optimize import Bounds, LinearConstraint, minimize, SR1, BFGS, NonlinearConstraint, OptimizeResult, approx_fprime
+from scipy.linalg import null_space
 import matplotlib.pyplot as plt
 import random
-from functools import partial
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from functools import partial, cached_property, lru_cache
+from scipy import sparse
+from scipy.special import ndtr, ndtri, expit, logit, log_ndtr, logsumexp, gammaln, stdtr, stdtrit
 from sklearn.metrics import brier_score_loss
+from fit_result import MetaDFit, MetaDFitTable
+
+
+def norm_cdf(x, loc=0, scale=1):
+    # norm.cdf(x, loc, scale) without the argument checks of scipy.stats,
+    # which dominate the cost on the small arrays of a fit
+    return ndtr((x - loc) / scale)
+
+
+def norm_pdf(x, loc=0, scale=1):
+    # norm.pdf(x, loc, scale), see norm_cdf
+    z = (x - loc) / scale
+    return np.exp(-0.5 * z**2) / (np.sqrt(2 * np.pi) * scale)
+
+
+def norm_dpdf(x, loc=0, scale=1):
+    # derivative of norm.pdf(x, loc, scale) with respect to x (0 at +-inf)
+    z = (x - loc) / scale
+    with np.errstate(invalid='ignore'):
+        dpdf = -z / scale * norm_pdf(x, loc, scale)
+    return np.where(np.isfinite(z), dpdf, 0.0)
+
+
+def norm_logcdf(x, loc=0, scale=1):
+    # log norm.cdf(x, loc, scale), accurate far into the lower tail
+    return log_ndtr((x - loc) / scale)
+
+
+def norm_logsf(x, loc=0, scale=1):
+    # log norm.sf(x, loc, scale), accurate far into the upper tail
+    return log_ndtr((loc - x) / scale)
+
+
+def norm_logpdf(x, loc=0, scale=1):
+    # log norm.pdf(x, loc, scale)
+    z = (x - loc) / scale
+    return -0.5 * z**2 - np.log(np.sqrt(2 * np.pi) * scale)
+
+
+def norm_dlogpdf(x, loc=0, scale=1):
+    # derivative of log norm.pdf(x, loc, scale) with respect to x
+    return -(x - loc) / scale**2
+
+
+class Type1Family(object):
+    """
+    A location-scale family for the type 1 distributions of the meta-d'
+    model, evaluated with vectorized closed forms: cdf, ppf, pdf, dpdf
+    (d pdf / dx) and the log-space terms logcdf, logsf, logpdf and dlogpdf
+    (d log pdf / dx), all with the signature (x, loc=0, scale=1).
+
+    scale is the standard deviation of the distribution, as for the normal
+    model, so that d' and meta-d' are in SD units whatever the family.
+
+    Pass family.cdf and family.ppf as fncdf and fninv, or pass the family
+    itself (or its name, see type1_family) as fncdf. The fit then has
+    analytic gradients and Hessians, as with norm.cdf.
+    """
+    name = None
+
+    def pdf(self, x, loc=0, scale=1):
+        return np.exp(self.logpdf(x, loc, scale))
+
+    def dpdf(self, x, loc=0, scale=1):
+        return self.pdf(x, loc, scale) * self.dlogpdf(x, loc, scale)
+
+    def __repr__(self):
+        return f"Type1Family({self.name})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.name == other.name
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.name))
+
+
+class NormalFamily(Type1Family):
+    # the normal model; with s != 1 it is the unequal-variance Gaussian model
+    name = 'normal'
+
+    def cdf(self, x, loc=0, scale=1):
+        return norm_cdf(x, loc, scale)
+
+    def ppf(self, q, loc=0, scale=1):
+        return loc + scale * ndtri(q)
+
+    def pdf(self, x, loc=0, scale=1):
+        return norm_pdf(x, loc, scale)
+
+    def dpdf(self, x, loc=0, scale=1):
+        return norm_dpdf(x, loc, scale)
+
+    def logcdf(self, x, loc=0, scale=1):
+        return norm_logcdf(x, loc, scale)
+
+    def logsf(self, x, loc=0, scale=1):
+        return norm_logsf(x, loc, scale)
+
+    def logpdf(self, x, loc=0, scale=1):
+        return norm_logpdf(x, loc, scale)
+
+    def dlogpdf(self, x, loc=0, scale=1):
+        return norm_dlogpdf(x, loc, scale)
+
+
+class LogisticFamily(Type1Family):
+    # logistic distribution with standard deviation scale, i.e. logistic
+    # scale parameter scale * sqrt(3) / pi
+    name = 'logistic'
+
+    def __z(self, x, loc, scale):
+        b = scale * np.sqrt(3) / np.pi
+        return (x - loc) / b, b
+
+    def cdf(self, x, loc=0, scale=1):
+        return expit(self.__z(x, loc, scale)[0])
+
+    def ppf(self, q, loc=0, scale=1):
+        return loc + scale * np.sqrt(3) / np.pi * logit(q)
+
+    def logcdf(self, x, loc=0, scale=1):
+        return -np.logaddexp(0, -self.__z(x, loc, scale)[0])
+
+    def logsf(self, x, loc=0, scale=1):
+        return -np.logaddexp(0, self.__z(x, loc, scale)[0])
+
+    def logpdf(self, x, loc=0, scale=1):
+        # pdf = F (1 - F) / b
+        z, b = self.__z(x, loc, scale)
+        return -np.logaddexp(0, -z) - np.logaddexp(0, z) - np.log(b)
+
+    def dlogpdf(self, x, loc=0, scale=1):
+        z, b = self.__z(x, loc, scale)
+        return (1 - 2 * expit(z)) / b
+
+
+class StudentTFamily(Type1Family):
+    # Student-t distribution with df > 2 degrees of freedom and standard
+    # deviation scale, i.e. t scale parameter scale * sqrt((df - 2) / df)
+    def __init__(self, df):
+        if not df > 2:
+            raise ValueError('the Student-t family needs df > 2 for a finite standard deviation')
+        self.df = float(df)
+        self.name = f"student_t({self.df:g})"
+        self.log_norm = gammaln((self.df + 1) / 2) - gammaln(self.df / 2) - 0.5 * np.log(self.df * np.pi)
+
+    def __z(self, x, loc, scale):
+        b = scale * np.sqrt((self.df - 2) / self.df)
+        return (x - loc) / b, b
+
+    def cdf(self, x, loc=0, scale=1):
+        return stdtr(self.df, self.__z(x, loc, scale)[0])
+
+    def ppf(self, q, loc=0, scale=1):
+        return loc + scale * np.sqrt((self.df - 2) / self.df) * stdtrit(self.df, q)
+
+    def logcdf(self, x, loc=0, scale=1):
+        # the tails are polynomial, so stdtr only underflows absurdly far out
+        with np.errstate(divide='ignore'):
+            return np.log(stdtr(self.df, self.__z(x, loc, scale)[0]))
+
+    def logsf(self, x, loc=0, scale=1):
+        with np.errstate(divide='ignore'):
+            return np.log(stdtr(self.df, -self.__z(x, loc, scale)[0]))
+
+    def logpdf(self, x, loc=0, scale=1):
+        z, b = self.__z(x, loc, scale)
+        return self.log_norm - np.log(b) - (self.df + 1) / 2 * np.log1p(z**2 / self.df)
+
+    def dlogpdf(self, x, loc=0, scale=1):
+        # 0 at +-inf
+        z, b = self.__z(x, loc, scale)
+        with np.errstate(invalid='ignore'):
+            dlogpdf = -(self.df + 1) * z / (self.df + z**2) / b
+        return np.where(np.isfinite(z), dlogpdf, 0.0)
+
+
+TYPE1_FAMILIES = {
+    'normal': NormalFamily(),
+    'gaussian': NormalFamily(),
+    'logistic': LogisticFamily(),
+}
+
+
+def type1_family(name):
+    # Type1Family from its name: 'normal' (or 'gaussian'), 'logistic' or
+    # 'student_t(df)', e.g. 'student_t(5)'. the unequal-variance Gaussian
+    # model is the normal family with the s argument of the fit
+    key = name.strip().lower().replace(' ', '')
+    if key in TYPE1_FAMILIES:
+        return TYPE1_FAMILIES[key]
+    if key.startswith('student_t(') and key.endswith(')'):
+        return StudentTFamily(float(key[len('student_t('):-1]))
+    raise ValueError(f"unknown type 1 family {name!r}; expected one of {sorted(TYPE1_FAMILIES)} or 'student_t(df)'")
+
+
+def resolve_type1_family(fncdf, fninv):
+    # (fncdf, fninv) with a family name or Type1Family in fncdf replaced by
+    # the family's cdf and ppf; anything else is returned unchanged
+    if isinstance(fncdf, str):
+        fncdf = type1_family(fncdf)
+    if isinstance(fncdf, Type1Family):
+        return fncdf.cdf, fncdf.ppf
+    return fncdf, fninv
+
+
+def get_type1_family(fncdf):
+    # the Type1Family whose cdf fncdf is, or None
+    owner = getattr(fncdf, '__self__', None)
+    if isinstance(owner, Type1Family) and fncdf.__name__ == 'cdf':
+        return owner
+    return None
+
+
+def is_norm_cdf(fncdf):
+    # compare by type so that norm.cdf still matches after being pickled
+    # (e.g. when sent to a process pool)
+    return isinstance(getattr(fncdf, '__self__', None), type(norm)) and fncdf.__name__ == 'cdf'
+
+
+def get_cdf_derivatives(fncdf):
+    # (pdf, d pdf / dx) for type 1 CDFs with closed-form derivatives.
+    # returns None for any other fncdf, in which case the fit falls back to
+    # finite-difference gradients
+    if is_norm_cdf(fncdf):
+        return norm_pdf, norm_dpdf
+    family = get_type1_family(fncdf)
+    if family is not None:
+        return family.pdf, family.dpdf
+    return None
+
+
+def get_fast_cdf(fncdf):
+    # equivalent of fncdf used inside the fit
+    return norm_cdf if is_norm_cdf(fncdf) else fncdf
+
+
+def get_log_cdf(fncdf):
+    # (log cdf, log sf, log pdf, d log pdf / dx) for type 1 CDFs that can be
+    # evaluated in log space. returns None for any other fncdf, whose logs are
+    # then taken of fncdf and of its derivatives
+    if is_norm_cdf(fncdf):
+        return norm_logcdf, norm_logsf, norm_logpdf, norm_dlogpdf
+    family = get_type1_family(fncdf)
+    if family is not None:
+        return family.logcdf, family.logsf, family.logpdf, family.dlogpdf
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _cached_inverse_cdf(fninv, rates):
+    values = np.asarray(fninv(np.array(rates)), dtype=float)
+    values.flags.writeable = False
+    return values
+
+
+def inverse_cdf(fninv, rates):
+    # fninv(rates) for the initial guess. the values are cached by fninv and
+    # rates, since sweeps, multistart fits and repeated analyses of a file
+    # ask for the inverse CDF of the same observed rates again and again.
+    # norm.ppf is evaluated with ndtri, without the argument checks of
+    # scipy.stats
+    rates = np.asarray(rates, dtype=float)
+    if rates.size > 1024:
+        # a batch of tables, which is not worth keeping
+        return np.asarray(fninv(rates), dtype=float)
+    if isinstance(getattr(fninv, '__self__', None), type(norm)) and fninv.__name__ == 'ppf':
+        fninv = TYPE1_FAMILIES['normal'].ppf
+    try:
+        values = _cached_inverse_cdf(fninv, tuple(rates.ravel().tolist()))
+    except TypeError:
+        # unhashable fninv
+        return np.asarray(fninv(rates), dtype=float)
+    return values.reshape(rates.shape).copy()
+
+
+class _ModelTerms(object):
+    """
+    The type 1 distributions of the meta-d' model at a stack of parameter
+    vectors X (one row per fit): the means mu and SDs sd of S1 and S2 and
+    d mu / d meta_d1 (dmu), shape (B, 2, 1), and, at the points [0, X[:, 1:]]
+    (type 1 criterion, then the type 2 criteria), shape (B, 2, 2*nRatings-1):
+    the log CDF logF, the log survival function logS, the log PDF logf and
+    the derivative of the log PDF dlogf of both distributions.
+
+    Probabilities are only ever combined in log space, so that tables whose
+    fitted criteria lie far out in the tails (nearly empty rating cells)
+    neither underflow nor lose all precision in 1 - F.
+
+    The terms are only computed on first use, so the loss, the idealization
+    constraint and their derivatives at one iterate share a single
+    evaluation of each.
+    """
+    def __init__(self, X, mu, sd, dmu, fncdf):
+        self.X = X
+        self.mu = mu
+        self.sd = sd
+        self.dmu = dmu
+        self.fncdf = fncdf
+        self.log_cdf = get_log_cdf(fncdf)
+        self.points = np.concatenate((np.zeros((len(X), 1)), X[:, 1:]), axis=1)[:, np.newaxis, :]
+
+    @cached_property
+    def F(self):
+        return get_fast_cdf(self.fncdf)(self.points, self.mu, self.sd)
+
+    @cached_property
+    def logF(self):
+        if self.log_cdf is not None:
+            return self.log_cdf[0](self.points, self.mu, self.sd)
+        with np.errstate(divide='ignore'):
+            return np.log(self.F)
+
+    @cached_property
+    def logS(self):
+        if self.log_cdf is not None:
+            return self.log_cdf[1](self.points, self.mu, self.sd)
+        with np.errstate(divide='ignore'):
+            return np.log1p(-self.F)
+
+    @cached_property
+    def logf(self):
+        if self.log_cdf is not None:
+            return self.log_cdf[2](self.points, self.mu, self.sd)
+        with np.errstate(divide='ignore'):
+            return np.log(get_cdf_derivatives(self.fncdf)[0](self.points, self.mu, self.sd))
+
+    @cached_property
+    def dlogf(self):
+        if self.log_cdf is not None:
+            return self.log_cdf[3](self.points, self.mu, self.sd)
+        pdf, dpdf = get_cdf_derivatives(self.fncdf)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return dpdf(self.points, self.mu, self.sd) / pdf(self.points, self.mu, self.sd)
+
+
+class _LockstepEvaluator(object):
+    """
+    Runs many independent optimizations in lockstep so that their function
+    evaluations can be vectorized.
+
+    Every optimization runs in a worker thread (at most batch_size at a time)
+    and calls evaluate(kind, x[, v]) for each objective / constraint /
+    derivative value it needs. A call blocks until every running worker is
+    waiting on one; the pending requests are then grouped by kind and each
+    group is answered with a single evaluate_batch(kind, rows, X, V) call.
+    Each optimization therefore follows exactly the path it would follow on
+    its own.
+    """
+    def __init__(self, evaluate_batch, batch_size):
+        self.evaluate_batch = evaluate_batch
+        self.batch_size = batch_size
+        self.cond = threading.Condition()
+        self.requests = {}
+        self.answers = {}
+        self.running = 0
+
+    def __request(self, worker, row, kind, x, v=None):
+        with self.cond:
+            self.requests[worker] = (row, kind, np.array(x, dtype=float), v)
+            self.cond.notify_all()
+            while worker not in self.answers:
+                self.cond.wait()
+            return self.answers.pop(worker)
+
+    def __serve(self):
+        # answer all pending requests, grouped by kind
+        by_kind = {}
+        for worker, (row, kind, x, v) in self.requests.items():
+            by_kind.setdefault(kind, []).append((worker, row, x, v))
+        self.requests = {}
+        for kind, reqs in by_kind.items():
+            rows = np.array([r[1] for r in reqs])
+            X = np.stack([r[2] for r in reqs])
+            V = np.stack([r[3] for r in reqs]) if kind == 'cons_hess' else None
+            try:
+                values = self.evaluate_batch(kind, rows, X, V)
+            except Exception as e:
+                values = [e] * len(reqs)
+            for (worker, _, _, _), value in zip(reqs, values):
+                self.answers[worker] = value
+        self.cond.notify_all()
+
+    def run(self, fit_one, items):
+        # fit_one(row, evaluate) -> result, for every row in items
+        queue = list(items)
+        results = {}
+        errors = []
+
+        def worker(worker_id):
+            try:
+                while True:
+                    with self.cond:
+                        if not queue:
+                            break
+                        row = queue.pop(0)
+
+                    def evaluate(kind, x, v=None):
+                        value = self.__request(worker_id, row, kind, x, v)
+                        if isinstance(value, Exception):
+                            raise value
+                        return value
+                    results[row] = fit_one(row, evaluate)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                with self.cond:
+                    self.running -= 1
+                    self.cond.notify_all()
+
+        threads = [threading.Thread(target=worker, args=(k,), daemon=True) for k in range(min(self.batch_size, len(queue)))]
+        self.running = len(threads)
+        for t in threads:
+            t.start()
+        with self.cond:
+            while self.running > 0:
+                if self.requests and len(self.requests) >= self.running:
+                    self.__serve()
+                else:
+                    self.cond.wait()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return results
+
+
+class _FitMonitor(object):
+    """
+    Budgets and telemetry of one fit_meta_d_MLE run.
+
+    wrap(kind, fn) counts and times the calls of an objective, constraint or
+    derivative function. The solver calls iteration(x, loss,
+    constr_violation) once per iteration. It passes a progress record to the
+    user callback and returns True once the maxiter or time_budget (seconds)
+    budget is used up, which tells the solver to stop.
+    """
+    def __init__(self, maxiter=None, time_budget=None, callback=None):
+        self.maxiter = maxiter
+        self.time_budget = time_budget
+        self.callback = callback
+        self.start = time.perf_counter()
+        self.calls = {}
+        self.times = {}
+        self.nit = 0
+        self.stopped = None
+
+    def wrap(self, kind, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.calls[kind] = self.calls.get(kind, 0) + 1
+                self.times[kind] = self.times.get(kind, 0.0) + time.perf_counter() - start
+        return timed
+
+    def iteration(self, x, loss, constr_violation):
+        self.nit += 1
+        elapsed = time.perf_counter() - self.start
+        if self.callback is not None:
+            self.callback({'iteration': self.nit, 'elapsed': elapsed, 'loss': float(loss),
+                           'constr_violation': float(constr_violation), 'x': np.array(x)})
+        if self.maxiter is not None and self.nit >= self.maxiter:
+            self.stopped = 'maxiter'
+        elif self.time_budget is not None and elapsed >= self.time_budget:
+            self.stopped = 'time_budget'
+        return self.stopped is not None
+
+    def telemetry(self, results):
+        # telemetry record of a finished run with minimize() result results
+        time_total = time.perf_counter() - self.start
+        time_objective = sum(self.times.values())
+        if self.stopped is not None:
+            termination = self.stopped
+        else:
+            termination = 'converged' if results.success else 'failed'
+        return {
+            'nit': int(getattr(results, 'nit', self.nit)),
+            'nfev': int(getattr(results, 'nfev', self.calls.get('fun', 0))),
+            'njev': int(getattr(results, 'njev', self.calls.get('jac', 0))),
+            'constr_violation': float(getattr(results, 'constr_violation', np.nan)),
+            'time_total': time_total,
+            'time_objective': time_objective,
+            'time_optimizer': time_total - time_objective,
+            'termination': termination,
+            'message': str(results.message),
+            'calls': dict(self.calls),
+            'call_times': dict(self.times),
+        }
+
+
+def _fit_meta_d_start(args):
+    # one start of fit_meta_d_MLE_multistart; module level so it can be
+    # sent to a process pool
+    nR_S1, nR_S2, beta, p, s, fncdf, fninv, guess = args
+    return Meta_d_prime().fit_meta_d_MLE(nR_S1, nR_S2, beta, p, s=s, fncdf=fncdf, fninv=fninv, guess=guess)
+
+
+def _fit_meta_d_resample(args):
+    # one replicate of fit_meta_d_MLE_bootstrap / _jackknife: fit_meta_d_MLE started from
+    # the full-data solution, refitted from the default guess if that fails.
+    # returns (meta_da, M_ratio, M_diff, success), NaN if every fit raised.
+    # deadline (a time.time() value, as the replicate may run in another
+    # process; None for no limit) is passed to the fits as their time_budget,
+    # and None is returned if it passes before a fit finished
+    nR_S1, nR_S2, beta, p, s, fncdf, fninv, guess, solver, deadline = args
+    computer = Meta_d_prime()
+    fit = None
+    for start in (guess, None):
+        time_budget = None if deadline is None else deadline - time.time()
+        if time_budget is not None and time_budget <= 0:
+            return None
+        try:
+            fit = computer.fit_meta_d_MLE(nR_S1, nR_S2, beta, p, s=s, fncdf=fncdf, fninv=fninv, guess=start, solver=solver,
+                                          time_budget=time_budget)
+        except (ValueError, np.linalg.LinAlgError):
+            continue
+        if fit['telemetry']['termination'] == 'time_budget':
+            return None
+        if fit['success']:
+            break
+    if fit is None:
+        return np.nan, np.nan, np.nan, False
+    return fit['meta_da'], fit['M_ratio'], fit['M_diff'], bool(fit['success'])
 
 
 class Meta_d_prime(object):
@@ -77,15 +608,9 @@ class Meta_d_prime(object):
         % responded S2, rating=3 : 89 times
         """
 
-        for i in range(len(stimID)):
-            if stimID[i] == "yes":
-                stimID[i] = 1
-            if stimID[i] == "no":
-                stimID[i] = 0
-            if response[i] == "yes":
-                response[i] = 1
-            if response[i] == "no":
-                response[i] = 0
+        stimID = self.__binary_codes(stimID)
+        response = self.__binary_codes(response)
+        rating = np.asarray(rating, dtype=float)
 
         ''' sort inputs '''
         # check for valid inputs
@@ -93,17 +618,7 @@ class Meta_d_prime(object):
             raise('stimID, response, and rating input vectors must have the same lengths')
         
         ''' filter bad trials '''
-        tempstim = []
-        tempresp = []
-        tempratg = []
-        for s,rp,rt in zip(stimID,response,rating):
-            if (s == 0 or s == 1) and (rp == 0 or rp == 1) and (rt >=1 and rt <= nRatings):
-                tempstim.append(s)
-                tempresp.append(rp)
-                tempratg.append(rt)
-        stimID = tempstim
-        response = tempresp
-        rating = tempratg
+        valid = (stimID >= 0) & (response >= 0) & (rating >= 1) & (rating <= nRatings) & (rating == np.floor(rating))
         
         ''' set input defaults '''
         if padAmount == None:
@@ -112,291 +627,691 @@ class Meta_d_prime(object):
             
         
         ''' compute response counts '''
-        nR_S1 = []
-        nR_S2 = []
-
-        # S1 responses
-        for r in range(nRatings,0,-1):
-            cs1, cs2 = 0,0
-            for s,rp,rt in zip(stimID, response, rating):
-                if s==0 and rp==0 and rt==r:
-                    cs1 += 1
-                if s==1 and rp==0 and rt==r:
-                    cs2 += 1
-            nR_S1.append(cs1)
-            nR_S2.append(cs2)
-        
-        # S2 responses
-        for r in range(1,nRatings+1,1):
-            cs1, cs2 = 0,0
-            for s,rp,rt in zip(stimID, response, rating):
-                if s==0 and rp==1 and rt==r:
-                    cs1 += 1
-                if s==1 and rp==1 and rt==r:
-                    cs2 += 1
-            nR_S1.append(cs1)
-            nR_S2.append(cs2)
+        # position of each trial in nR_S1 / nR_S2: "S1" responses run from
+        # rating nRatings down to 1, "S2" responses from rating 1 up to nRatings.
+        # S2 trials are offset by 2*nRatings so that a single bincount fills both
+        rating = rating[valid].astype(int)
+        position = np.where(response[valid] == 0, nRatings - rating, nRatings + rating - 1)
+        counts = np.bincount(stimID[valid] * 2*nRatings + position, minlength=4*nRatings)
+        nR_S1 = counts[:2*nRatings]
+        nR_S2 = counts[2*nRatings:]
         
         # pad response counts to avoid zeros
         if padCells:
-            nR_S1 = [n+padAmount for n in nR_S1]
-            nR_S2 = [n+padAmount for n in nR_S2]
+            nR_S1 = nR_S1 + padAmount
+            nR_S2 = nR_S2 + padAmount
             
-        return nR_S1, nR_S2
+        return nR_S1.tolist(), nR_S2.tolist()
+
+    def __binary_codes(self, values):
+        # 0 / 1 stimulus or response codes of a trial vector ("no" / "yes" count
+        # as 0 / 1), and -1 for any other value. as before, "yes" / "no" entries
+        # of a list are replaced by 1 / 0 in place
+        codes = np.asarray(values)
+        if codes.dtype.kind not in 'biuf':
+            codes = np.empty(len(values), dtype=object)
+            codes[:] = values
+            codes = np.where(codes == "yes", 1, np.where(codes == "no", 0, codes))
+            if isinstance(values, list):
+                values[:] = codes.tolist()
+        return np.where(codes == 1, 1, np.where(codes == 0, 0, -1))
     
-    def __fit_meta_d_logL(self, parameters, inputObj):
-        # if any(np.isnan(parameters)) or any(np.isinf(parameters)):
-        #     print("parameters nan inf!!!!!!!!!")
-        #     return 1e+300
+    def __type2_obs_rates(self, nR_S1, nR_S2, nRatings):
+        # observed type 2 rates, stacked as [FAR2_rS1, HR2_rS1, FAR2_rS2, HR2_rS2]
+        # along the second to last axis (count tables may be stacked in front)
+        # I_nR and C_nR are rating trial counts for incorrect and correct trials
+        # element i corresponds to # (in)correct w/ rating i
+        nR_S1 = np.asarray(nR_S1, dtype=float)
+        nR_S2 = np.asarray(nR_S2, dtype=float)
+        I_nR_rS2 = nR_S1[..., nRatings:]
+        I_nR_rS1 = np.flip(nR_S2[..., 0:nRatings], axis=-1)
+        C_nR_rS2 = nR_S2[..., nRatings:]
+        C_nR_rS1 = np.flip(nR_S1[..., 0:nRatings], axis=-1)
 
+        counts = np.stack([I_nR_rS1, C_nR_rS1, I_nR_rS2, C_nR_rS2], axis=-2)
+        # sum(counts[(i+1):]) for i in range(nRatings-1), via a reversed cumsum
+        tail = np.flip(np.cumsum(np.flip(counts, axis=-1), axis=-1), axis=-1)
+        return tail[..., 1:] / tail[..., :1]
 
-        
+    def __fit_meta_d_logL(self, parameters, inputObj):
+        return self.__fit_meta_d_logL_batch(parameters, inputObj)[0]
+    
+    def callback(self, x, inputObj):
+        loss = self.__fit_meta_d_logL(x)
+        self.loss_record.append(loss)
 
-        #print("lossx: ", parameters)
-        meta_d1 = parameters[0]
-        t2c1    = parameters[1:]
-        nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p = inputObj
-        
-        # define mean and SD of S1 and S2 distributions
-        S1mu = -meta_d1/2
-        S1sd = 1
-        S2mu = meta_d1/2
-        S2sd = S1sd/s
 
-        # adjust so that the type 1 criterion is set at 0
-        # (this is just to work with optimization toolbox constraints...
-        #  to simplify defining the upper and lower bounds of type 2 criteria)
-        S1mu = S1mu - eval(constant_criterion)
-        S2mu = S2mu - eval(constant_criterion)
+    def __idealization_cons_func(self, x, inputObj, verbose=False):
+        diff = self.__idealization_cons_batch(x, inputObj)[0]
+        if verbose:
+            print("x:", x)
+            print(diff)
+        return diff
 
-        t1c1 = 0
+    def __sdt_means(self, meta_d1, inputObj):
+        # means and SDs of the S1 and S2 distributions (type 1 criterion at 0),
+        # and the derivative of the means with respect to meta_d1.
+        # meta_d1 has shape (B,) and d1, t1c1 and s are scalars or (B,) arrays;
+        # the returned arrays have shape (B, 2, 1) to broadcast over criteria
+        nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p, obs_rates, model_cache = inputObj
+        k = np.reshape(np.asarray(t1c1) / np.asarray(d1), (-1, 1, 1))
+        dmu = np.concatenate([-(0.5 + k), 0.5 - k], axis=1)
+        mu = np.reshape(meta_d1, (-1, 1, 1)) * dmu
+        s = np.reshape(np.asarray(s, dtype=float), (-1, 1, 1))
+        sd = np.concatenate([np.ones_like(s), 1/s], axis=1)
+        return mu, sd, dmu
 
-        # set up MLE analysis
-        # get type 2 response counts
-        # S1 responses
-        # nC_rS1 = [nR_S1[i] for i in range(nRatings)]
-        # nI_rS1 = [nR_S2[i] for i in range(nRatings)]
-        # # S2 responses
-        # nC_rS2 = [nR_S2[i+nRatings] for i in range(nRatings)]
-        # nI_rS2 = [nR_S1[i+nRatings] for i in range(nRatings)]
+    def __model_terms(self, X, inputObj):
+        # _ModelTerms of a stack of parameter vectors. a single fit keeps the
+        # terms of its latest iterate in model_cache, since the optimizer asks
+        # for the loss, the constraint and their derivatives at the same x
+        nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p, obs_rates, model_cache = inputObj
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if model_cache is not None and 'X' in model_cache and np.array_equal(model_cache['X'], X):
+            return model_cache['terms']
+        mu, sd, dmu = self.__sdt_means(X[:, 0], inputObj)
+        terms = _ModelTerms(X, mu, sd, dmu, fncdf)
+        if model_cache is not None:
+            model_cache['X'] = X.copy()
+            model_cache['terms'] = terms
+        return terms
 
-        # get type 2 probabilities
-        C_area_rS1 = fncdf(t1c1,S1mu,S1sd)
-        I_area_rS1 = fncdf(t1c1,S2mu,S2sd)
-        
-        C_area_rS2 = 1-fncdf(t1c1,S2mu,S2sd)
-        I_area_rS2 = 1-fncdf(t1c1,S1mu,S1sd)
+    def __type2_rate_derivs(self, X, inputObj, order=1):
+        # estimated type 2 rates for a (B, 2*nRatings-1) stack of parameter
+        # vectors, shape (B, 4, nRatings-1) in the layout of obs_rates, and their
+        # first (order >= 1) and second (order == 2) derivatives. every rate
+        # depends on meta_d1 and on a single criterion, whose column in the
+        # parameter vector is returned as idx
+        nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p, obs_rates, model_cache = inputObj
+        terms = self.__model_terms(X, inputObj)
 
+        # rows: FAR2_rS1, HR2_rS1, FAR2_rS2, HR2_rS2, each the ratio N / D of
+        # the mass beyond a criterion to the mass beyond 0 on the side of the
+        # response: log CDFs for "S1" responses, log survival functions for
+        # "S2" responses
+        dist = np.array([[1], [0], [0], [1]])
+        side = np.array([[0], [0], [1], [1]])
+        sign = np.array([[1.0], [1.0], [-1.0], [-1.0]])
+        lower = np.arange(nRatings-1, 0, -1)
+        upper = np.arange(nRatings, 2*nRatings-1)
+        idx = np.stack([lower, lower, upper, upper])
 
-        I_nR_rS2 = nR_S1[nRatings:]
-        I_nR_rS1 = list(np.flip(nR_S2[0:nRatings],axis=0))
-        
-        C_nR_rS2 = nR_S2[nRatings:]
-        C_nR_rS1 = list(np.flip(nR_S1[0:nRatings],axis=0))
-        
-        obs_FAR2_rS2 = [sum( I_nR_rS2[(i+1):] ) / sum(I_nR_rS2) for i in range(nRatings-1)]
-        obs_HR2_rS2 = [sum( C_nR_rS2[(i+1):] ) / sum(C_nR_rS2) for i in range(nRatings-1)]
-        obs_FAR2_rS1 = [sum( I_nR_rS1[(i+1):] ) / sum(I_nR_rS1) for i in range(nRatings-1)]
-        obs_HR2_rS1 = [sum( C_nR_rS1[(i+1):] ) / sum(C_nR_rS1) for i in range(nRatings-1)]
+        logG = np.stack([terms.logF, terms.logS], axis=1)
+        logN = logG[:, side, dist, idx]
+        logD = logG[:, side, dist, 0]
+        rates = np.exp(logN - logD)
+        if order == 0:
+            return rates
 
+        # u = log(rate) = logN - logD, where d logN / dx = h_N (the hazard of
+        # the criterion, signed) and N, D depend on meta_d1 through x - mu
+        logf = terms.logf
+        dmu = terms.dmu[:, dist, 0]
+        h_N = sign * np.exp(logf[:, dist, idx] - logN)
+        h_D = sign * np.exp(logf[:, dist, 0] - logD)
+        u_x = h_N
+        u_m = -dmu * (h_N - h_D)
+        r_x = rates * u_x
+        r_m = rates * u_m
+        if order == 1:
+            return rates, idx, r_m, r_x
 
-        est_FAR2_rS2 = []
-        est_HR2_rS2 = []
-        
-        est_FAR2_rS1 = []
-        est_HR2_rS1 = []
-        
-        t2c1 = t2c1 + eval(constant_criterion)
-        for i in range(nRatings-1):
-            
-            t2c1_lower = t2c1[(nRatings-1)-(i+1)]
-            t2c1_upper = t2c1[(nRatings-1)+i]
-                
-            I_FAR_area_rS2 = 1-fncdf(t2c1_upper,S1mu,S1sd)
-            C_HR_area_rS2  = 1-fncdf(t2c1_upper,S2mu,S2sd)
-        
-            I_FAR_area_rS1 = fncdf(t2c1_lower,S2mu,S2sd)
-            C_HR_area_rS1  = fncdf(t2c1_lower,S1mu,S1sd)
-        
-            est_FAR2_rS2.append((I_FAR_area_rS2 + 1e-9) / (I_area_rS2 + 1e-9))
-            est_HR2_rS2.append((C_HR_area_rS2 + 1e-9)  / (C_area_rS2 + 1e-9))
-            
-            est_FAR2_rS1.append((I_FAR_area_rS1 + 1e-9) / (I_area_rS1 + 1e-9))
-            est_HR2_rS1.append((C_HR_area_rS1 + 1e-9) / (C_area_rS1 + 1e-9))
-        
-        # print("obs_FAR2_rS1 ", obs_FAR2_rS1)
-        # print("obs_FAR2_rS2 ", obs_FAR2_rS2)
-        # print("obs_HR2_rS1 ", obs_HR2_rS1)
-        # print("obs_HR2_rS2 ", obs_HR2_rS2)
-        # print("est_FAR2_rS1 ", est_FAR2_rS1)
-        # print("est_FAR2_rS2 ", est_FAR2_rS2)
-        # print("est_HR2_rS1 ", est_HR2_rS1)
-        # print("est_HR2_rS2 ", est_HR2_rS2)
-
-        t2c1x = [-np.inf]
-        t2c1x.extend(t2c1[0:(nRatings-1)])
-        t2c1x.append(t1c1)
-        t2c1x.extend(t2c1[(nRatings-1):])
-        t2c1x.append(np.inf)
-
-        prC_rS1 = [( fncdf(t2c1x[i+1],S1mu,S1sd) - fncdf(t2c1x[i],S1mu,S1sd) + 1e-9 ) / (C_area_rS1 + 1e-9) for i in range(nRatings)]
-        prI_rS1 = [( fncdf(t2c1x[i+1],S2mu,S2sd) - fncdf(t2c1x[i],S2mu,S2sd) + 1e-9) / (I_area_rS1 + 1e-9) for i in range(nRatings)]
-
-        prC_rS2 = [( (1-fncdf(t2c1x[nRatings+i],S2mu,S2sd)) - (1-fncdf(t2c1x[nRatings+i+1],S2mu,S2sd)) + 1e-9) / (C_area_rS2 + 1e-9) for i in range(nRatings)]
-        prI_rS2 = [( (1-fncdf(t2c1x[nRatings+i],S1mu,S1sd)) - (1-fncdf(t2c1x[nRatings+i+1],S1mu,S1sd)) + 1e-9) / (I_area_rS2 + 1e-9) for i in range(nRatings)]
-        
-
-        # idealization constraint 1
-        S1_ratio = []
-        S2_ratio = []
-            
-        for C, I in zip(prC_rS1, prI_rS1):
-            if(I * I_area_rS1) == 0:
-                print("div 0 s1")
-            S1_ratio.append((C * C_area_rS1 + 1e-9) / (I * I_area_rS1 + 1e-9))
-
-        for C, I in zip(prC_rS2, prI_rS2):
-            if(I * I_area_rS2) == 0:
-                print("div 0 S2")
-            S2_ratio.append((C * C_area_rS2 + 1e-9) / (I * I_area_rS2 + 1e-9))
-
-        diff = []
-        for i in range(len(S1_ratio) - 1):
-            diff.append(S1_ratio[i] - S1_ratio[i + 1])
-        for i in range(len(S2_ratio) - 1):
-            diff.append(S2_ratio[i + 1] - S2_ratio[i])
-        loss_idealization = -np.log(sum(diff))
-        # print("S1_ratio:", S1_ratio)
-        # print("S2_ratio:", S2_ratio)
-        # print("diff:", diff)
-        # if all(x >= beta and x < 1e5 for x in diff) == False:
-        #     return 1e+30
-
-        # if meta_d1 >= d1:
-        #     return 1e+300
-        
-        # idealization constraint 2        
-        # print(criterion_distance)
-        # alpha = 2
-        # calculate logL
-        # logL = np.sum([
-        #         nC_rS1[i]*np.log(prC_rS1[i]) \
-        #         + nI_rS1[i]*np.log(prI_rS1[i]) \
-        #         + nC_rS2[i]*np.log(prC_rS2[i]) \
-        #         + nI_rS2[i]*np.log(prI_rS2[i]) for i in range(nRatings)]) 
-        # logL += alpha * np.log(criterion_distance)
-        
-        FAR2_rS1_error = sum([(a - b) ** 2 for a, b in zip(obs_FAR2_rS1, est_FAR2_rS1)]) / len(obs_FAR2_rS1)
-        HR2_rS1_error = sum([(a - b) ** 2 for a, b in zip(obs_HR2_rS1, est_HR2_rS1)]) / len(obs_HR2_rS1)
-        FAR2_rS2_error = sum([(a - b) ** 2 for a, b in zip(obs_FAR2_rS2, est_FAR2_rS2)]) / len(obs_FAR2_rS2)
-        HR2_rS2_error = sum([(a - b) ** 2 for a, b in zip(obs_HR2_rS2, est_HR2_rS2)]) / len(obs_HR2_rS2)
-        loss = FAR2_rS1_error + FAR2_rS2_error + HR2_rS1_error + HR2_rS2_error
-
-        if np.isinf(loss) or np.isnan(loss):
-    #        logL=-np.inf
-            loss=1e+300 # returning "-inf" may cause optimize.minimize() to fail
-        #self.loss_record.append(-logL)
+        dlogf = terms.dlogf
+        k_N = h_N * (dlogf[:, dist, idx] - h_N)
+        k_D = h_D * (dlogf[:, dist, 0] - h_D)
+        r_xx = rates * (u_x**2 + k_N)
+        r_xm = rates * (u_x * u_m - dmu * k_N)
+        r_mm = rates * (u_m**2 + dmu**2 * (k_N - k_D))
+        return rates, idx, r_m, r_x, r_mm, r_xm, r_xx
+
+    def __fit_meta_d_logL_batch(self, X, inputObj):
+        # loss of every row of X, shape (B,)
+        nRatings, obs_rates = inputObj[2], inputObj[11]
+        rates = self.__type2_rate_derivs(X, inputObj, order=0)
+        loss = np.sum((obs_rates - rates) ** 2, axis=(1, 2)) / (nRatings - 1)
+        # rates are finite for every finite x when fncdf has log-space
+        # evaluations (see get_log_cdf); a CDF without them may still underflow
+        loss[~np.isfinite(loss)] = 1e+300
         return loss
-    
-    def callback(self, x, inputObj):
-        loss = self.__fit_meta_d_logL(x)
-        self.loss_record.append(loss)
 
+    def __fit_meta_d_jac_batch(self, X, inputObj):
+        nRatings, obs_rates = inputObj[2], inputObj[11]
+        X = np.atleast_2d(X)
+        rates, idx, r_m, r_x = self.__type2_rate_derivs(X, inputObj)
+        weight = -2 * (obs_rates - rates) / (nRatings - 1)
 
-    def __idealization_cons_func(self, x, inputObj):
-        nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta = inputObj
-        print("x:", x)
-            
-        meta_d1 = x[0]
-        t2c1    = x[1:]
-            
-        S1mu = -meta_d1/2
-        S1sd = 1
-        S2mu = meta_d1/2
-        S2sd = S1sd/s
-
-        S1mu = S1mu - eval(constant_criterion)
-        S2mu = S2mu - eval(constant_criterion)
-
-        C_area_rS1 = fncdf(t1c1,S1mu,S1sd)
-        I_area_rS1 = fncdf(t1c1,S2mu,S2sd)
-        
-        C_area_rS2 = 1-fncdf(t1c1,S2mu,S2sd)
-        I_area_rS2 = 1-fncdf(t1c1,S1mu,S1sd)
-
-        t1c1 = 0
-        t2c1x = [-np.inf]
-        t2c1x.extend(t2c1[0:(nRatings-1)])
-        t2c1x.append(t1c1) #t1c1 is zero
-        t2c1x.extend(t2c1[(nRatings-1):])
-        t2c1x.append(np.inf)
-        
-        for i in range(len(t2c1x) - 1):
-            if t2c1x[i + 1] <= t2c1x[i]:
-                print("criterion error")
-                return [-1.0] * ((nRatings - 1) * 2)
-                # print("wrong return")
-        
-        prC_rS1 = [( fncdf(t2c1x[i+1],S1mu,S1sd) - fncdf(t2c1x[i],S1mu,S1sd) ) / C_area_rS1  for i in range(nRatings)]
-        prI_rS1 = [( fncdf(t2c1x[i+1],S2mu,S2sd) - fncdf(t2c1x[i],S2mu,S2sd) ) / I_area_rS1 for i in range(nRatings)]
-
-        prC_rS2 = [( (1-fncdf(t2c1x[nRatings+i],S2mu,S2sd)) - (1-fncdf(t2c1x[nRatings+i+1],S2mu,S2sd)) ) / C_area_rS2 for i in range(nRatings)]
-        prI_rS2 = [( (1-fncdf(t2c1x[nRatings+i],S1mu,S1sd)) - (1-fncdf(t2c1x[nRatings+i+1],S1mu,S1sd)) ) / I_area_rS2 for i in range(nRatings)]
-        print("prC_rS1:", prC_rS1)
-        print("prI_rS1:", prI_rS1)
-        print("prC_rS2:", prC_rS2)
-        print("prI_rS2:", prI_rS2)
-        # print("11111")
-        for pr in [prC_rS1, prI_rS1, prC_rS2, prI_rS2]:
-            if any(np.isnan(pr)) or any(np.isinf(pr)):
-                print("fncdf calculation resulted in NaN or Inf")
-                return [-1.0] * ((nRatings - 1) * 2)
-
-
-        if (all(x > 0.0 for x in prC_rS1) and all(x > 0.0 for x in prI_rS1) and all(x > 0.0 for x in prC_rS2) and all(x > 0.0 for x in prI_rS2)) == False:
-            print("area_list error ")
-            return [-1.0] * ((nRatings - 1) * 2)
-
-        
-        S1_ratio = []
-        S2_ratio = []
-            
+        grad = np.zeros(X.shape)
+        grad[:, 0] = np.sum(weight * r_m, axis=(1, 2))
+        np.add.at(grad, (np.arange(len(X))[:, None, None], idx), weight * r_x)
+        grad[~np.all(np.isfinite(grad), axis=1)] = 0
+        return grad
 
-            
-        for C, I in zip(prC_rS1, prI_rS1):
-            if C <= 0 or I <= 0:
-                print(C)
-                print(I)
-                print("negnum")
-            S1_ratio.append((C / I) * (C_area_rS1 / I_area_rS1))
-
-        for C, I in zip(prC_rS2, prI_rS2):
-            if C <= 0 or I <= 0:
-                print(C)
-                print(I)
-                print("negnum")
-            S2_ratio.append((C / I) * (C_area_rS2 / I_area_rS2))
-            
-        # print(S1_ratio)
-        # print(S2_ratio)
-
-
-        diff = []
-        for i in range(len(S1_ratio) - 1):
-            diff.append(S1_ratio[i] - S1_ratio[i + 1])
-        for i in range(len(S2_ratio) - 1):
-            diff.append(S2_ratio[i + 1] - S2_ratio[i])
-            # print(diff)
-        diff = np.array(diff)
-        for item in diff:
-            if np.isinf(item) or np.isnan(item):
-                print("nan or inf in diff")
-                return [-1.0] * ((nRatings - 1) * 2)
-        print(len(diff))
-        print(diff)
-        return diff
+    def __fit_meta_d_hess_batch(self, X, inputObj):
+        nRatings, obs_rates = inputObj[2], inputObj[11]
+        X = np.atleast_2d(X)
+        rates, idx, r_m, r_x, r_mm, r_xm, r_xx = self.__type2_rate_derivs(X, inputObj, order=2)
+        err = obs_rates - rates
+        scale = 2 / (nRatings - 1)
+        b = np.arange(len(X))[:, None, None]
+
+        hess = np.zeros((len(X), X.shape[1], X.shape[1]))
+        hess[:, 0, 0] = scale * np.sum(r_m**2 - err * r_mm, axis=(1, 2))
+        np.add.at(hess, (b, 0, idx), scale * (r_m * r_x - err * r_xm))
+        hess[:, 1:, 0] = hess[:, 0, 1:]
+        np.add.at(hess, (b, idx, idx), scale * (r_x**2 - err * r_xx))
+        hess[~np.all(np.isfinite(hess), axis=(1, 2))] = 0
+        return hess
+
+    def __fit_meta_d_jac(self, parameters, inputObj):
+        return self.__fit_meta_d_jac_batch(parameters, inputObj)[0]
+
+    def __fit_meta_d_hess(self, parameters, inputObj):
+        return self.__fit_meta_d_hess_batch(parameters, inputObj)[0]
+
+    def __interval_mass_derivs(self, X, inputObj, order=1):
+        # log probability masses of the 2*nRatings rating intervals under S1
+        # (row 0) and S2 (row 1), shape (B, 2, 2*nRatings), for a
+        # (B, 2*nRatings-1) stack of parameter vectors. interval i runs between
+        # the boundaries (l, r) = (i, i+1) of
+        # [-inf, lower criteria, 0, upper criteria, inf], and its mass is taken
+        # as a difference of CDFs below the mean of the distribution and of
+        # survival functions above it, so tail intervals keep their precision.
+        # returns the log masses and a (B,) mask of rows whose boundaries are
+        # ordered. for order >= 1, derivatives are taken with respect to
+        # (meta_d1, l, r): the gradient of log M, shape (B, 2, 2*nRatings, 3),
+        # and (order 2) the Hessian of M divided by M, shape (..., 3, 3). cols
+        # maps them onto the parameter vector (-1 for the fixed boundaries
+        # -inf, 0 and inf)
+        nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p, obs_rates, model_cache = inputObj
+        terms = self.__model_terms(X, inputObj)
+        X = terms.X
+        d = terms.dmu
+
+        inf = np.full((len(X), 1), np.inf)
+        bounds = np.concatenate((-inf, X[:, 1:nRatings], np.zeros((len(X), 1)), X[:, nRatings:], inf), axis=1)
+        ordered = np.all(np.diff(bounds, axis=1) > 0, axis=1)
+
+        # values of the shared terms at the boundaries: the terms hold the
+        # points [0, criteria], the infinite boundaries are appended as lo, hi
+        nPoints = X.shape[1]
+        order_at_bounds = np.concatenate(([nPoints], np.arange(1, nRatings), [0], np.arange(nRatings, nPoints), [nPoints+1]))
+        def at_bounds(values, lo, hi):
+            ends = np.ones(values.shape[:2] + (1,))
+            return np.concatenate((values, lo * ends, hi * ends), axis=2)[:, :, order_at_bounds]
+        def log1mexp(a):
+            # log(1 - exp(a)) for a <= 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(a > -np.log(2), np.log(-np.expm1(a)), np.log1p(-np.exp(a)))
+
+        l = np.arange(2*nRatings)
+        r = l + 1
+        logF = at_bounds(terms.logF, -np.inf, 0.0)
+        logS = at_bounds(terms.logS, 0.0, -np.inf)
+        below = bounds[:, None, r] <= terms.mu
+        above = bounds[:, None, l] >= terms.mu
+        with np.errstate(divide='ignore', invalid='ignore'):
+            logM = np.where(below, logF[:, :, r] + log1mexp(logF[:, :, l] - logF[:, :, r]),
+                   np.where(above, logS[:, :, l] + log1mexp(logS[:, :, r] - logS[:, :, l]),
+                            np.log1p(-(np.exp(logF[:, :, l]) + np.exp(logS[:, :, r])))))
+        if order == 0:
+            return logM, ordered
+
+        bound_cols = np.concatenate(([-1], np.arange(1, nRatings), [-1], np.arange(nRatings, 2*nRatings-1), [-1]))
+        cols = np.stack([np.zeros(2*nRatings, dtype=int), bound_cols[l], bound_cols[r]], axis=1)
+
+        # densities at the boundaries relative to the mass of the interval
+        logf = at_bounds(terms.logf, -np.inf, -np.inf)
+        with np.errstate(invalid='ignore', over='ignore'):
+            f_l = np.exp(logf[:, :, l] - logM)
+            f_r = np.exp(logf[:, :, r] - logM)
+            g = np.stack([-d * (f_r - f_l), -f_l, f_r], axis=-1)
+        if order == 1:
+            return logM, ordered, cols, g, None
+
+        dlogf = at_bounds(terms.dlogf, 0.0, 0.0)
+        with np.errstate(invalid='ignore'):
+            fp_l = dlogf[:, :, l] * f_l
+            fp_r = dlogf[:, :, r] * f_r
+        h = np.zeros(g.shape + (3,))
+        h[..., 0, 0] = d**2 * (fp_r - fp_l)
+        h[..., 0, 1] = h[..., 1, 0] = d * fp_l
+        h[..., 0, 2] = h[..., 2, 0] = -d * fp_r
+        h[..., 1, 1] = -fp_l
+        h[..., 2, 2] = fp_r
+        return logM, ordered, cols, g, h
+
+    def __likelihood_ratio_derivs(self, X, inputObj, order=1):
+        # per-interval likelihood ratios used by the idealization constraint,
+        # for a (B, 2*nRatings-1) stack of parameter vectors, R_i = Pa_i / Pb_i
+        # with the interval masses of __interval_mass_derivs; the first
+        # nRatings intervals are the "S1" responses (a = S1, b = S2), the last
+        # nRatings the "S2" responses (a = S2, b = S1).
+        # returns the ratios (B, 2*nRatings) and a (B,) mask of rows whose
+        # criteria are ordered and whose intervals are all non-empty. for
+        # order >= 1, also cols and the local derivatives of the ratios (see
+        # __interval_mass_derivs)
+        nRatings = inputObj[2]
+        l = np.arange(2*nRatings)
+        a = np.repeat([0, 1], nRatings)
+        b = 1 - a
+        logM, ordered, *derivs = self.__interval_mass_derivs(X, inputObj, order)
+        logP = logM[:, a, l]
+        logQ = logM[:, b, l]
+        valid = ordered & np.all(np.isfinite(logP), axis=1) & np.all(np.isfinite(logQ), axis=1)
+        with np.errstate(invalid='ignore', over='ignore'):
+            R = np.exp(logP - logQ)
+        if order == 0:
+            return R, valid
+
+        # R = exp(u) with u = log P - log Q
+        cols, g, h = derivs
+        with np.errstate(invalid='ignore', over='ignore'):
+            u_g = g[:, a, l] - g[:, b, l]
+            R_g = R[..., None] * u_g
+            if order == 1:
+                return R, valid, cols, R_g, None
+            P_g, Q_g = g[:, a, l], g[:, b, l]
+            u_h = (h[:, a, l] - P_g[..., :, None] * P_g[..., None, :]) - (h[:, b, l] - Q_g[..., :, None] * Q_g[..., None, :])
+            R_h = R[..., None, None] * (u_g[..., :, None] * u_g[..., None, :] + u_h)
+        return R, valid, cols, R_g, R_h
+
+    def __ratio_diffs(self, values, nRatings):
+        # differences of neighbouring interval ratios (along axis 1) that make
+        # up the constraint values of __idealization_cons_func: R_i - R_(i+1)
+        # for the "S1" responses, R_(i+1) - R_i for the "S2" responses
+        return np.concatenate((values[:, :nRatings-1] - values[:, 1:nRatings],
+                               values[:, nRatings+1:] - values[:, nRatings:-1]), axis=1)
+
+    def __ratio_diffs_adjoint(self, V, nRatings):
+        # V @ (matrix of __ratio_diffs): weights of the interval ratios in a
+        # weighted sum of the constraints, shape (B, 2*nRatings)
+        w = np.zeros((len(V), 2*nRatings))
+        w[:, :nRatings-1] += V[:, :nRatings-1]
+        w[:, 1:nRatings] -= V[:, :nRatings-1]
+        w[:, nRatings+1:] += V[:, nRatings-1:]
+        w[:, nRatings:-1] -= V[:, nRatings-1:]
+        return w
+
+    def __idealization_saturation(self, diff, beta, scale=10.0):
+        # the likelihood ratios of tail intervals grow exponentially with the
+        # criteria, and so would the barrier reward trust-constr gets for
+        # pushing them outwards. the constraint values are therefore passed
+        # through beta + scale * asinh((diff - beta) / scale), which is
+        # increasing and leaves beta in place, so the feasible set cons >= beta
+        # is unchanged. asinh grows like the log of large ratios, i.e. about
+        # linearly in the criteria, so unlike a saturating tanh it keeps the
+        # constraint gradient from vanishing in the tails (where the loss is
+        # flat too, and nothing would pull criteria back in).
+        # returns the values and their first and second derivatives
+        with np.errstate(invalid='ignore', over='ignore'):
+            u = (diff - beta) / scale
+            slope = 1 / np.sqrt(1 + u**2)
+            return beta + scale * np.arcsinh(u), slope, -u * slope**3 / scale
+
+    def __idealization_local_jac(self, valid, cols, R_g, nRatings):
+        # gradients of the ratio differences restricted to the (at most 6)
+        # parameters each of them depends on: values (B, 2*(nRatings-1), 6)
+        # and their columns (2*(nRatings-1), 6), -1 for fixed boundaries
+        first = np.concatenate((np.arange(nRatings-1), np.arange(nRatings+1, 2*nRatings)))
+        second = np.concatenate((np.arange(1, nRatings), np.arange(nRatings, 2*nRatings-1)))
+        R_g = np.where(valid[:, None, None], R_g, 0.0)
+        return np.concatenate((R_g[:, first], -R_g[:, second]), axis=2), np.concatenate((cols[first], cols[second]), axis=1)
+
+    def __idealization_cons_batch(self, X, inputObj):
+        # idealization constraint values for every row of X, shape (B, 2*(nRatings-1)).
+        # rows with unordered criteria or empty intervals are set to -1, as in
+        # __idealization_cons_func
+        nRatings, beta = inputObj[2], inputObj[9]
+        R, valid = self.__likelihood_ratio_derivs(X, inputObj, order=0)
+        with np.errstate(invalid='ignore'):
+            diff = self.__ratio_diffs(R, nRatings)
+        cons = self.__idealization_saturation(diff, beta)[0]
+        cons[~(valid & ~np.any(np.isnan(cons), axis=1))] = -1.0
+        return cons
+
+    def __idealization_cons_jac_batch(self, X, inputObj):
+        # every constraint depends on meta_d1 and at most 3 criteria, so the
+        # jacobian is filled from per-constraint gradients in O(nRatings)
+        nRatings, beta = inputObj[2], inputObj[9]
+        X = np.atleast_2d(X)
+        R, valid, cols, R_g, _ = self.__likelihood_ratio_derivs(X, inputObj)
+        with np.errstate(invalid='ignore'):
+            _, slope, _ = self.__idealization_saturation(self.__ratio_diffs(R, nRatings), beta)
+            values, local_cols = self.__idealization_local_jac(valid, cols, R_g, nRatings)
+            values = slope[..., None] * values
+        jac = np.zeros((len(X), 2*(nRatings-1), X.shape[1] + 1))  # last column collects fixed boundaries
+        b = np.arange(len(X))[:, None, None]
+        np.add.at(jac, (b, np.arange(2*(nRatings-1))[None, :, None], local_cols[None]), values)
+        jac = jac[..., :-1]
+        jac[~np.all(np.isfinite(jac), axis=(1, 2))] = 0
+        return jac
+
+    def __idealization_cons_hess_batch(self, X, V, inputObj):
+        # sum_i V[:, i] * hessian of the i-th constraint, for every row of X
+        nRatings, beta = inputObj[2], inputObj[9]
+        X = np.atleast_2d(X)
+        V = np.atleast_2d(V)
+        R, valid, cols, R_g, R_h = self.__likelihood_ratio_derivs(X, inputObj, order=2)
+        with np.errstate(invalid='ignore'):
+            _, slope, curvature = self.__idealization_saturation(self.__ratio_diffs(R, nRatings), beta)
+            # chain rule: slope * hessian of the ratio difference + curvature * J J'
+            w = self.__ratio_diffs_adjoint(V * slope, nRatings)
+            values = np.where(valid[:, None, None, None], w[:, :, None, None] * R_h, 0.0)
+            g, local_cols = self.__idealization_local_jac(valid, cols, R_g, nRatings)
+            outer = (V * curvature)[:, :, None, None] * g[..., :, None] * g[..., None, :]
+        hess = np.zeros((len(X), X.shape[1] + 1, X.shape[1] + 1))
+        b = np.arange(len(X))[:, None, None, None]
+        np.add.at(hess, (b, cols[None, :, :, None], cols[None, :, None, :]), values)
+        np.add.at(hess, (b, local_cols[None, :, :, None], local_cols[None, :, None, :]), outer)
+        hess = hess[:, :-1, :-1]
+        hess[~np.all(np.isfinite(hess), axis=(1, 2))] = 0
+        return hess
+
+    def __idealization_cons_jac(self, x, inputObj):
+        return self.__idealization_cons_jac_batch(x, inputObj)[0]
+
+    def __idealization_cons_hess(self, x, v, inputObj):
+        return self.__idealization_cons_hess_batch(x, v, inputObj)[0]
+
+    def __criteria_min_gap(self, nRatings):
+        # smallest distance allowed between neighbouring type 2 criteria (and
+        # between the innermost ones and the type 1 criterion): 0.05, narrowed
+        # for fine rating scales whose criteria lie closer than that
+        return min(0.05, 0.2 / nRatings)
+
+    def __sparse_constraints(self, nRatings):
+        # whether trust-constr works with sparse constraint jacobians. each row
+        # of the linear and idealization constraints touches a handful of
+        # parameters, which pays off for fine rating scales; coarse scales keep
+        # the dense factorizations
+        return nRatings > 10
+
+    def __criteria_order_constraint(self, nCriteria):
+        # sparse rows of the LinearConstraint keeping the type 2 criteria
+        # ordered and at least __criteria_min_gap away from each other and
+        # from the type 1 criterion: with b = [lower criteria, 0, upper
+        # criteria], b_j - b_(j+1) <= -gap for every j
+        nRatings = (nCriteria + 1) // 2
+        nRows = nCriteria - 1
+        rows = np.arange(nRows)
+        # column of b_j in the parameter vector (0 at the type 1 criterion is not a parameter)
+        b_cols = np.concatenate((np.arange(1, nRatings), [-1], np.arange(nRatings, nCriteria)))
+        ii = np.concatenate((rows, rows))
+        jj = np.concatenate((b_cols[:-1], b_cols[1:]))
+        vv = np.concatenate((np.ones(nRows), -np.ones(nRows)))
+        keep = jj >= 0
+        A = sparse.csr_matrix((vv[keep], (ii[keep], jj[keep])), shape=(nRows, nCriteria))
+        lb = np.full(nRows, -np.inf)
+        ub = np.full(nRows, -self.__criteria_min_gap(nRatings))
+        return A, lb, ub
+
+    def __criteria_transform(self, z, nRatings):
+        # parameter vector [meta_d1, criteria] of the reparameterized vector z
+        # used by the L-BFGS-B solver, and d step / d z for
+        # __criteria_transform_grad. the criteria are built outwards from the
+        # type 1 criterion at 0: every step is gap + softplus(z), which keeps
+        # them ordered and __criteria_min_gap apart as the LinearConstraint of
+        # trust-constr does
+        z = np.asarray(z, dtype=float)
+        step = self.__criteria_min_gap(nRatings) + np.logaddexp(0, z[1:])
+        dstep = expit(z[1:])
 
-    def fit_meta_d_MLE(self, nR_S1, nR_S2, beta, p, s = 1, fncdf = norm.cdf, fninv = norm.ppf):
+        x = np.empty_like(z)
+        x[0] = z[0]
+        x[1:nRatings] = -np.flip(np.cumsum(np.flip(step[:nRatings-1])))
+        x[nRatings:] = np.cumsum(step[nRatings-1:])
+        return x, dstep
+
+    def __criteria_transform_grad(self, grad, dstep, nRatings):
+        # gradient with respect to z of a function with gradient grad with
+        # respect to x = __criteria_transform(z). x[1+k] depends on the lower
+        # steps j >= k, x[nRatings+k] on the upper steps j <= k, so the chain
+        # rule reduces to cumulative sums
+        grad_z = np.empty_like(grad)
+        grad_z[0] = grad[0]
+        grad_z[1:nRatings] = -np.cumsum(grad[1:nRatings]) * dstep[:nRatings-1]
+        grad_z[nRatings:] = np.flip(np.cumsum(np.flip(grad[nRatings:]))) * dstep[nRatings-1:]
+        return grad_z
+
+    def __criteria_transform_inverse(self, x, nRatings):
+        # z with __criteria_transform(z) = x, with steps narrower than the
+        # minimum gap
+        # (e.g. from empty rating cells) widened to slightly above it
+        x = np.asarray(x, dtype=float)
+        lower = np.diff(np.concatenate((x[1:nRatings], [0.0])))
+        upper = np.diff(np.concatenate(([0.0], x[nRatings:])))
+        gap = np.maximum(np.concatenate((lower, upper)) - self.__criteria_min_gap(nRatings), 1e-3)
+        return np.concatenate(([x[0]], gap + np.log(-np.expm1(-gap))))  # inverse softplus
+
+    def __parameter_bounds(self, d1, nRatings):
+        # bounds (LB, UB) on the parameters [meta_d1, t2c1 - meta_c1]:
+        # meta-d' in [0, d1], criteria lower than t1c in [-20, 0] and criteria
+        # higher than t1c in [0, 20]. d1 may be an array of tables, giving
+        # bounds with the same leading axes
+        d1 = np.asarray(d1, dtype=float)
+        LB = np.concatenate(([0], -20*np.ones(nRatings-1), np.zeros(nRatings-1)))
+        UB = np.concatenate(([0], np.zeros(nRatings-1), 20*np.ones(nRatings-1)))
+        LB = np.broadcast_to(LB, d1.shape + LB.shape).copy()
+        UB = np.broadcast_to(UB, d1.shape + UB.shape).copy()
+        UB[..., 0] = d1
+        return LB, UB
+
+    def __trust_constr_options(self, sparse_jacobian):
+        # options of every trust-constr fit. the loss is a mean squared rate
+        # error, often below 1e-2, so scipy's initial barrier parameter of 0.1
+        # would outweigh it: trust-constr then keeps the criteria far from the
+        # idealization constraint, crawls along the flat tails or stops at a
+        # local optimum. 0.03 lets the loss lead from the first iterations
+        return {'verbose': 0, "maxiter": 10000000, 'sparse_jacobian': sparse_jacobian, 'initial_barrier_parameter': 0.03}
+
+    def __initial_guess(self, nR_S1, nR_S2, d1, t1c1, beta, s, fninv):
+        # initial values [meta_d1, t2c1 - meta_c1] of fit_meta_d_MLE, for one
+        # count table or (with leading axes) for many, clipped to
+        # __parameter_bounds. meta_d1 is drawn from [0, d1] with seed beta and
+        # the criteria are the type 1 ones at meta_d1 = d1. type 2 rates of
+        # exactly 0 or 1 (empty cells) are moved half a trial inwards: they
+        # would otherwise put a criterion at +-inf (clipped to +-20), where
+        # the loss is flat and the optimizer never moves it
+        nR_S1 = np.asarray(nR_S1, dtype=float)
+        nR_S2 = np.asarray(nR_S2, dtype=float)
+        nRatings = nR_S1.shape[-1] // 2
+        t2_index = [i for i in range(2*nRatings-1) if i != nRatings-1]
+
+        def inwards(counts):
+            n = np.sum(counts, axis=-1, keepdims=True)
+            rates = np.flip(np.cumsum(np.flip(counts, axis=-1), axis=-1), axis=-1)[..., 1:] / n
+            return np.where(rates <= 0, 0.5 / n, np.where(rates >= 1, 1 - 0.5 / n, rates))
+        guess_c1 = (-1/(1+s)) * (inverse_cdf(fninv, inwards(nR_S2)) + inverse_cdf(fninv, inwards(nR_S1)))
+
+        meta_d1 = []
+        for d in np.ravel(d1):
+            random.seed(beta)
+            meta_d1.append(random.uniform(0.0, d) if np.isfinite(d) else 0.0)
+        meta_d1 = np.reshape(meta_d1, np.shape(d1) + (1,))
+        guess = np.concatenate((meta_d1, guess_c1[..., t2_index] - np.asarray(t1c1)[..., np.newaxis]), axis=-1)
+        LB, UB = self.__parameter_bounds(d1, nRatings)
+        return np.clip(guess, LB, UB)
+
+    def __minimize_reparameterized(self, guess, inputObj, LB, UB, monitor, verbose = False):
+        # fit_meta_d_MLE with solver = 'L-BFGS-B': minimizes the loss over the
+        # reparameterized vector z (see __criteria_transform), with meta_d1 kept
+        # in [LB[0], UB[0]] by L-BFGS-B itself and the idealization constraint
+        # cons(x) >= beta handled by an augmented Lagrangian. returns an
+        # OptimizeResult like minimize(), with fun the loss without penalty.
+        # monitor (a _FitMonitor) sees every L-BFGS-B iteration, with the
+        # penalized objective as loss
+        nRatings, fncdf, beta = inputObj[2], inputObj[7], inputObj[9]
+        analytic = get_cdf_derivatives(fncdf) is not None
+        z = self.__criteria_transform_inverse(np.clip(guess, LB, UB), nRatings)
+        z_bounds = [(LB[0], UB[0])] + [(None, None)] * (len(z) - 1)
+
+        lam = np.zeros(2*(nRatings-1))
+        mu = 10.0
+        tol = 1e-6
+
+        def penalized(z):
+            x, dstep = self.__criteria_transform(z, nRatings)
+            c = self.__idealization_cons_func(x, inputObj, verbose=verbose)
+            t = np.maximum(0, lam + mu * (beta - c))
+            value = self.__fit_meta_d_logL(x, inputObj) + np.sum(t**2 - lam**2) / (2 * mu)
+            if not analytic:
+                return value
+            grad = self.__fit_meta_d_jac(x, inputObj) - t @ self.__idealization_cons_jac(x, inputObj)
+            return value, self.__criteria_transform_grad(grad, dstep, nRatings)
+
+        def callback(intermediate_result):
+            x, _ = self.__criteria_transform(intermediate_result.x, nRatings)
+            if monitor.iteration(x, intermediate_result.fun, violation):
+                raise StopIteration
+
+        nit, nfev = 0, 0
+        x_prev = None
+        violation = np.inf
+        for outer in range(50):
+            results = minimize(monitor.wrap('fun', penalized), z, jac=analytic, method='L-BFGS-B', bounds=z_bounds,
+                               callback=callback, options={'maxiter': 15000})
+            z = results.x
+            nit, nfev = nit + results.nit, nfev + results.nfev
+            if monitor.stopped is not None:
+                x, _ = self.__criteria_transform(z, nRatings)
+                violation = max(0.0, np.max(beta - self.__idealization_cons_func(x, inputObj)))
+                break
+            x, _ = self.__criteria_transform(z, nRatings)
+            c = self.__idealization_cons_func(x, inputObj)
+            previous_violation, violation = violation, max(0.0, np.max(beta - c))
+
+            lam = np.maximum(0, lam + mu * (beta - c))
+            if violation <= tol and x_prev is not None and np.max(np.abs(x - x_prev)) <= tol:
+                break
+            if violation > 0.25 * previous_violation:
+                mu = min(10 * mu, 1e10)
+            x_prev = x
+
+        return OptimizeResult(x=x, fun=self.__fit_meta_d_logL(x, inputObj), success=bool(results.success and violation <= tol and monitor.stopped is None),
+                              status=results.status, message=results.message, nit=nit, nfev=nfev, njev=nfev if analytic else 0,
+                              constr_violation=violation)
+
+    def __rating_nll_derivs(self, X, inputObj, order=2):
+        # negative log-likelihood of the rating counts for a (B, 2*nRatings-1)
+        # stack of parameter vectors, conditional on the type 1 responses as in
+        # the original meta-d' MLE: the counts of each stimulus and response
+        # side are multinomial over that side's nRatings intervals, with
+        # probabilities M_i / A, A the total mass of the side. returns the
+        # (B,) values (inf where the criteria are not ordered) and, for order
+        # >= 1, the gradients (B, P) and Hessians (B, P, P)
+        nR_S1, nR_S2, nRatings = inputObj[:3]
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        B, nParams = X.shape
+        n = np.array([nR_S1, nR_S2], dtype=float)             # (2, 2*nRatings)
+        N = n.reshape(2, 2, nRatings).sum(axis=-1)             # (2, side)
+        logM, ordered, *derivs = self.__interval_mass_derivs(X, inputObj, order)
+        logA = logsumexp(logM.reshape(B, 2, 2, nRatings), axis=-1)
+        with np.errstate(invalid='ignore'):
+            nll = -(np.sum(np.where(n > 0, n * logM, 0.0), axis=(1, 2)) - np.sum(N * logA, axis=(1, 2)))
+        nll[~ordered | np.isnan(nll)] = np.inf
+        if order == 0:
+            return nll
+
+        # scatter the local derivatives onto the parameters, with column nParams
+        # collecting the fixed boundaries. g_M is the gradient of log M, and
+        # log A has the gradient sum_i w_i g_M,i with w_i = M_i / A
+        cols, g, h = derivs
+        cols = np.where(cols < 0, nParams, cols)
+        rows = np.arange(2*nRatings)
+        g_M = np.zeros((B, 2, 2*nRatings, nParams+1))
+        for k in range(3):
+            g_M[:, :, rows, cols[:, k]] += g[..., k]
+        g_M = g_M[..., :nParams]
+        w = np.exp(logM - np.repeat(logA, nRatings, axis=-1))
+        g_A = (w[..., None] * g_M).reshape(B, 2, 2, nRatings, nParams).sum(axis=3)
+        with np.errstate(invalid='ignore'):
+            grad = -(np.einsum('di,bdip->bp', n, g_M) - np.einsum('ds,bdsp->bp', N, g_A))
+        if order == 1:
+            return nll, grad, None
+
+        # hess log M = H_M / M - g_M g_M', hess log A = sum_i w_i H_M,i / M_i - g_A g_A'
+        h_M = np.zeros((B, 2, 2*nRatings, nParams+1, nParams+1))
+        for k in range(3):
+            for j in range(3):
+                h_M[:, :, rows, cols[:, k], cols[:, j]] += h[..., k, j]
+        h_M = h_M[..., :nParams, :nParams]
+        h_A = (w[..., None, None] * h_M).reshape(B, 2, 2, nRatings, nParams, nParams).sum(axis=3)
+        with np.errstate(invalid='ignore'):
+            hess_log_M = h_M - g_M[..., :, None] * g_M[..., None, :]
+            hess_log_A = h_A - g_A[..., :, None] * g_A[..., None, :]
+            hess = -(np.einsum('di,bdipq->bpq', n, hess_log_M) - np.einsum('ds,bdspq->bpq', N, hess_log_A))
+        return nll, grad, hess
+
+    def __finite_difference_hess(self, fn, x, step=1e-4):
+        # central difference Hessian of a batched scalar function fn at x,
+        # from one call on all 4 * P * (P+1) / 2 shifted points
+        nParams = len(x)
+        h = step * np.maximum(1, np.abs(x))
+        i, j = np.triu_indices(nParams)
+        E = np.eye(nParams)
+        points = [x + si*h[i, None]*E[i] + sj*h[j, None]*E[j] for si, sj in ((1, 1), (1, -1), (-1, 1), (-1, -1))]
+        pp, pm, mp, mm = np.split(fn(np.concatenate(points)), 4)
+        hess = np.zeros((nParams, nParams))
+        hess[i, j] = hess[j, i] = (pp - pm - mp + mm) / (4 * h[i] * h[j])
+        return hess
+
+    def __observed_information_se(self, results, inputObj, A, LB, UB, solver):
+        # standard errors of the fitted parameters from the observed
+        # information of the rating counts at results.x (see
+        # __rating_nll_derivs). constraints active at the optimum fix some
+        # directions of the parameter space, so the information is inverted on
+        # the null space Z of their gradients: cov = Z (Z' H Z)^-1 Z'. a
+        # constraint is active when it holds within tol; trust-constr is an
+        # interior point method and stops short of active constraints, so its
+        # fits use a looser tolerance
+        nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p, obs_rates, model_cache = inputObj
+        x = np.asarray(results.x, dtype=float)
+        nParams = len(x)
+        A = A.toarray() if sparse.issparse(A) else np.asarray(A, dtype=float)
+        if get_cdf_derivatives(fncdf) is not None:
+            hess = self.__rating_nll_derivs(x, inputObj, order=2)[2][0]
+            cons_jac = self.__idealization_cons_jac(x, inputObj)
+        else:
+            hess = self.__finite_difference_hess(lambda X: self.__rating_nll_derivs(X, inputObj, order=0), x)
+            cons_jac = approx_fprime(x, lambda x: self.__idealization_cons_func(x, inputObj))
+
+        # candidate constraints: lower / upper bounds, criteria gaps, idealization
+        gradients = np.concatenate((np.eye(nParams), np.eye(nParams), A, cons_jac))
+        slack = np.concatenate((x - LB, UB - x, -self.__criteria_min_gap(nRatings) - A @ x, self.__idealization_cons_func(x, inputObj) - beta))
+        names = ([f'lower bound x[{i}]' for i in range(nParams)] + [f'upper bound x[{i}]' for i in range(nParams)]
+                 + [f'criteria gap {i}' for i in range(len(A))] + [f'idealization {i}' for i in range(len(cons_jac))])
+        active = slack <= (1e-2 if solver == 'trust-constr' else 1e-5)
+
+        cov = np.full((nParams, nParams), np.nan)
+        try:
+            Z = null_space(gradients[active]) if np.any(active) else np.eye(nParams)
+            if Z.shape[1] == 0:
+                # the active constraints pin every parameter
+                cov = np.zeros((nParams, nParams))
+            else:
+                reduced = Z.T @ hess @ Z
+                np.linalg.cholesky(reduced)  # the information must be positive definite
+                cov = Z @ np.linalg.inv(reduced) @ Z.T
+        except (ValueError, np.linalg.LinAlgError):
+            pass
+
+        # absolute type 2 criteria are t2c1 = x[1:] + meta_d1 * t1c1 / d1
+        T = np.eye(nParams)
+        T[1:, 0] = t1c1 / d1
+        cov_abs = T @ cov @ T.T
+        se_abs = np.sqrt(np.maximum(np.diag(cov_abs), 0))
+        se_abs[np.isnan(np.diag(cov_abs))] = np.nan
+
+        se = {}
+        se['meta_d1']  = se_abs[0]
+        se['meta_da']  = np.sqrt(2/(1+s**2)) * s * se_abs[0]
+        se['t2c1_rS1'] = se_abs[1:nRatings]
+        se['t2c1_rS2'] = se_abs[nRatings:]
+        se['cov']      = cov
+        se['active']   = [name for name, is_active in zip(names, active) if is_active]
+        return se
+
+    def fit_meta_d_MLE(self, nR_S1, nR_S2, beta, p, s = 1, fncdf = norm.cdf, fninv = norm.ppf, exact_hess = False, guess = None, verbose = False, solver = 'trust-constr', maxiter = None, time_budget = None, callback = None, return_se = False, reference_check = False):
         
         print("beta:", beta)
         """
@@ -481,13 +1396,74 @@ class Meta_d_prime(object):
         % if not specified, fncdf defaults to @normcdf (i.e. CDF for normal
         % distribution)
         %
+        % fncdf may also name a built-in type 1 family, 'normal', 'logistic'
+        % or 'student_t(df)', or be a Type1Family (for the unequal-variance
+        % Gaussian model, use 'normal' and set s). fninv is then taken
+        % from the family, and the fit has analytic derivatives as for
+        % norm.cdf. Families have unit SD, so d' stays in SD units.
+        %
         % * fninv
         % a function handle for the inverse CDF of the type 1 distribution.
-        % if not specified, fninv defaults to @norminv
+        % if not specified, fninv defaults to @norminv. its values at the
+        % observed rates (for the initial guess) are cached, see inverse_cdf
+        %
+        % * exact_hess
+        % if True, the closed-form Hessians of the loss and of the idealization
+        % constraint are passed to the optimizer instead of quasi-Newton (SR1 /
+        % BFGS) approximations. Gradients are always closed-form when fncdf has
+        % known derivatives (see get_cdf_derivatives), and finite differences
+        % otherwise.
+        %
+        % * guess
+        % initial values [meta_d1, t2c1 - meta_c1] for the optimizer, clipped to
+        % the parameter bounds. if not specified, meta_d1 is drawn uniformly
+        % from (0, d1) and the type 2 criteria start at their observed values.
+        %
+        % * verbose
+        % if True, prints every iterate x and its idealization constraint values.
+        %
+        % * solver
+        % 'trust-constr' (default) solves the constrained problem directly.
+        % 'L-BFGS-B' reparameterizes the type 2 criteria as steps of
+        % gap + softplus(z) outwards from the type 1 criterion, which enforces
+        % their ordering (but not the +-20 bounds), and handles the
+        % idealization constraint with an augmented Lagrangian. It is usually
+        % much faster and reaches the same optimum.
+        %
+        % * maxiter, time_budget
+        % stop the optimizer after maxiter iterations or time_budget seconds
+        % (default: no limit). A fit stopped early has success = False and
+        % telemetry['termination'] = 'maxiter' or 'time_budget'.
+        %
+        % * callback
+        % called as callback(progress) after every optimizer iteration, with
+        % progress a dict of iteration, elapsed (seconds), loss,
+        % constr_violation and x. For 'L-BFGS-B', loss includes the
+        % augmented Lagrangian penalty.
+        %
+        % * return_se
+        % if True, adds fit.se with standard errors from the observed
+        % information (the Hessian of the negative log-likelihood of the
+        % rating counts) at the fitted parameters. Constraints active at the
+        % optimum (bounds, criteria gaps, idealization) are held fixed, so
+        % parameters pinned by them get a standard error of 0. The Hessian is
+        % closed-form when fncdf has known derivatives, and a central finite
+        % difference otherwise.
+        %
+        % * reference_check
+        % (trust-constr only) if True, the fit is compared with an L-BFGS-B
+        % fit from the same guess, which runs within what is left of
+        % time_budget. trust-constr can stop at a local optimum well above the
+        % L-BFGS-B loss; such a fit (or one that failed) is restarted from the
+        % L-BFGS-B solution with a small barrier parameter and trust radius,
+        % and has success = False if it still ends far above it. Off by
+        % default: it adds one or two optimizations to every fit.
         %
         % OUTPUT
         %
-        % Output is packaged in the struct "fit." 
+        % Output is packaged in the struct "fit", a MetaDFit (see fit_result.py):
+        % fields read as fit['da'] or fit.da, and fit.to_dict() gives them as a
+        % plain nested dict. Many fits stack into a MetaDFitTable.
         % In the following, let S1 and S2 represent the distributions of evidence 
         % generated by stimulus classes S1 and S2.
         % Then the fields of "fit" are as follows:
@@ -506,6 +1482,25 @@ class Meta_d_prime(object):
         %                 using parameters specified in sd(S1) units.
         % 
         % fit.logL          = log likelihood of the data fit
+        % fit.success       = whether the optimizer reported convergence (see
+        %                     also reference_check)
+        % fit.solver        = the solver used
+        % fit.estimation_method = 'MLE' (see quick_estimate for the alternative)
+        % fit.telemetry     = dict with the optimizer's nit, nfev, njev and
+        %                     constr_violation, the wall-clock time_total split
+        %                     into time_objective (loss, constraint and
+        %                     derivative evaluations) and time_optimizer, the
+        %                     termination reason ('converged', 'failed',
+        %                     'maxiter', 'time_budget' or 'far from
+        %                     reference'), the optimizer's message, calls /
+        %                     call_times per function, and with
+        %                     reference_check the reference_loss of the
+        %                     L-BFGS-B fit (None if it did not converge)
+        % fit.se            = (only with return_se) dict of standard errors
+        %                     meta_d1, meta_da, t2c1_rS1 and t2c1_rS2, the
+        %                     covariance cov of the optimizer's parameters
+        %                     [meta_d1, t2c1 - meta_c1] (NaN if the information
+        %                     is singular), and the list of active constraints
         %
         % fit.est_HR2_rS1  = estimated (from meta-d' fit) type 2 hit rates for S1 responses
         % fit.obs_HR2_rS1  = actual type 2 hit rates for S1 responses
@@ -520,6 +1515,7 @@ class Meta_d_prime(object):
         % If there are N ratings, then there will be N-1 type 2 hit rates and false
         % alarm rates. 
         """
+        fncdf, fninv = resolve_type1_family(fncdf, fninv)
         
         # check inputs
         if (len(nR_S1) % 2)!=0: 
@@ -554,30 +1550,28 @@ class Meta_d_prime(object):
         constant_criterion = 'meta_d1 * (t1c1 / d1)' # relative criterion
         
         # set up initial guess at parameter values
-        ratingHR  = []
-        ratingFAR = []
-        for c in range(1,int(nRatings*2)):
-            ratingHR.append(sum(nR_S2[c:]) / sum(nR_S2))
-            ratingFAR.append(sum(nR_S1[c:]) / sum(nR_S1))
+        # sum(nR[c:]) / sum(nR) for c in range(1, 2*nRatings), via a reversed cumsum
+        ratingHR  = np.flip(np.cumsum(np.flip(np.asarray(nR_S2, dtype=float))))[1:] / np.sum(nR_S2)
+        ratingFAR = np.flip(np.cumsum(np.flip(np.asarray(nR_S1, dtype=float))))[1:] / np.sum(nR_S1)
         
         # obtain index in the criteria array to mark Type I and Type II criteria
         t1_index = nRatings-1
         t2_index = list(set(list(range(0,2*nRatings-1))) - set([t1_index]))
         
-        d1 = (1/s) * (fninv( ratingHR[t1_index] ) - fninv( ratingFAR[t1_index] )) 
+        zHR  = inverse_cdf(fninv, ratingHR)
+        zFAR = inverse_cdf(fninv, ratingFAR)
+        d1 = (1/s) * (zHR[t1_index] - zFAR[t1_index])
         meta_d1 = d1
         
         
-        c1 = (-1/(1+s)) * ( fninv( ratingHR ) + fninv( ratingFAR ) )
+        c1 = (-1/(1+s)) * (zHR + zFAR)
         # print(c1)
         t1c1 = c1[t1_index]
         t2c1 = c1[t2_index]
         
         # initial values for the minimization function
-        
-        random.seed(beta)
-        guess = [random.uniform(0.0, d1)]
-        guess.extend(list(t2c1 - eval(constant_criterion)))
+        if guess is None:
+            guess = self.__initial_guess(nR_S1, nR_S2, d1, t1c1, beta, s, fninv)
         # print(guess)
 
         """
@@ -592,57 +1586,43 @@ class Meta_d_prime(object):
         # -->  t2c(i+1) >= t2c(i) + 1e-5 (i.e. very small deviation from equality) 
         # -->  t2c(i) - t2c(i+1) <= -1e-5
         
-        A = []
-        ub = []
-        lb = []
-        for ii in range(nCriteria-2):
-            tempArow = []
-            if ii == (nCriteria - 2) // 2:
-                tempArow.extend(np.zeros(ii+1))
-                tempArow.append(1)
-                tempArow.extend(np.zeros((nCriteria-2)-ii))
-                A.append(tempArow)
-                ub.append(-0.05)
-                lb.append(-np.inf)
-
-                tempArow = []
-                tempArow.extend(np.zeros(ii+2))
-                tempArow.append(-1)
-                tempArow.extend(np.zeros((nCriteria-2)-ii-1))
-                A.append(tempArow)
-                ub.append(-0.05)
-                lb.append(-np.inf)
-            else:
-                tempArow.extend(np.zeros(ii+1))
-                tempArow.extend([1, -1])
-                tempArow.extend(np.zeros((nCriteria-2)-ii-1))
-                A.append(tempArow)
-                ub.append(-0.05)
-                lb.append(-np.inf)
-            
-        # lower bounds on parameters
-        LB = []
-        LB.append(0)                              # meta-d'
-        LB.extend(-20*np.ones((nCriteria-1)//2))    # criteria lower than t1c
-        LB.extend(np.zeros((nCriteria-1)//2))       # criteria higher than t1c
-        
-        # upper bounds on parameters
-        UB = []
-        UB.append(d1)                           # meta-d'
-        UB.extend(np.zeros((nCriteria-1)//2))      # criteria lower than t1c
-        UB.extend(20*np.ones((nCriteria-1)//2))    # criteria higher than t1c
+        A, lb, ub = self.__criteria_order_constraint(nCriteria)
+
+        # lower and upper bounds on parameters
+        LB, UB = self.__parameter_bounds(d1, nRatings)
         
         
         # other inputs for the minimization function
-        inputObj = [nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p]        
+        obs_rates = self.__type2_obs_rates(nR_S1, nR_S2, nRatings)
+        inputObj = [nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p, obs_rates, {}]
         bounds = Bounds(LB,UB)
-        linear_constraint = LinearConstraint(A,lb,ub)
+        sparse_jacobian = self.__sparse_constraints(nRatings)
+        linear_constraint = LinearConstraint(A if sparse_jacobian else A.toarray(),lb,ub)
+
+        # a guess from another table (e.g. a warm start) may lie outside the bounds
+        guess = np.clip(guess, LB, UB)
         
         
 
         
-        idealization_cons_func_fixed = partial(self.__idealization_cons_func, inputObj=inputObj)
-        nonlinear_constraint = NonlinearConstraint(idealization_cons_func_fixed, [beta] * ((nRatings - 1) * 2), [np.inf] * ((nRatings - 1) * 2))
+        # closed-form derivatives of the loss and the idealization constraint
+        monitor = _FitMonitor(maxiter, time_budget, callback)
+        if get_cdf_derivatives(fncdf) is not None:
+            jac = monitor.wrap('jac', self.__fit_meta_d_jac)
+            cons_jac = monitor.wrap('cons_jac', partial(self.__idealization_cons_jac, inputObj=inputObj))
+            if exact_hess:
+                hess = monitor.wrap('hess', self.__fit_meta_d_hess)
+                cons_hess = monitor.wrap('cons_hess', partial(self.__idealization_cons_hess, inputObj=inputObj))
+            else:
+                hess = SR1()
+                cons_hess = BFGS()
+        else:
+            jac, hess = '2-point', SR1()
+            cons_jac, cons_hess = '2-point', BFGS()
+
+        idealization_cons_func_fixed = monitor.wrap('cons', partial(self.__idealization_cons_func, inputObj=inputObj, verbose=verbose))
+        nonlinear_constraint = NonlinearConstraint(idealization_cons_func_fixed, [beta] * ((nRatings - 1) * 2), [np.inf] * ((nRatings - 1) * 2),
+                                                   jac=cons_jac, hess=cons_hess)
                 
 
         # minimization of negative log-likelihood
@@ -653,10 +1633,35 @@ class Meta_d_prime(object):
         #                 options = {'verbose': 0, "maxiter": 1000}, bounds = bounds,
         #                 )
         
-        results = minimize(self.__fit_meta_d_logL, guess, args = (inputObj), method='trust-constr',
-                        jac='2-point', hess=SR1(), 
-                        constraints=[linear_constraint, nonlinear_constraint],
-                        options = {'verbose': 0, "maxiter": 10000000}, bounds = bounds,)
+        reference_loss, checked = None, False
+        if solver == 'trust-constr':
+            def minimize_trust_constr(x0, **options):
+                return minimize(monitor.wrap('fun', self.__fit_meta_d_logL), x0, args = (inputObj), method='trust-constr',
+                                jac=jac, hess=hess,
+                                constraints=[linear_constraint, nonlinear_constraint],
+                                callback=lambda x, state: monitor.iteration(x, state.fun, state.constr_violation),
+                                options = {**self.__trust_constr_options(sparse_jacobian), **options}, bounds = bounds,)
+
+            results = minimize_trust_constr(guess)
+            if reference_check and monitor.stopped is None:
+                # trust-constr can fail, or stop at a local optimum far above
+                # the loss L-BFGS-B reaches from the same guess. it is then
+                # restarted from the L-BFGS-B solution, with a small barrier
+                # parameter and trust radius so that it stays near it
+                remaining = None if time_budget is None else max(time_budget - (time.perf_counter() - monitor.start), 0.0)
+                reference = self.__minimize_reparameterized(guess, inputObj, LB, UB, _FitMonitor(maxiter, remaining))
+                checked = True
+                if reference.success:
+                    reference_loss = float(reference.fun)
+                if reference.success and (not results.success or results.fun > 1.05 * reference.fun + 1e-4):
+                    first = results
+                    results = minimize_trust_constr(np.clip(reference.x, LB, UB), initial_barrier_parameter=1e-4, initial_tr_radius=0.1)
+                    for count in ('nit', 'nfev', 'njev'):
+                        results[count] += first[count]
+        elif solver == 'L-BFGS-B':
+            results = self.__minimize_reparameterized(guess, inputObj, LB, UB, monitor, verbose=verbose)
+        else:
+            raise ValueError(f"unknown solver: {solver}")
         
         # plt.plot(self.loss_record, marker='-')
         # plt.title('Loss vs Iterations')
@@ -671,7 +1676,14 @@ class Meta_d_prime(object):
         t2c1    = results.x[1:] + eval(constant_criterion)
         # t2c1    = results.x[1:]
         logL    = results.fun
-        is_success = results.success
+        telemetry = monitor.telemetry(results)
+        is_success = results.success and monitor.stopped is None
+        if checked:
+            # a trust-constr fit that still ends far above the L-BFGS-B loss fails
+            telemetry['reference_loss'] = reference_loss
+            if is_success and reference_loss is not None and logL > 2 * reference_loss + 1e-2:
+                is_success = False
+                telemetry['termination'] = 'far from reference'
         if is_success:
             print("successful!")
         else:
@@ -680,18 +1692,7 @@ class Meta_d_prime(object):
         # data is fit, now to package it...
         # find observed t2FAR and t2HR 
         
-        # I_nR and C_nR are rating trial counts for incorrect and correct trials
-        # element i corresponds to # (in)correct w/ rating i
-        I_nR_rS2 = nR_S1[nRatings:]
-        I_nR_rS1 = list(np.flip(nR_S2[0:nRatings],axis=0))
-        
-        C_nR_rS2 = nR_S2[nRatings:];
-        C_nR_rS1 = list(np.flip(nR_S1[0:nRatings],axis=0))
-        
-        obs_FAR2_rS2 = [sum( I_nR_rS2[(i+1):] ) / sum(I_nR_rS2) for i in range(nRatings-1)]
-        obs_HR2_rS2 = [sum( C_nR_rS2[(i+1):] ) / sum(C_nR_rS2) for i in range(nRatings-1)]
-        obs_FAR2_rS1 = [sum( I_nR_rS1[(i+1):] ) / sum(I_nR_rS1) for i in range(nRatings-1)]
-        obs_HR2_rS1 = [sum( C_nR_rS1[(i+1):] ) / sum(C_nR_rS1) for i in range(nRatings-1)]
+        obs_FAR2_rS1, obs_HR2_rS1, obs_FAR2_rS2, obs_HR2_rS2 = obs_rates.tolist()
         
         # find estimated t2FAR and t2HR
         S1mu = -meta_d1/2
@@ -734,35 +1735,9 @@ class Meta_d_prime(object):
         # plt.legend()
         # plt.show()
 
-        C_area_rS2 = 1-fncdf(mt1c1,S2mu,S2sd)
-        I_area_rS2 = 1-fncdf(mt1c1,S1mu,S1sd)
-        
-        C_area_rS1 = fncdf(mt1c1,S1mu,S1sd)
-        I_area_rS1 = fncdf(mt1c1,S2mu,S2sd)
-        
-        est_FAR2_rS2 = []
-        est_HR2_rS2 = []
-        
-        est_FAR2_rS1 = []
-        est_HR2_rS1 = []
-        
-        
-        for i in range(nRatings-1):
-            
-            t2c1_lower = t2c1[(nRatings-1)-(i+1)]
-            t2c1_upper = t2c1[(nRatings-1)+i]
-                
-            I_FAR_area_rS2 = 1-fncdf(t2c1_upper,S1mu,S1sd)
-            C_HR_area_rS2  = 1-fncdf(t2c1_upper,S2mu,S2sd)
-        
-            I_FAR_area_rS1 = fncdf(t2c1_lower,S2mu,S2sd)
-            C_HR_area_rS1  = fncdf(t2c1_lower,S1mu,S1sd)
-        
-            est_FAR2_rS2.append(I_FAR_area_rS2 / I_area_rS2)
-            est_HR2_rS2.append(C_HR_area_rS2 / C_area_rS2)
-            
-            est_FAR2_rS1.append(I_FAR_area_rS1 / I_area_rS1)
-            est_HR2_rS1.append(C_HR_area_rS1 / C_area_rS1)
+        # estimated type 2 rates of the fitted model, one vectorized evaluation
+        # in the layout of obs_rates (criteria from the type 1 criterion outwards)
+        est_FAR2_rS1, est_HR2_rS1, est_FAR2_rS2, est_HR2_rS2 = self.__type2_rate_derivs(results.x, inputObj, order=0)[0].tolist()
         
         
         # package output
@@ -793,6 +1768,12 @@ class Meta_d_prime(object):
         fit['S1units']['t2c1_rS2']  = t2c1[(nRatings-1):]
         
         fit['logL']    = logL
+        fit['success'] = is_success
+        fit['solver']  = solver
+        fit['estimation_method'] = 'MLE'
+        fit['telemetry'] = telemetry
+        if return_se:
+            fit['se'] = self.__observed_information_se(results, inputObj, A, LB, UB, solver)
         
         fit['est_HR2_rS1']  = est_HR2_rS1
         fit['obs_HR2_rS1']  = obs_HR2_rS1
@@ -806,5 +1787,660 @@ class Meta_d_prime(object):
         fit['est_FAR2_rS2'] = est_FAR2_rS2
         fit['obs_FAR2_rS2'] = obs_FAR2_rS2
 
-        return fit
+        return MetaDFit.from_dict(fit)
     
+    def fit_meta_d_MLE_multistart(self, nR_S1, nR_S2, beta, p, n_starts = 8, seed = None, n_jobs = None, agree_tol = 1e-3, s = 1, fncdf = norm.cdf, fninv = norm.ppf):
+        """
+        fit = fit_meta_d_MLE_multistart(nR_S1, nR_S2, beta, p, n_starts, seed, n_jobs, agree_tol, s, fncdf, fninv)
+
+        Runs fit_meta_d_MLE from n_starts initial guesses on a process pool
+        with n_jobs workers (n_jobs = 1 runs them in this process) and
+        returns the fit with the lowest loss among the successful starts, or
+        among all starts if none succeeded.
+
+        Start 0 is the default guess of fit_meta_d_MLE, so the result is
+        never worse than a single fit. The other starts draw meta_d1
+        uniformly from (0, d1) and jitter the type 2 criteria from a
+        numpy Generator seeded with seed (default: beta). Ties in loss are
+        broken by start index, so the result only depends on the inputs and
+        the seed, not on the pool scheduling.
+
+        In addition to the fields of fit_meta_d_MLE, the returned fit has
+        fit['multistart']['n_starts'] = n_starts
+        fit['multistart']['n_success'] = # of starts that converged
+        fit['multistart']['n_agree']   = # of converged starts whose meta_da
+                                         is within agree_tol of the best one
+        fit['multistart']['best']      = index of the returned start
+        fit['multistart']['meta_da'], ['logL'], ['success'] = per-start values
+        """
+        fncdf, fninv = resolve_type1_family(fncdf, fninv)
+        guesses = self.__multistart_guesses(nR_S1, nR_S2, beta, n_starts, seed, s, fninv)
+        args = [(list(nR_S1), list(nR_S2), beta, p, s, fncdf, fninv, None if guess is None else list(guess)) for guess in guesses]
+        if n_jobs == 1:
+            fits = [_fit_meta_d_start(a) for a in args]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                fits = list(pool.map(_fit_meta_d_start, args))
+
+        meta_da = np.array([f['meta_da'] for f in fits])
+        logL = np.array([f['logL'] for f in fits])
+        success = np.array([f['success'] for f in fits])
+        candidates = np.flatnonzero(success) if np.any(success) else np.arange(len(fits))
+        best = candidates[np.argmin(logL[candidates])]  # argmin returns the lowest index on ties
+
+        fit = fits[best]
+        fit['multistart'] = {}
+        fit['multistart']['n_starts']  = len(fits)
+        fit['multistart']['n_success'] = int(np.sum(success))
+        fit['multistart']['n_agree']   = int(np.sum(success & (np.abs(meta_da - meta_da[best]) <= agree_tol)))
+        fit['multistart']['best']      = int(best)
+        fit['multistart']['meta_da']   = meta_da
+        fit['multistart']['logL']      = logL
+        fit['multistart']['success']   = success
+        return fit
+
+    def fit_meta_d_MLE_sweep(self, nR_S1, nR_S2, betas, ps, s = 1, fncdf = norm.cdf, fninv = norm.ppf, exact_hess = False):
+        """
+        fits = fit_meta_d_MLE_sweep(nR_S1, nR_S2, betas, ps, s, fncdf, fninv, exact_hess)
+
+        Fits one count table at every (beta, p) of the grid betas x ps.
+
+        The grid is walked in a snake order (ps forwards for the first beta,
+        backwards for the second, ...) so that consecutive fits are
+        neighbouring grid points, and each fit is started from the solution
+        of the previous one. Neighbouring optima are nearly identical, so
+        this takes far fewer iterations than fitting every point from
+        scratch. If a warm-started fit fails, the point is refitted from the
+        default guess of fit_meta_d_MLE and the better of the two is kept.
+
+        Returns the solution path: the list of fits in the order they were
+        computed. In addition to the fields of fit_meta_d_MLE, each fit has
+        fit['sweep']['beta'], ['p'] = grid point of the fit
+        fit['sweep']['warm_start']   = whether the kept fit was warm-started
+        fit['sweep']['cold_restart'] = whether a cold restart was attempted
+        """
+        fncdf, fninv = resolve_type1_family(fncdf, fninv)
+        fits = []
+        guess = None
+        for i, beta in enumerate(betas):
+            for p in (ps if i % 2 == 0 else ps[::-1]):
+                fit = self.fit_meta_d_MLE(nR_S1, nR_S2, beta, p, s=s, fncdf=fncdf, fninv=fninv, exact_hess=exact_hess, guess=guess)
+                warm_start = guess is not None
+                cold_restart = warm_start and not fit['success']
+                if cold_restart:
+                    cold = self.fit_meta_d_MLE(nR_S1, nR_S2, beta, p, s=s, fncdf=fncdf, fninv=fninv, exact_hess=exact_hess)
+                    if cold['success'] or cold['logL'] < fit['logL']:
+                        fit = cold
+                        warm_start = False
+
+                fit['sweep'] = {}
+                fit['sweep']['beta']         = beta
+                fit['sweep']['p']            = p
+                fit['sweep']['warm_start']   = warm_start
+                fit['sweep']['cold_restart'] = cold_restart
+                fits.append(fit)
+
+                if fit['success']:
+                    guess = self.__fit_parameters(fit)
+        return fits
+
+    def __fit_parameters(self, fit):
+        # optimizer parameters [meta_d1, t2c1 - meta_c1] of a packaged fit
+        S1units = fit['S1units']
+        return np.concatenate(([S1units['meta_d1']],
+                               np.asarray(S1units['t2c1_rS1']) - S1units['meta_c1'],
+                               np.asarray(S1units['t2c1_rS2']) - S1units['meta_c1']))
+
+    def __multistart_guesses(self, nR_S1, nR_S2, beta, n_starts, seed, s, fninv):
+        # initial guesses [meta_d1, t2c1 - t1c1] for fit_meta_d_MLE_multistart
+        # (None for the default guess of fit_meta_d_MLE)
+        nRatings = int(len(nR_S1) / 2)
+        nR_S1 = np.asarray(nR_S1, dtype=float)
+        nR_S2 = np.asarray(nR_S2, dtype=float)
+        ratingHR  = np.array([np.sum(nR_S2[c:]) / np.sum(nR_S2) for c in range(1, 2*nRatings)])
+        ratingFAR = np.array([np.sum(nR_S1[c:]) / np.sum(nR_S1) for c in range(1, 2*nRatings)])
+        t1_index = nRatings-1
+        zHR, zFAR = inverse_cdf(fninv, ratingHR), inverse_cdf(fninv, ratingFAR)
+        d1 = (1/s) * (zHR[t1_index] - zFAR[t1_index])
+        c1 = (-1/(1+s)) * (zHR + zFAR)
+        t2c1 = np.delete(c1, t1_index) - c1[t1_index]
+
+        # start 0: the default guess of fit_meta_d_MLE
+        guesses = [None]
+
+        if seed is None:
+            seed = random.Random(beta).getrandbits(32)
+        rng = np.random.default_rng(seed)
+        for k in range(1, n_starts):
+            jittered = t2c1 + rng.normal(0.0, 0.25, len(t2c1))
+            lower = np.sort(np.clip(jittered[:nRatings-1], -20, -self.__criteria_min_gap(nRatings)))
+            upper = np.sort(np.clip(jittered[nRatings-1:], self.__criteria_min_gap(nRatings), 20))
+            guesses.append(np.concatenate(([rng.uniform(0.0, d1)], lower, upper)))
+        return guesses
+
+    def fit_meta_d_MLE_bootstrap(self, nR_S1, nR_S2, beta, p, n_boot = 1000, alpha = 0.05, padAmount = 0, seed = None, n_jobs = None, time_budget = None, s = 1, fncdf = norm.cdf, fninv = norm.ppf, solver = 'trust-constr'):
+        """
+        fit = fit_meta_d_MLE_bootstrap(nR_S1, nR_S2, beta, p, n_boot, alpha, padAmount, seed, n_jobs, time_budget, s, fncdf, fninv, solver)
+
+        Fits nR_S1 + padAmount, nR_S2 + padAmount with fit_meta_d_MLE and adds
+        bootstrap confidence intervals for meta_da, M_ratio and M_diff.
+
+        Each of the n_boot replicates redraws the trials of both stimuli from
+        a multinomial with the observed response proportions (all replicates
+        in one vectorized draw from a numpy Generator seeded with seed,
+        default: beta), adds padAmount to every cell, as trials2counts does
+        with padCells = 1, and is fitted on a process pool with n_jobs workers
+        (n_jobs = 1 fits them in this process). Replicate fits start from the
+        full-data solution, so they need far fewer iterations than a fit from
+        scratch. Pass the unpadded counts together with padAmount: without
+        padding, replicates with empty cells often cannot be fitted.
+
+        Returns [alpha/2, 1-alpha/2] percentile and BCa intervals. The BCa
+        acceleration comes from a jackknife over the trials. Leaving out any
+        trial of a cell gives the same table, so only one fit per non-empty
+        cell is needed. It is weighted by the cell's trial count.
+
+        If time_budget (seconds) is given, fitting stops once it has elapsed:
+        replicate fits still running then are stopped by their own
+        time_budget, and the intervals are computed from the replicates
+        finished by then. All fits use the given fit_meta_d_MLE solver.
+
+        In addition to the fields of fit_meta_d_MLE, the returned fit has
+        fit['bootstrap']['n_boot']    = n_boot
+        fit['bootstrap']['n_done']    = # of replicates fitted within the budget
+        fit['bootstrap']['n_success'] = # of those whose fit converged
+        fit['bootstrap']['timed_out'] = whether time_budget ran out
+        fit['bootstrap']['elapsed']   = wall-clock time in seconds
+        fit['bootstrap']['meta_da'], ['M_ratio'], ['M_diff'], ['success']
+                                      = per-replicate values (NaN if not done)
+        fit['bootstrap']['ci_percentile'][name] = (lower, upper) percentile interval
+        fit['bootstrap']['ci_bca'][name]        = (lower, upper) BCa interval
+        for name in 'meta_da', 'M_ratio', 'M_diff'. intervals are NaN if no
+        replicate converged, BCa intervals also if no jackknife fit did.
+        """
+        fncdf, fninv = resolve_type1_family(fncdf, fninv)
+        start_time = time.perf_counter()
+        deadline = None if time_budget is None else time.time() + time_budget
+        nR_S1 = np.asarray(nR_S1, dtype=float)
+        nR_S2 = np.asarray(nR_S2, dtype=float)
+
+        fit = self.fit_meta_d_MLE(list(nR_S1 + padAmount), list(nR_S2 + padAmount), beta, p, s=s, fncdf=fncdf, fninv=fninv, solver=solver)
+        guess = list(self.__fit_parameters(fit))
+
+        if seed is None:
+            seed = random.Random(beta).getrandbits(32)
+        rng = np.random.default_rng(seed)
+        boot_S1 = rng.multinomial(int(round(np.sum(nR_S1))), nR_S1 / np.sum(nR_S1), size=n_boot)
+        boot_S2 = rng.multinomial(int(round(np.sum(nR_S2))), nR_S2 / np.sum(nR_S2), size=n_boot)
+        jack_S1, jack_S2, jack_weights = self.__jackknife_tables(nR_S1, nR_S2)
+
+        # jackknife tables first, so the BCa acceleration is available early
+        tables = list(zip(jack_S1, jack_S2)) + list(zip(boot_S1, boot_S2))
+        args = [(list(t1 + padAmount), list(t2 + padAmount), beta, p, s, fncdf, fninv, guess, solver, deadline) for t1, t2 in tables]
+        values = self.__map_with_deadline(_fit_meta_d_resample, args, n_jobs, deadline)
+        done = np.array([v is not None for v in values])
+        values = np.array([v if v is not None else (np.nan, np.nan, np.nan, False) for v in values], dtype=float)
+        values[values[:, 3] == 0, :3] = np.nan
+        jack, boot = values[:len(jack_S1)], values[len(jack_S1):]
+
+        fit['bootstrap'] = {}
+        fit['bootstrap']['n_boot']    = n_boot
+        fit['bootstrap']['n_done']    = int(np.sum(done[len(jack_S1):]))
+        fit['bootstrap']['n_success'] = int(np.sum(boot[:, 3] == 1))
+        fit['bootstrap']['timed_out'] = not np.all(done)
+        fit['bootstrap']['success']   = boot[:, 3] == 1
+        fit['bootstrap']['ci_percentile'] = {}
+        fit['bootstrap']['ci_bca'] = {}
+        for k, name in enumerate(['meta_da', 'M_ratio', 'M_diff']):
+            theta = boot[:, k][fit['bootstrap']['success']]
+            jack_ok = jack[:, 3] == 1
+            fit['bootstrap'][name] = boot[:, k]
+            if len(theta):
+                fit['bootstrap']['ci_percentile'][name] = tuple(np.quantile(theta, [alpha/2, 1-alpha/2]).tolist())
+            else:
+                fit['bootstrap']['ci_percentile'][name] = (np.nan, np.nan)
+            fit['bootstrap']['ci_bca'][name] = self.__bca_interval(theta, fit[name], jack[jack_ok, k], jack_weights[jack_ok], alpha)
+        fit['bootstrap']['elapsed'] = time.perf_counter() - start_time
+        return fit
+
+    def fit_meta_d_MLE_jackknife(self, nR_S1, nR_S2, beta, p, padAmount = 0, n_jobs = None, s = 1, fncdf = norm.cdf, fninv = norm.ppf, solver = 'L-BFGS-B'):
+        """
+        fit = fit_meta_d_MLE_jackknife(nR_S1, nR_S2, beta, p, padAmount, n_jobs, s, fncdf, fninv, solver)
+
+        Fits nR_S1 + padAmount, nR_S2 + padAmount with fit_meta_d_MLE and adds
+        leave-one-trial-out jackknife standard errors and bias-corrected
+        estimates of meta_da, M_ratio and M_diff.
+
+        Leaving out one trial lowers one cell of the count table by 1, and
+        every trial of a cell gives the same table. The jackknife therefore
+        fits one table per non-empty cell (at most 4*nRatings) and weights
+        each by the cell's trial count. With N trials and leave-one-out
+        estimates theta_i:
+        theta_dot = sum(w_i * theta_i) / N
+        bias      = (N-1) * (theta_dot - theta)
+        se        = sqrt((N-1)/N * sum(w_i * (theta_i - theta_dot)^2))
+        The leave-one-out fits start from the full-data solution and run on a
+        process pool with n_jobs workers (n_jobs = 1 fits them in this
+        process). As in fit_meta_d_MLE_bootstrap, pass unpadded counts
+        together with padAmount.
+
+        The bias multiplies the differences between fits by N-1, so every fit
+        must be solved precisely. The default solver is therefore 'L-BFGS-B':
+        trust-constr can stop a few hundredths of meta-d' short of the optimum.
+
+        In addition to the fields of fit_meta_d_MLE, the returned fit has
+        fit['jackknife']['n_fits']    = # of distinct leave-one-out tables
+        fit['jackknife']['n_trials']  = N
+        fit['jackknife']['n_success'] = # of leave-one-out fits that converged
+        fit['jackknife']['weights']   = trials per leave-one-out table
+        fit['jackknife']['meta_da'], ['M_ratio'], ['M_diff'], ['success']
+                                      = per-table values (NaN if not converged)
+        fit['jackknife']['se'][name], ['bias'][name], ['bias_corrected'][name]
+        for name in 'meta_da', 'M_ratio', 'M_diff'. Tables whose fit did not
+        converge are left out, with N reduced by their trials.
+        """
+        fncdf, fninv = resolve_type1_family(fncdf, fninv)
+        nR_S1 = np.asarray(nR_S1, dtype=float)
+        nR_S2 = np.asarray(nR_S2, dtype=float)
+        fit = self.fit_meta_d_MLE(list(nR_S1 + padAmount), list(nR_S2 + padAmount), beta, p, s=s, fncdf=fncdf, fninv=fninv, solver=solver)
+        guess = list(self.__fit_parameters(fit))
+
+        jack_S1, jack_S2, weights = self.__jackknife_tables(nR_S1, nR_S2)
+        args = [(list(t1 + padAmount), list(t2 + padAmount), beta, p, s, fncdf, fninv, guess, solver, None) for t1, t2 in zip(jack_S1, jack_S2)]
+        values = np.array(self.__map_with_deadline(_fit_meta_d_resample, args, n_jobs, None), dtype=float)
+        success = values[:, 3] == 1
+        values[~success, :3] = np.nan
+        n_trials = np.sum(weights[success])
+
+        fit['jackknife'] = {}
+        fit['jackknife']['n_fits']    = len(weights)
+        fit['jackknife']['n_trials']  = int(n_trials)
+        fit['jackknife']['n_success'] = int(np.sum(success))
+        fit['jackknife']['weights']   = weights
+        fit['jackknife']['success']   = success
+        fit['jackknife']['se'] = {}
+        fit['jackknife']['bias'] = {}
+        fit['jackknife']['bias_corrected'] = {}
+        for k, name in enumerate(['meta_da', 'M_ratio', 'M_diff']):
+            theta = values[:, k]
+            fit['jackknife'][name] = theta
+            if n_trials > 1:
+                theta_dot = np.sum(weights[success] * theta[success]) / n_trials
+                bias = (n_trials - 1) * (theta_dot - fit[name])
+                se = np.sqrt((n_trials - 1) / n_trials * np.sum(weights[success] * (theta[success] - theta_dot)**2))
+            else:
+                bias, se = np.nan, np.nan
+            fit['jackknife']['se'][name] = se
+            fit['jackknife']['bias'][name] = bias
+            fit['jackknife']['bias_corrected'][name] = fit[name] - bias
+        return fit
+
+    def __jackknife_tables(self, nR_S1, nR_S2):
+        # distinct leave-one-trial-out tables of a count table. leaving out any
+        # trial of a cell gives the same table, so there is one table per cell
+        # with at least one trial, weighted by the number of trials in the cell
+        counts = np.concatenate((nR_S1, nR_S2))
+        cells = np.flatnonzero(counts >= 1)
+        tables = np.repeat(counts[np.newaxis, :], len(cells), axis=0)
+        tables[np.arange(len(cells)), cells] -= 1
+        return tables[:, :len(nR_S1)], tables[:, len(nR_S1):], np.floor(counts[cells])
+
+    def __bca_interval(self, theta, theta_hat, theta_jack, jack_weights, alpha):
+        # bias-corrected and accelerated bootstrap interval (Efron, 1987) from
+        # the replicates theta, with the acceleration estimated from weighted
+        # jackknife values
+        if len(theta) == 0 or len(theta_jack) == 0:
+            return (np.nan, np.nan)
+        z0 = norm.ppf((np.sum(theta < theta_hat) + 0.5*np.sum(theta == theta_hat)) / len(theta))
+        d = np.sum(jack_weights * theta_jack) / np.sum(jack_weights) - theta_jack
+        denominator = 6 * np.sum(jack_weights * d**2)**1.5
+        a = np.sum(jack_weights * d**3) / denominator if denominator > 0 else 0.0
+        z = norm.ppf([alpha/2, 1-alpha/2])
+        levels = norm.cdf(z0 + (z0 + z) / (1 - a*(z0 + z)))
+        if not np.all(np.isfinite(levels)):
+            return (np.nan, np.nan)
+        return tuple(np.quantile(theta, levels).tolist())
+
+    def __map_with_deadline(self, fn, args, n_jobs, deadline):
+        # [fn(a) for a in args] on a process pool with n_jobs workers (in this
+        # process if n_jobs == 1), with None for the calls that had not
+        # finished at deadline (a time.time() value, None for no limit). fn
+        # must itself stop at the deadline (see _fit_meta_d_resample), so that
+        # running calls end with it; calls not started by then are cancelled
+        results = [None] * len(args)
+        if n_jobs == 1:
+            for i, a in enumerate(args):
+                if deadline is not None and time.time() >= deadline:
+                    break
+                results[i] = fn(a)
+            return results
+
+        pool = ProcessPoolExecutor(max_workers=n_jobs)
+        futures = {pool.submit(fn, a): i for i, a in enumerate(args)}
+        try:
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            for future in as_completed(futures, timeout=timeout):
+                results[futures[future]] = future.result()
+        except FuturesTimeoutError:
+            pass
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    def __subset_inputObj(self, inputObj, rows):
+        # inputObj of a batched fit restricted to some of its count tables
+        nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p, obs_rates, model_cache = inputObj
+        return [nR_S1[rows], nR_S2[rows], nRatings, d1[rows], t1c1[rows], s, constant_criterion, fncdf, fninv, beta, p, obs_rates[rows], None]
+
+    def __evaluate_batch(self, kind, X, V, inputObj):
+        # one vectorized evaluation of `kind` for a stack of parameter vectors
+        if kind == 'fun':
+            return self.__fit_meta_d_logL_batch(X, inputObj)
+        if kind == 'jac':
+            return self.__fit_meta_d_jac_batch(X, inputObj)
+        if kind == 'hess':
+            return self.__fit_meta_d_hess_batch(X, inputObj)
+        if kind == 'cons':
+            return self.__idealization_cons_batch(X, inputObj)
+        if kind == 'cons_jac':
+            return self.__idealization_cons_jac_batch(X, inputObj)
+        if kind == 'cons_hess':
+            return self.__idealization_cons_hess_batch(X, V, inputObj)
+        raise ValueError(f"unknown evaluation: {kind}")
+
+    def fit_meta_d_MLE_batch(self, nR_S1, nR_S2, beta, p, s = 1, fncdf = norm.cdf, fninv = norm.ppf, exact_hess = False, batch_size = 64):
+        """
+        fits = fit_meta_d_MLE_batch(nR_S1, nR_S2, beta, p, s, fncdf, fninv, exact_hess, batch_size)
+
+        Fits meta-d' to many count tables at once.
+
+        nR_S1 and nR_S2 are arrays of shape (B, 2*nRatings), one count table per
+        row in the layout described in fit_meta_d_MLE. Every table gets the
+        same trust-constr optimization as in fit_meta_d_MLE (same initial guess,
+        bounds, constraints and Hessian approximations), so the results are
+        the same as fitting the tables one at a time with the default solver
+        (without reference_check). The optimizations run in
+        lockstep (see _LockstepEvaluator): up to batch_size of them at a time,
+        and every round of objective / constraint / derivative evaluations is
+        answered with one vectorized fncdf call over all of them. fncdf must
+        have closed-form derivatives (see get_cdf_derivatives).
+
+        Tables with a non-positive type 1 d' cannot be fitted and are returned
+        as NaN with success = False.
+
+        Returns a dict of arrays with the fields of fit_meta_d_MLE (da, s,
+        meta_da, M_diff, M_ratio, meta_ca, t2ca_rS1, t2ca_rS2, S1units, logL),
+        each with a leading axis of length B, plus
+        fits['success'] = fit['success'] of each table, as in fit_meta_d_MLE
+        """
+        fncdf, fninv = resolve_type1_family(fncdf, fninv)
+        if get_cdf_derivatives(fncdf) is None:
+            raise ValueError('fit_meta_d_MLE_batch needs a fncdf with closed-form derivatives')
+
+        nR_S1 = np.atleast_2d(np.asarray(nR_S1, dtype=float))
+        nR_S2 = np.atleast_2d(np.asarray(nR_S2, dtype=float))
+        if nR_S1.shape != nR_S2.shape:
+            raise ValueError('input arrays must have the same shape')
+        if (nR_S1.shape[1] % 2) != 0:
+            raise ValueError('input arrays must have an even number of columns')
+
+        nTables = nR_S1.shape[0]
+        nRatings = nR_S1.shape[1] // 2
+        nCriteria = 2*nRatings - 1
+        constant_criterion = 'meta_d1 * (t1c1 / d1)' # relative criterion
+
+        # type 1 parameters and initial guesses, as in fit_meta_d_MLE
+        ratingHR  = np.flip(np.cumsum(np.flip(nR_S2, axis=1), axis=1), axis=1)[:, 1:] / np.sum(nR_S2, axis=1, keepdims=True)
+        ratingFAR = np.flip(np.cumsum(np.flip(nR_S1, axis=1), axis=1), axis=1)[:, 1:] / np.sum(nR_S1, axis=1, keepdims=True)
+        t1_index = nRatings-1
+        t2_index = [i for i in range(nCriteria) if i != t1_index]
+        zHR, zFAR = inverse_cdf(fninv, ratingHR), inverse_cdf(fninv, ratingFAR)
+        d1 = (1/s) * (zHR[:, t1_index] - zFAR[:, t1_index])
+        c1 = (-1/(1+s)) * (zHR + zFAR)
+        t1c1 = c1[:, t1_index]
+        t2c1 = c1[:, t2_index]
+
+        guess = self.__initial_guess(nR_S1, nR_S2, d1, t1c1, beta, s, fninv)
+        LB, UB = self.__parameter_bounds(d1, nRatings)
+
+        A, lb, ub = self.__criteria_order_constraint(nCriteria)
+        sparse_jacobian = self.__sparse_constraints(nRatings)
+        linear_constraint = LinearConstraint(A if sparse_jacobian else A.toarray(), lb, ub)
+        obs_rates = self.__type2_obs_rates(nR_S1, nR_S2, nRatings)
+        inputObj = [nR_S1, nR_S2, nRatings, d1, t1c1, s, constant_criterion, fncdf, fninv, beta, p, obs_rates, None]
+
+        def fit_one(i, evaluate):
+            if exact_hess:
+                hess = lambda x: evaluate('hess', x)
+                cons_hess = lambda x, v: evaluate('cons_hess', x, v)
+            else:
+                hess = SR1()
+                cons_hess = BFGS()
+            nonlinear_constraint = NonlinearConstraint(lambda x: evaluate('cons', x), [beta] * ((nRatings - 1) * 2), [np.inf] * ((nRatings - 1) * 2),
+                                                       jac=lambda x: evaluate('cons_jac', x), hess=cons_hess)
+            return minimize(lambda x: evaluate('fun', x), guess[i], method='trust-constr',
+                            jac=lambda x: evaluate('jac', x), hess=hess,
+                            constraints=[linear_constraint, nonlinear_constraint],
+                            options = self.__trust_constr_options(sparse_jacobian), bounds = Bounds(LB[i], UB[i]))
+
+        def evaluate_batch(kind, rows, X, V):
+            return self.__evaluate_batch(kind, X, V, self.__subset_inputObj(inputObj, rows))
+
+        items = np.flatnonzero(np.isfinite(d1) & (d1 > 0) & np.all(np.isfinite(guess), axis=1))
+        results = _LockstepEvaluator(evaluate_batch, batch_size).run(fit_one, items)
+
+        X = np.full((nTables, nCriteria), np.nan)
+        success = np.zeros(nTables, dtype=bool)
+        for i in items:
+            X[i] = results[i].x
+            success[i] = results[i].success
+
+        # package output, as in fit_meta_d_MLE
+        logL = np.full(nTables, np.nan)
+        if len(items):
+            logL[items] = self.__fit_meta_d_logL_batch(X[items], self.__subset_inputObj(inputObj, items))
+        meta_d1 = X[:, 0]
+        mt1c1 = meta_d1 * (t1c1 / d1)
+        t2c1 = X[:, 1:] + mt1c1[:, None]
+
+        fits = {}
+        fits['da']       = np.sqrt(2/(1+s**2)) * s * d1
+        fits['s']        = s
+        fits['meta_da']  = np.sqrt(2/(1+s**2)) * s * meta_d1
+        fits['M_diff']   = fits['meta_da'] - fits['da']
+        fits['M_ratio']  = fits['meta_da'] / fits['da']
+        fits['meta_ca']  = ( np.sqrt(2)*s / np.sqrt(1+s**2) ) * mt1c1
+        t2ca             = ( np.sqrt(2)*s / np.sqrt(1+s**2) ) * t2c1
+        fits['t2ca_rS1'] = t2ca[:, 0:nRatings-1]
+        fits['t2ca_rS2'] = t2ca[:, (nRatings-1):]
+
+        fits['S1units'] = {}
+        fits['S1units']['d1']        = d1
+        fits['S1units']['meta_d1']   = meta_d1
+        fits['S1units']['s']         = s
+        fits['S1units']['meta_c1']   = mt1c1
+        fits['S1units']['t2c1_rS1']  = t2c1[:, 0:nRatings-1]
+        fits['S1units']['t2c1_rS2']  = t2c1[:, (nRatings-1):]
+
+        fits['logL']    = logL
+        fits['success'] = success
+        fits['estimation_method'] = 'MLE'
+
+        return fits
+
+    def quick_estimate(self, nR_S1, nR_S2, s = 1, flag_tol = 0.25, fncdf = norm.cdf, fninv = norm.ppf):
+        """
+        fit = quick_estimate(nR_S1, nR_S2, s, flag_tol, fncdf, fninv)
+
+        Fast screening estimate of meta-d', without running the optimizer.
+        fncdf and fninv are the type 1 CDF and its inverse, or a Type1Family
+        or family name, as for fit_meta_d_MLE. The closed forms below need a
+        distribution that is symmetric about its mean (as every Type1Family
+        is); other CDFs raise a ValueError.
+
+        For a candidate meta_d1, the type 1 criterion is placed relative to
+        meta_d1 as in fit_meta_d_MLE. The type 2 criteria are then set in
+        closed form so that the model reproduces the observed type 2 false
+        alarm rates exactly. meta_d1 is chosen so that the model's type 2 ROC
+        through those points has the same area (trapezoid rule) as the
+        observed HR2 / FAR2 points, summed over "S1" and "S2" responses. The
+        area grows with meta_d1, so this is a vectorized bisection over
+        [0, d1].
+
+        The idealization constraint (beta) is not applied. A table is
+        flagged for the full fit (fit['needs_full_fit']) when:
+        - the estimate is at a bound (0 or d1);
+        - estimates from "S1" and "S2" responses alone differ by more than
+          flag_tol * d1;
+        - the table has empty cells;
+        - d1 is not positive and finite.
+
+        nR_S1 and nR_S2 are either single count tables, giving a MetaDFit
+        with the fields of fit_meta_d_MLE, or arrays of shape (B, 2*nRatings),
+        giving a dict of arrays as fit_meta_d_MLE_batch. In addition,
+        fit['estimation_method'] = 'quick_estimate'
+        fit['needs_full_fit']    = whether the table should get the full fit
+        fit['flags']             = the reasons, from 'at_bound', 'sides_disagree',
+                                   'zero_cells' and 'invalid'
+        """
+        single = np.ndim(nR_S1) == 1
+        nR_S1 = np.atleast_2d(np.asarray(nR_S1, dtype=float))
+        nR_S2 = np.atleast_2d(np.asarray(nR_S2, dtype=float))
+        nRatings = nR_S1.shape[1] // 2
+        fncdf, fninv = resolve_type1_family(fncdf, fninv)
+        if is_norm_cdf(fncdf) and fninv == norm.ppf:
+            cdf, ppf = ndtr, ndtri
+        else:
+            cdf, ppf = fncdf, fninv
+            z = np.linspace(-4, 4, 17)
+            if not np.allclose(cdf(-z), 1 - cdf(z)):
+                raise ValueError('quick_estimate needs a type 1 distribution that is symmetric about its mean')
+
+        # type 1 parameters, as in fit_meta_d_MLE
+        ratingHR  = np.flip(np.cumsum(np.flip(nR_S2, axis=1), axis=1), axis=1)[:, 1:] / np.sum(nR_S2, axis=1, keepdims=True)
+        ratingFAR = np.flip(np.cumsum(np.flip(nR_S1, axis=1), axis=1), axis=1)[:, 1:] / np.sum(nR_S1, axis=1, keepdims=True)
+        t1_index = nRatings-1
+        d1 = (1/s) * (ppf(ratingHR[:, t1_index]) - ppf(ratingFAR[:, t1_index]))
+        t1c1 = (-1/(1+s)) * (ppf(ratingHR[:, t1_index]) + ppf(ratingFAR[:, t1_index]))
+        valid = np.isfinite(d1) & (d1 > 0) & np.isfinite(t1c1)
+        k = np.where(valid, t1c1 / np.where(valid, d1, 1), 0.0)[:, np.newaxis]
+        upper_bound = np.where(valid, d1, 0.0)
+
+        obs_rates = self.__type2_obs_rates(nR_S1, nR_S2, nRatings)
+        obs_FAR2_rS1, obs_HR2_rS1, obs_FAR2_rS2, obs_HR2_rS2 = np.moveaxis(obs_rates, 1, 0)
+
+        # trapezoid weights of the ROC points: the type 2 rates fall with the
+        # rating, so the points are in descending order of FAR2
+        def trapezoid_weights(FAR2):
+            F = np.concatenate((np.ones((len(FAR2), 1)), FAR2, np.zeros((len(FAR2), 1))), axis=1)
+            return (F[:, :-2] - F[:, 2:]) / 2
+        w_rS1 = trapezoid_weights(obs_FAR2_rS1)
+        w_rS2 = trapezoid_weights(obs_FAR2_rS2)
+
+        def model(m):
+            # criteria reproducing the observed FAR2 and the model's HR2 there
+            # for meta_d1 = m of shape (B, J), with the type 1 criterion at 0 as
+            # in __sdt_means. returns arrays of shape (B, J, nRatings-1)
+            m = m[:, :, np.newaxis]
+            mu1 = -m * (0.5 + k[:, :, np.newaxis])
+            mu2 = m * (0.5 - k[:, :, np.newaxis])
+            sd2 = 1/s
+            t_rS1 = mu2 + sd2 * ppf(obs_FAR2_rS1[:, np.newaxis] * cdf(-mu2 / sd2))
+            t_rS2 = mu1 - ppf(obs_FAR2_rS2[:, np.newaxis] * cdf(mu1))
+            HR2_rS1 = cdf(t_rS1 - mu1) / cdf(-mu1)
+            HR2_rS2 = cdf((mu2 - t_rS2) / sd2) / cdf(mu2 / sd2)
+            return t_rS1, t_rS2, HR2_rS1, HR2_rS2
+
+        def area_gap(m):
+            # model minus observed type 2 ROC area for "S1" and "S2" responses
+            # together (m[:, 0]), "S1" responses (m[:, 1]) and "S2" responses (m[:, 2])
+            _, _, HR2_rS1, HR2_rS2 = model(m)
+            gap_rS1 = np.sum(w_rS1[:, np.newaxis] * (HR2_rS1 - obs_HR2_rS1[:, np.newaxis]), axis=2)
+            gap_rS2 = np.sum(w_rS2[:, np.newaxis] * (HR2_rS2 - obs_HR2_rS2[:, np.newaxis]), axis=2)
+            return np.stack([gap_rS1[:, 0] + gap_rS2[:, 0], gap_rS1[:, 1], gap_rS2[:, 2]], axis=1)
+
+        # bisection for the three area matches at once, in [0, d1]
+        lo = np.zeros((len(d1), 3))
+        hi = np.repeat(upper_bound[:, np.newaxis], 3, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            below = area_gap(lo) >= 0
+            above = area_gap(hi) <= 0
+            for _ in range(50):
+                mid = (lo + hi) / 2
+                low_side = area_gap(mid) < 0
+                lo = np.where(low_side, mid, lo)
+                hi = np.where(low_side, hi, mid)
+            estimates = np.where(below, 0.0, np.where(above, hi, (lo + hi) / 2))
+            meta_d1 = np.where(valid, estimates[:, 0], np.nan)
+            t_rS1, t_rS2, est_HR2_rS1, est_HR2_rS2 = [v[:, 0] for v in model(meta_d1[:, np.newaxis])]
+
+        flags = [[] for _ in range(len(d1))]
+        for i in np.flatnonzero(valid & (below[:, 0] | above[:, 0])):
+            flags[i].append('at_bound')
+        for i in np.flatnonzero(valid & (np.abs(estimates[:, 1] - estimates[:, 2]) > flag_tol * upper_bound)):
+            flags[i].append('sides_disagree')
+        for i in np.flatnonzero(np.any(nR_S1 == 0, axis=1) | np.any(nR_S2 == 0, axis=1)):
+            flags[i].append('zero_cells')
+        for i in np.flatnonzero(~valid):
+            flags[i].append('invalid')
+
+        # package output, as in fit_meta_d_MLE_batch
+        mt1c1 = meta_d1 * k[:, 0]
+        t2c1 = np.concatenate((np.flip(t_rS1, axis=1), t_rS2), axis=1) + mt1c1[:, np.newaxis]
+        inputObj = [nR_S1, nR_S2, nRatings, d1, t1c1, s, 'meta_d1 * (t1c1 / d1)', fncdf, fninv, 0, 0, obs_rates, None]
+        X = np.concatenate((meta_d1[:, np.newaxis], t2c1 - mt1c1[:, np.newaxis]), axis=1)
+        logL = np.full(len(d1), np.nan)
+        if np.any(valid):
+            logL[valid] = self.__fit_meta_d_logL_batch(X[valid], self.__subset_inputObj(inputObj, valid))
+
+        fits = {}
+        fits['da']       = np.sqrt(2/(1+s**2)) * s * d1
+        fits['s']        = s
+        fits['meta_da']  = np.sqrt(2/(1+s**2)) * s * meta_d1
+        fits['M_diff']   = fits['meta_da'] - fits['da']
+        fits['M_ratio']  = fits['meta_da'] / fits['da']
+        fits['meta_ca']  = ( np.sqrt(2)*s / np.sqrt(1+s**2) ) * mt1c1
+        t2ca             = ( np.sqrt(2)*s / np.sqrt(1+s**2) ) * t2c1
+        fits['t2ca_rS1'] = t2ca[:, 0:nRatings-1]
+        fits['t2ca_rS2'] = t2ca[:, (nRatings-1):]
+
+        fits['S1units'] = {}
+        fits['S1units']['d1']        = d1
+        fits['S1units']['meta_d1']   = meta_d1
+        fits['S1units']['s']         = s
+        fits['S1units']['meta_c1']   = mt1c1
+        fits['S1units']['t2c1_rS1']  = t2c1[:, 0:nRatings-1]
+        fits['S1units']['t2c1_rS2']  = t2c1[:, (nRatings-1):]
+
+        fits['logL']    = logL
+        fits['success'] = valid
+
+        fits['est_HR2_rS1']  = est_HR2_rS1
+        fits['obs_HR2_rS1']  = obs_HR2_rS1
+        fits['est_FAR2_rS1'] = np.where(valid[:, np.newaxis], obs_FAR2_rS1, np.nan)
+        fits['obs_FAR2_rS1'] = obs_FAR2_rS1
+        fits['est_HR2_rS2']  = est_HR2_rS2
+        fits['obs_HR2_rS2']  = obs_HR2_rS2
+        fits['est_FAR2_rS2'] = np.where(valid[:, np.newaxis], obs_FAR2_rS2, np.nan)
+        fits['obs_FAR2_rS2'] = obs_FAR2_rS2
+
+        fits['estimation_method'] = 'quick_estimate'
+        fits['needs_full_fit']    = np.array([len(f) > 0 for f in flags])
+        fits['flags']             = flags
+        if not single:
+            return fits
+
+        # a single table: scalars and lists, as returned by fit_meta_d_MLE
+        fit = {}
+        for key, value in fits.items():
+            if key == 'S1units':
+                fit[key] = {k: (v[0] if np.ndim(v) else v) for k, v in value.items()}
+            elif key in ('s', 'estimation_method'):
+                fit[key] = value
+            elif key.startswith(('est_', 'obs_')):
+                fit[key] = value[0].tolist()
+            elif key in ('success', 'needs_full_fit'):
+                fit[key] = bool(value[0])
+            else:
+                fit[key] = value[0]
+        return MetaDFit.from_dict(fit)
@@ -0,0 +1,237 @@
+import io
+import time
+import argparse
+import warnings
+import contextlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import brentq
+from scipy.special import ndtr
+from meta_d_prime import Meta_d_prime
+
+
+def model_probabilities(d, meta_d, c, t2c_rS1, t2c_rS2):
+    # (pS1, pS2): probabilities of the 2*nRatings response cells (in the
+    # layout of nR_S1 / nR_S2) of an equal-variance observer of the meta-d'
+    # model; with meta_d = d (and c the type 1 criterion) a plain SDT
+    # observer. the simulations of benchmark_fits.py, benchmark_solvers.py and
+    # regression_near_empty.py draw their count tables from these.
+    # type 1 responses follow d' and c; given the response, the rating
+    # follows the meta-d' distributions truncated at meta_c = meta_d * c / d,
+    # with type 2 criteria meta_c + t2c_rS1 (ascending) and meta_c + t2c_rS2
+    meta_c = meta_d * c / d
+    lower = np.concatenate(([-np.inf], meta_c + np.asarray(t2c_rS1), [meta_c]))
+    upper = np.concatenate(([meta_c], meta_c + np.asarray(t2c_rS2), [np.inf]))
+    probabilities = []
+    for sign in (-0.5, 0.5):
+        p_rS2 = ndtr(sign * d - c)
+        mu = sign * meta_d
+        # "S1" cells run from the lowest evidence (highest rating) upwards,
+        # "S2" cells from meta_c upwards, so both are plain interval masses
+        mass_rS1 = np.diff(ndtr(lower - mu)) / ndtr(meta_c - mu)
+        mass_rS2 = -np.diff(ndtr(mu - upper)) / ndtr(mu - meta_c)
+        probabilities.append(np.concatenate(((1 - p_rS2) * mass_rS1, p_rS2 * mass_rS2)))
+    return probabilities[0], probabilities[1]
+
+
+def uniform_rating_criteria(d, meta_d, c, nRatings):
+    # (t2c_rS1, t2c_rS2): type 2 criteria, as offsets from meta_c, under which
+    # every rating is equally frequent among the "S1" and among the "S2"
+    # responses of the meta-d' model (with equally frequent stimuli)
+    meta_c = meta_d * c / d
+    signs = np.array([-0.5, 0.5])
+    mus = signs * meta_d
+    # share of each stimulus among the "S2" / "S1" responses (type 1 model),
+    # times the truncated meta-d' mass beyond x on that side
+    w_rS2 = ndtr(signs * d - c) / ndtr(mus - meta_c)
+    w_rS1 = ndtr(c - signs * d) / ndtr(meta_c - mus)
+    above = lambda x: np.sum(w_rS2 * ndtr(mus - x))
+    below = lambda x: np.sum(w_rS1 * ndtr(x - mus))
+    t2c_rS2 = [brentq(lambda x: above(x) - (1 - k/nRatings) * above(meta_c), meta_c, meta_c + 40) - meta_c
+               for k in range(1, nRatings)]
+    t2c_rS1 = [brentq(lambda x: below(x) - (k/nRatings) * below(meta_c), meta_c - 40, meta_c) - meta_c
+               for k in range(1, nRatings)]
+    return np.array(t2c_rS1), np.array(t2c_rS2)
+
+
+def simulate_count_tables(rng, n_reps, n_trials, pS1, pS2, padAmount):
+    # (nR_S1, nR_S2) arrays of shape (n_reps, 2*nRatings): n_reps count tables
+    # of n_trials trials per stimulus, drawn in one multinomial call each and
+    # padded as trials2counts(padCells = 1) would
+    nR_S1 = rng.multinomial(n_trials, pS1, size=n_reps) + padAmount
+    nR_S2 = rng.multinomial(n_trials, pS2, size=n_reps) + padAmount
+    return nR_S1, nR_S2
+
+
+# replicate fits per task sent to the process pool of plan_trials
+REPLICATES_PER_TASK = 10
+
+
+def _fit_replicates(args):
+    # (M_ratio, success, seconds) of fit_meta_d_MLE on a stack of simulated
+    # count tables; M_ratio is NaN for fits that raise. module level, so
+    # that it can be sent to a process pool
+    nR_S1, nR_S2, beta, p, solver, time_budget = args
+    meta_d_prime_computer = Meta_d_prime()
+    start = time.perf_counter()
+    M_ratio, success = np.full(len(nR_S1), np.nan), np.zeros(len(nR_S1), dtype=bool)
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for i in range(len(nR_S1)):
+            try:
+                fit = meta_d_prime_computer.fit_meta_d_MLE(list(nR_S1[i]), list(nR_S2[i]), beta, p,
+                                                           solver=solver, time_budget=time_budget)
+                M_ratio[i], success[i] = fit['M_ratio'], fit['success']
+            except Exception:
+                pass
+    return M_ratio, success, time.perf_counter() - start
+
+
+def _interval_width(n_trials, M_ratio, success, alpha, seconds):
+    # width of the central 1 - alpha interval of the M_ratio estimates of
+    # the n_reps simulated tables of n_trials trials per stimulus
+    ok = np.asarray(success, dtype=bool) & np.isfinite(M_ratio)
+    if np.any(ok):
+        lower, upper = np.percentile(M_ratio[ok], [100 * alpha/2, 100 * (1 - alpha/2)])
+    else:
+        lower, upper = np.nan, np.nan
+    return {'n_trials': n_trials, 'width': upper - lower, 'lower': lower, 'upper': upper,
+            'median_M_ratio': np.median(M_ratio[ok]) if np.any(ok) else np.nan,
+            'failure_rate': 1 - np.mean(ok), 'time': seconds}
+
+
+def plan_trials(d, meta_d, target_width, nRatings=4, c=0.0, t2c_rS1=None, t2c_rS2=None, candidates=None,
+                n_reps=200, alpha=0.05, beta=0.0, p=0, padAmount=None, seed=0, solver='L-BFGS-B', time_budget=10,
+                n_jobs=None, refine=True):
+    """
+    plan = plan_trials(d, meta_d, target_width, nRatings, c, t2c_rS1, t2c_rS2, candidates, ...)
+
+    Smallest number of trials per stimulus at which the central 1 - alpha
+    interval of M_ratio estimates is at most target_width wide, for an
+    equal-variance observer with the given d', meta-d', type 1 criterion c
+    and type 2 criteria (offsets from the meta-d' type 1 criterion; by
+    default, the criteria of uniform_rating_criteria).
+
+    For each candidate N (default: 25 * 2**k up to 12800), n_reps count
+    tables are drawn from the model (one vectorized multinomial draw per
+    stimulus), padded with padAmount (default 1/(2*nRatings), as
+    trials2counts) and fitted with fit_meta_d_MLE(solver=solver,
+    time_budget=time_budget); fits that fail or raise are left out (see
+    'failure_rate'; an N where half the fits fail never meets the target).
+    The tables are not fitted with fit_meta_d_MLE_batch: its lockstep
+    trust-constr runs wait for the slowest table, and a single table that
+    does not converge holds up the whole batch.
+
+    The width is that of the spread of the estimates, i.e. of a percentile
+    interval a study of that size would get. The fits are spread over a
+    process pool of n_jobs workers in chunks of REPLICATES_PER_TASK
+    replicates (n_jobs = 1 runs them in this process), so the candidates
+    and each single N of the refinement keep every worker busy. If refine
+    is True, N is then bisected between the largest candidate that misses
+    the target and the smallest one that meets it, to within 10%.
+
+    Each N has its own seeded tables (drawn in this process), so results are
+    reproducible and do not depend on n_jobs, but the
+    widths are Monte Carlo estimates: with n_reps = 200 the width of a 95%
+    interval is typically known to within about 10%. meta-d' estimates are
+    bounded by d', so for M_ratio close to 1 the upper end of the interval
+    is cut off and the width understates the uncertainty.
+
+    Returns a dict with
+    plan['n_trials']    = smallest N that met the target (None if none did)
+    plan['total_trials'] = 2 * plan['n_trials'] (both stimuli)
+    plan['evaluated']   = the per-N results ('n_trials', 'width', 'lower',
+                          'upper', 'median_M_ratio', 'failure_rate', and
+                          'time', the seconds spent fitting summed over
+                          workers), sorted by N
+    """
+    if candidates is None:
+        candidates = [25 * 2**k for k in range(10)]
+    if t2c_rS1 is None or t2c_rS2 is None:
+        t2c_rS1, t2c_rS2 = uniform_rating_criteria(d, meta_d, c, nRatings)
+    if padAmount is None:
+        padAmount = 1/(2*nRatings)
+    pS1, pS2 = model_probabilities(d, meta_d, c, t2c_rS1, t2c_rS2)
+
+    def evaluate(ns):
+        tasks, chunks = [], []
+        for n in ns:
+            rng = np.random.default_rng([seed, int(n)])
+            nR_S1, nR_S2 = simulate_count_tables(rng, n_reps, int(n), pS1, pS2, padAmount)
+            for first in range(0, n_reps, REPLICATES_PER_TASK):
+                rows = slice(first, first + REPLICATES_PER_TASK)
+                tasks.append((nR_S1[rows], nR_S2[rows], beta, p, solver, time_budget))
+                chunks.append(int(n))
+        if pool is None:
+            fitted = [_fit_replicates(t) for t in tasks]
+        else:
+            fitted = list(pool.map(_fit_replicates, tasks))
+        results = []
+        for n in ns:
+            mine = [f for f, chunk_n in zip(fitted, chunks) if chunk_n == int(n)]
+            results.append(_interval_width(int(n), np.concatenate([f[0] for f in mine]),
+                                           np.concatenate([f[1] for f in mine]), alpha, sum(f[2] for f in mine)))
+        return results
+
+    pool = None if n_jobs == 1 else ProcessPoolExecutor(max_workers=n_jobs)
+    try:
+        evaluated = evaluate(sorted(set(candidates)))
+        meets = lambda r: r['width'] <= target_width and r['failure_rate'] < 0.5
+        passing = [r['n_trials'] for r in evaluated if meets(r)]
+        n_best = min(passing) if passing else None
+
+        if refine and n_best is not None:
+            failing = [r['n_trials'] for r in evaluated if r['n_trials'] < n_best]
+            low, high = (max(failing) if failing else 0), n_best
+            while high - low > max(1, 0.1 * high):
+                mid = (low + high) // 2
+                r = evaluate([mid])[0]
+                evaluated.append(r)
+                if meets(r):
+                    high = mid
+                else:
+                    low = mid
+            n_best = high
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    evaluated.sort(key=lambda r: r['n_trials'])
+    return {'n_trials': n_best, 'total_trials': None if n_best is None else 2 * n_best, 'evaluated': evaluated,
+            'd': d, 'meta_d': meta_d, 'target_width': target_width, 'alpha': alpha}
+
+
+def report(plan):
+    print(f"{'N/stimulus':>11}{'width':>9}{'lower':>9}{'upper':>9}{'median M':>10}{'failed':>8}{'time s':>8}")
+    for r in plan['evaluated']:
+        mark = '  <- plan' if r['n_trials'] == plan['n_trials'] else ''
+        print(f"{r['n_trials']:>11}{r['width']:>9.3f}{r['lower']:>9.3f}{r['upper']:>9.3f}"
+              f"{r['median_M_ratio']:>10.3f}{r['failure_rate']:>8.2f}{r['time']:>8.1f}{mark}")
+    if plan['n_trials'] is None:
+        print(f"no candidate reached a {1 - plan['alpha']:.0%} interval width of {plan['target_width']}")
+    else:
+        print(f"{plan['n_trials']} trials per stimulus ({plan['total_trials']} in total) give a "
+              f"{1 - plan['alpha']:.0%} M_ratio interval at most {plan['target_width']} wide")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="smallest number of trials for a target M_ratio interval width")
+    parser.add_argument("--d", type=float, required=True, help="type 1 d'")
+    parser.add_argument("--meta_d", type=float, required=True)
+    parser.add_argument("--target_width", type=float, required=True, help="width of the 1 - alpha M_ratio interval")
+    parser.add_argument("--nRatings", type=int, default=4)
+    parser.add_argument("--c", type=float, default=0.0, help="type 1 criterion")
+    parser.add_argument("--candidates", type=int, nargs="+", default=None, help="trials per stimulus to try")
+    parser.add_argument("--n_reps", type=int, default=200)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.0)
+    parser.add_argument("--p", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--solver", type=str, default="L-BFGS-B")
+    parser.add_argument("--time_budget", type=float, default=10, help="seconds per fit")
+    parser.add_argument("--n_jobs", type=int, default=None)
+    parser.add_argument("--no_refine", action="store_true")
+    args = parser.parse_args()
+    report(plan_trials(args.d, args.meta_d, args.target_width, args.nRatings, args.c, candidates=args.candidates,
+                       n_reps=args.n_reps, alpha=args.alpha, beta=args.beta, p=args.p, seed=args.seed,
+                       solver=args.solver, time_budget=args.time_budget, n_jobs=args.n_jobs, refine=not args.no_refine))
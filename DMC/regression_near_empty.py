@@ -0,0 +1,135 @@
+import io
+import os
+import time
+import argparse
+import warnings
+import contextlib
+import subprocess
+import importlib.util
+import numpy as np
+from meta_d_prime import Meta_d_prime
+from power_analysis import model_probabilities, simulate_count_tables
+
+# the last meta_d_prime.py that clipped the model probabilities at an epsilon
+# instead of evaluating them in log space, the default of --baseline
+EPSILON_CLIPPING_REVISION = '541dd30'
+
+
+def near_empty_tables(seed=0, n_simulated=24):
+    # (name, nR_S1, nR_S2) count tables with empty or nearly empty cells, as
+    # produced by observers (e.g. LLMs) that almost always report the highest
+    # confidence. the hand-written tables come first, then tables simulated
+    # from an equal-variance SDT observer with a large d' and type 2 criteria
+    # far out in the tails. ordinary_padded is a well-filled table (padded
+    # with 1/8 per cell), on which a solver must still match the others
+    tables = [
+        ('ordinary_padded',     [26.125, 35.125, 33.125, 45.125, 14.125, 16.125, 16.125, 17.125],
+                                [9.125, 10.125, 13.125, 12.125, 27.125, 36.125, 34.125, 28.125]),
+        ('all_high_confidence', [60, 0, 0, 0, 0, 0, 0, 40], [30, 0, 0, 0, 0, 0, 0, 70]),
+        ('single_low_rating',   [55, 1, 0, 0, 0, 0, 0, 44], [25, 0, 0, 0, 0, 0, 1, 74]),
+        ('empty_middle',        [70, 5, 0, 0, 0, 0, 4, 21], [12, 3, 0, 0, 0, 0, 6, 79]),
+        ('one_sided_ratings',   [80, 0, 0, 3, 2, 0, 0, 15], [10, 0, 0, 1, 4, 0, 0, 85]),
+        ('near_perfect_type1',  [95, 3, 1, 0, 0, 0, 0, 1],  [1, 0, 0, 0, 0, 1, 3, 95]),
+        ('padded_extreme',      [60.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 40.1], [30.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 70.1]),
+        ('padded_near_perfect', [95.1, 3.1, 1.1, 0.1, 0.1, 0.1, 0.1, 1.1], [1.1, 0.1, 0.1, 0.1, 0.1, 1.1, 3.1, 95.1]),
+        ('six_ratings_sparse',  [120, 2, 0, 0, 0, 1, 0, 0, 0, 0, 1, 30], [20, 0, 1, 0, 0, 0, 0, 0, 1, 0, 3, 140]),
+    ]
+    rng = np.random.default_rng(seed)
+    nRatings = 4
+    for i in range(n_simulated):
+        d = rng.uniform(2.0, 4.0)
+        c = rng.uniform(-0.5, 0.5)
+        t2c_rS1 = -np.cumsum(rng.uniform(0.8, 2.0, nRatings-1))[::-1]
+        t2c_rS2 = np.cumsum(rng.uniform(0.8, 2.0, nRatings-1))
+        n_trials = int(rng.integers(50, 400))
+        # meta-d' = d': the type 2 criteria are offsets from c
+        pS1, pS2 = model_probabilities(d, d, c, t2c_rS1, t2c_rS2)
+        nR_S1, nR_S2 = (table[0] for table in simulate_count_tables(rng, 1, n_trials, pS1, pS2, 0))
+        # every fit needs at least one response of each type per stimulus
+        nR_S1[nRatings-1] += 1
+        nR_S1[nRatings] += 1
+        nR_S2[nRatings-1] += 1
+        nR_S2[nRatings] += 1
+        tables.append((f'simulated_{i}', nR_S1.tolist(), nR_S2.tolist()))
+    return tables
+
+
+def load_revision(revision):
+    # the Meta_d_prime class of meta_d_prime.py at a git revision of this
+    # repository, loaded as a separate module
+    directory = os.path.dirname(os.path.abspath(__file__))
+    source = subprocess.run(['git', 'show', f'{revision}:./meta_d_prime.py'], cwd=directory,
+                            capture_output=True, text=True, check=True).stdout
+    spec = importlib.util.spec_from_loader(f'meta_d_prime_{revision}', loader=None)
+    module = importlib.util.module_from_spec(spec)
+    exec(compile(source, f'{revision}:meta_d_prime.py', 'exec'), module.__dict__)
+    return module.Meta_d_prime
+
+
+def run(tables, beta=0.5, solvers=('trust-constr', 'L-BFGS-B'), maxiter=None, time_budget=60, computer=None, label=''):
+    # fits every table with every solver; an exception counts as a failed fit.
+    # computer is the Meta_d_prime to fit with (default: this tree's), label
+    # is appended to the solver names of the results.
+    # returns {solver + label: {'name', 'success', 'error', 'time', 'nit',
+    # 'meta_da', 'logL'}} with one entry per table
+    meta_d_prime_computer = Meta_d_prime() if computer is None else computer
+    results = {}
+    for solver in solvers:
+        r = {'name': [], 'success': [], 'error': [], 'time': [], 'nit': [], 'meta_da': [], 'logL': []}
+        for name, nR_S1, nR_S2 in tables:
+            start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    fit = meta_d_prime_computer.fit_meta_d_MLE(nR_S1, nR_S2, beta, 0, solver=solver,
+                                                               maxiter=maxiter, time_budget=time_budget)
+                success, error = fit['success'], ''
+                nit, meta_da, logL = fit['telemetry']['nit'], fit['meta_da'], fit['logL']
+            except Exception as e:
+                success, error = False, f'{type(e).__name__}: {e}'
+                nit, meta_da, logL = np.nan, np.nan, np.nan
+            r['name'].append(name)
+            r['success'].append(success)
+            r['error'].append(error)
+            r['time'].append(time.perf_counter() - start)
+            r['nit'].append(nit)
+            r['meta_da'].append(meta_da)
+            r['logL'].append(logL)
+        results[solver + label] = {k: np.array(v) if k not in ('name', 'error') else v for k, v in r.items()}
+    return results
+
+
+def report(results, details=False):
+    print(f"{'solver':<24}{'tables':>8}{'failed':>8}{'errors':>8}{'median s/fit':>14}{'mean s/fit':>12}{'median nit':>12}")
+    for solver, r in results.items():
+        n_errors = sum(bool(e) for e in r['error'])
+        print(f"{solver:<24}{len(r['name']):>8}{np.sum(~r['success']):>8}{n_errors:>8}"
+              f"{np.median(r['time']):>14.3f}{np.mean(r['time']):>12.3f}{np.nanmedian(r['nit']):>12.0f}")
+    if details:
+        for solver, r in results.items():
+            print()
+            print(solver)
+            for i, name in enumerate(r['name']):
+                print(f"  {name:<22}{'ok' if r['success'][i] else 'FAILED':<8}{r['time'][i]:>8.2f}s"
+                      f"{r['nit'][i]:>8.0f}{r['meta_da'][i]:>10.3f}{r['logL'][i]:>10.5f}  {r['error'][i]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fit_meta_d_MLE on count tables with empty or nearly empty cells")
+    parser.add_argument("--beta", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--n_simulated", type=int, default=24)
+    parser.add_argument("--time_budget", type=float, default=60)
+    parser.add_argument("--solver", action="append", help="solver(s) to run (default: trust-constr and L-BFGS-B)")
+    parser.add_argument("--baseline", type=str, default=EPSILON_CLIPPING_REVISION,
+                        help="git revision of meta_d_prime.py to run the same fits with, for comparison "
+                             "(default: %(default)s, the epsilon-clipping implementation; '' for none)")
+    parser.add_argument("--details", action="store_true", help="print one line per table")
+    args = parser.parse_args()
+    solvers = tuple(args.solver) if args.solver else ('trust-constr', 'L-BFGS-B')
+    tables = near_empty_tables(args.seed, args.n_simulated)
+    results = run(tables, args.beta, solvers, time_budget=args.time_budget)
+    if args.baseline:
+        results.update(run(tables, args.beta, solvers, time_budget=args.time_budget,
+                           computer=load_revision(args.baseline)(), label=f'@{args.baseline}'))
+    report(results, args.details)
@@ -0,0 +1,127 @@
+import os
+import pickle
+import sqlite3
+import hashlib
+import datetime
+import pandas as pd
+
+
+# the configuration a result is keyed by, besides the hash of its parsed file
+KEY_FIELDS = ('confidence_extract_methods', 'prompting', 'num_bins', 'discre_type', 'padCells', 'beta', 'p')
+# per-result columns kept next to the pickled row, so the store can be queried with SQL
+SUMMARY_FIELDS = ('dataset', 'file_path', 'n_trials', 'accuracy', 'da', 'meta_da', 'M_ratio', 'M_diff', 'logL',
+                  'success', 'time')
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    # sha256 hex digest of a file's content
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultsStore(object):
+    """
+    Append-only SQLite store of comp_meta_d results (the rows of run_grid).
+
+    A result is keyed by the sha256 of its parsed file together with the
+    confidence extraction method, prompting, num_bins, discre_type, padCells,
+    beta and p, so a moved or renamed file keeps its results and an edited
+    one gets new ones. run_grid(..., store=store) skips the tasks whose key
+    is already stored and adds each new result as soon as its task finishes,
+    so a sweep that stops halfway resumes where it left off. Failed tasks
+    are not stored and are run again.
+
+    The key does not include the fitting code: use a new store after
+    changing meta_d_prime.py. File hashes are remembered by (path, size,
+    mtime), so unchanged files are not read again.
+    """
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        # WAL keeps every committed result if the process is killed mid-write
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        key_columns = "file_hash TEXT, confidence_extract_methods TEXT, prompting TEXT, num_bins INTEGER, " \
+                      "discre_type TEXT, padCells INTEGER, beta REAL, p REAL"
+        summary_columns = "dataset TEXT, file_path TEXT, n_trials INTEGER, accuracy REAL, da REAL, meta_da REAL, " \
+                          "M_ratio REAL, M_diff REAL, logL REAL, success INTEGER, time REAL"
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS results ({key_columns}, {summary_columns}, created TEXT, row BLOB, "
+                f"PRIMARY KEY (file_hash, {', '.join(KEY_FIELDS)}))")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS file_hashes (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT)")
+
+    def file_hash(self, file_path):
+        # hash of a parsed file, or None if it does not exist
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        path = os.path.abspath(file_path)
+        known = self.connection.execute("SELECT size, mtime_ns, hash FROM file_hashes WHERE path = ?", (path,)).fetchone()
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+        digest = file_hash(file_path)
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                                    (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def key(self, task):
+        # (file hash, *KEY_FIELDS) of a task of expand_grid, or None if its
+        # parsed file does not exist
+        digest = self.file_hash(task['file_path'])
+        if digest is None:
+            return None
+        return (digest,) + tuple(task[name] for name in KEY_FIELDS)
+
+    def get(self, task):
+        # stored row of a task, or None. the task's own fields (e.g. dataset,
+        # file_path) replace the stored ones
+        key = self.key(task)
+        if key is None:
+            return None
+        where = ' AND '.join(f"{name} = ?" for name in ('file_hash',) + KEY_FIELDS)
+        found = self.connection.execute(f"SELECT row FROM results WHERE {where}", key).fetchone()
+        if found is None:
+            return None
+        row = pickle.loads(found[0])
+        row.update(task)
+        return row
+
+    def put(self, row):
+        # adds a result row of run_grid; rows with an error, and rows whose
+        # key is already stored, are left out. returns whether it was added
+        key = self.key(row)
+        if key is None or row.get('error') is not None:
+            return False
+        summary = tuple(row.get(name) for name in SUMMARY_FIELDS)
+        summary = tuple(bool(v) if name == 'success' else (float(v) if hasattr(v, 'dtype') else v)
+                        for name, v in zip(SUMMARY_FIELDS, summary))
+        values = key + summary + (datetime.datetime.now().isoformat(), pickle.dumps(row, protocol=pickle.HIGHEST_PROTOCOL))
+        with self.connection:
+            cursor = self.connection.execute(
+                f"INSERT OR IGNORE INTO results VALUES ({', '.join('?' * len(values))})", values)
+        return cursor.rowcount == 1
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def to_frame(self):
+        # the stored results without the pickled rows, as a pandas DataFrame
+        columns = ('file_hash',) + KEY_FIELDS + SUMMARY_FIELDS + ('created',)
+        return pd.read_sql_query(f"SELECT {', '.join(columns)} FROM results", self.connection)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
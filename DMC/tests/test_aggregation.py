@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from aggregation import sample_matrix, vote
+
+
+def test_frequency_winner_and_first_sample_tie():
+    answers, present = sample_matrix([['a', 'b', 'b'], ['x', 'y', 'y', 'x'], ['q', 'p']])
+    winners, agreement, mean_confidence = vote(answers, present=present)
+    # 'x' and 'y' tie on frequency; 'x' appears first
+    assert list(winners) == ['b', 'x', 'q']
+    np.testing.assert_allclose(agreement, [2/3, 0.5, 0.5])
+    assert np.all(np.isnan(mean_confidence))
+
+
+def test_confidence_ties_go_to_frequency_then_first_sample():
+    answers, present = sample_matrix([['a', 'b', 'b'], ['a', 'b'], ['a', 'b', 'c']])
+    confidences = np.zeros(answers.shape)
+    confidences[0, :3] = [0.6, 0.6, 0.6]    # equal means: 'b' is more frequent
+    confidences[1, :2] = [0.5, 0.5]         # equal means and counts: 'a' is first
+    confidences[2, :3] = [0.2, 0.3, 0.9]    # highest mean wins outright
+    winners, agreement, mean_confidence = vote(answers, confidences, present, rank_by='confidence')
+    assert list(winners) == ['b', 'a', 'c']
+    np.testing.assert_allclose(mean_confidence, [0.6, 0.5, 0.9])
+    np.testing.assert_allclose(agreement, [2/3, 0.5, 1/3])
+
+
+def test_frequency_beats_confidence_when_ranking_by_frequency():
+    answers = np.array([['a', 'b', 'b']], dtype=object)
+    confidences = np.array([[0.99, 0.1, 0.1]])
+    winners, _, mean_confidence = vote(answers, confidences)
+    assert winners[0] == 'b'
+    assert mean_confidence[0] == pytest.approx(0.1)
+
+
+def test_items_without_samples_and_equal_python_values():
+    answers, present = sample_matrix([[], [True, 1, 2]], min_width=3)
+    winners, agreement, _ = vote(answers, present=present)
+    # True == 1, as in a dict or Counter
+    assert winners[0] is None and np.isnan(agreement[0])
+    assert winners[1] == 1 and agreement[1] == pytest.approx(2/3)
+
+
+def test_bad_rank_by():
+    with pytest.raises(ValueError):
+        vote(np.array([['a']], dtype=object), rank_by='votes')
+    with pytest.raises(ValueError):
+        vote(np.array([['a']], dtype=object), rank_by='confidence')
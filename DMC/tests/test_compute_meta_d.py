@@ -0,0 +1,106 @@
+import json
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+compute_meta_d = pytest.importorskip('compute_meta_d')
+
+
+def write_parsed(path, n=200, seed=0):
+    # verb_confidence / vanilla lines whose confidence tracks correctness
+    rng = np.random.default_rng(seed)
+    with open(path, 'w') as f:
+        for _ in range(n):
+            label = int(rng.integers(2))
+            correct = rng.random() < 0.75
+            prob = float(np.clip(rng.normal(0.75 if correct else 0.55, 0.15), 0, 1))
+            f.write(json.dumps({'answer': label if correct else 1 - label, 'label': label, 'prob': prob}) + '\n')
+    return str(path)
+
+
+def test_aggregate_returns_copies(tmp_path):
+    path = write_parsed(tmp_path / 'parsed.jsonl')
+    first = compute_meta_d.aggregate(path, 'verb_confidence', 'vanilla')
+    first[0][:] = -1
+    first[2][:] = 0.0
+    first[5][0] = 10**6
+    again = compute_meta_d.aggregate(path, 'verb_confidence', 'vanilla')
+    assert not np.any(again[0] == -1) and not np.all(again[2] == 0.0)
+    assert again[5][0] != 10**6
+    assert again[0] is not first[0]
+
+
+def test_run_grid_sends_the_variants_of_a_file_to_one_worker(tmp_path, monkeypatch):
+    datasets = ['A', 'B']
+    for seed, dataset in enumerate(datasets):
+        (tmp_path / dataset).mkdir()
+        write_parsed(tmp_path / dataset / 'verb_confidence_vanilla.jsonl', seed=seed)
+    tasks = compute_meta_d.expand_grid(datasets, {'verb_confidence': ['vanilla']},
+                                       str(tmp_path / '{dataset}' / '{confidence_extract_methods}_{prompting}.jsonl'),
+                                       betas=(0.0, 0.25, 0.5))
+    groups = []
+    run_tasks = compute_meta_d._run_tasks
+    monkeypatch.setattr(compute_meta_d, '_run_tasks', lambda args: groups.append(args[0]) or run_tasks(args))
+    monkeypatch.setattr(compute_meta_d, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    results = compute_meta_d.run_grid(tasks, n_jobs=2, progress=False)
+
+    assert len(groups) == 2
+    assert sorted(len(group) for group in groups) == [3, 3]
+    for group in groups:
+        assert len({compute_meta_d._aggregation_key(task) for task in group}) == 1
+    # rows come back in the order of the tasks
+    assert list(results['dataset']) == [task['dataset'] for task in tasks]
+    assert list(results['beta']) == [task['beta'] for task in tasks]
+    assert results['error'].isna().all()
+
+
+def write_lines(path, lines):
+    with open(path, 'w') as f:
+        for line in lines:
+            f.write(json.dumps(line) + '\n')
+    return str(path)
+
+
+def test_load_parsed_masks_invalid_lines(tmp_path):
+    path = write_lines(tmp_path / 'vanilla.jsonl', [
+        {'answer': 'A', 'label': 'A', 'prob': 0.9},
+        {'answer': None, 'label': 'B', 'prob': 0.5},
+        {'answer': 'C', 'label': 'B', 'prob': 1.5},
+        {'answer': 'D', 'label': 'D', 'prob': None},
+        {'answer': 'B', 'label': 'B', 'prob': 0.0},
+    ])
+    answers, labels, probs, valid = compute_meta_d.load_parsed(path, 'verb_confidence', 'vanilla')
+    assert list(valid) == [True, False, False, False, True]
+    assert answers.dtype.kind == 'U' and list(answers[valid]) == ['A', 'B']
+    assert list(labels) == ['A', 'B', 'B', 'D', 'B']
+    assert probs.dtype == np.float64 and np.isnan(probs[3])
+    np.testing.assert_array_equal(probs[valid], [0.9, 0.0])
+
+    # an unknown method / prompting combination gives no valid lines
+    assert not compute_meta_d.load_parsed(path, 'verb_confidence', 'zero_shot')[3].any()
+
+
+def test_load_parsed_topk_takes_the_most_probable_answer(tmp_path):
+    path = write_lines(tmp_path / 'topk.jsonl', [
+        {'answers': ['A', 'B', 'C'], 'label': 'B', 'probs': [0.2, 0.7, 0.1]},
+        {'answers': ['A', 'B'], 'label': 'A', 'probs': [0.5, 0.5]},     # tie: the first one
+        {'answers': ['A', 'B'], 'label': 'A', 'probs': [0.0, 0.0]},     # no non-zero prob
+        {'answers': ['A', None], 'label': 'A', 'probs': [0.6, 0.4]},    # a missing answer
+        {'answers': ['A', 'B'], 'label': 'A', 'probs': [0.6, 1.4]},     # out of range
+    ])
+    answers, labels, probs, valid = compute_meta_d.load_parsed(path, 'verb_confidence', 'topk')
+    assert list(valid) == [True, True, False, False, False]
+    assert list(answers[valid]) == ['B', 'A']
+    np.testing.assert_array_equal(probs[valid], [0.7, 0.5])
+
+
+def test_load_parsed_consistency_votes(tmp_path):
+    path = write_lines(tmp_path / 'consistency.jsonl', [
+        {'answers': ['A', 'B', 'B', 'C'], 'label': 'B'},
+        {'answers': ['C', 'A', 'A', 'C'], 'label': 'A'},     # tie: the first sampled
+        {'answers': ['A', None], 'label': 'A'},
+    ])
+    answers, labels, probs, valid = compute_meta_d.load_parsed(path, 'consis_confidence', 'zero_shot')
+    assert list(valid) == [True, True, False]
+    assert list(answers[valid]) == ['B', 'C']
+    np.testing.assert_allclose(probs[valid], [0.5, 0.5])
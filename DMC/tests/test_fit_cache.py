@@ -0,0 +1,62 @@
+import io
+import contextlib
+import warnings
+from scipy.stats import norm
+from fit_cache import FitCache
+from meta_d_prime import Meta_d_prime
+
+nR_S1 = [26, 35, 33, 45, 14, 16, 16, 17]
+nR_S2 = [9, 10, 13, 12, 27, 36, 34, 28]
+
+
+class CountingComputer(Meta_d_prime):
+    # Meta_d_prime that counts the fits it actually runs
+    def __init__(self):
+        super().__init__()
+        self.fits = 0
+
+    def fit_meta_d_MLE(self, *args, **kwargs):
+        self.fits += 1
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return super().fit_meta_d_MLE(*args, **kwargs)
+
+
+def test_hit_and_miss(tmp_path):
+    computer = CountingComputer()
+    cache = FitCache(str(tmp_path))
+    first = cache.fit_meta_d_MLE(computer, nR_S1, nR_S2, 0.5, 0, solver='L-BFGS-B')
+    # p = 0 and p = 0.0 are the same fit
+    again = cache.fit_meta_d_MLE(computer, nR_S1, nR_S2, 0.5, 0.0, solver='L-BFGS-B')
+    assert computer.fits == 1 and again['meta_da'] == first['meta_da']
+    assert cache.stats()['hits_memory'] == 1 and cache.stats()['misses'] == 1
+    cache.fit_meta_d_MLE(computer, nR_S1, nR_S2, 0.6, 0, solver='L-BFGS-B')
+    assert computer.fits == 2
+
+    # a new cache on the same directory reads the fits from disk
+    from_disk = FitCache(str(tmp_path)).fit_meta_d_MLE(computer, nR_S1, nR_S2, 0.5, 0, solver='L-BFGS-B')
+    assert computer.fits == 2 and from_disk['meta_da'] == first['meta_da']
+
+    # changes to a returned fit never reach the cache
+    again['meta_da'] = -1.0
+    assert cache.fit_meta_d_MLE(computer, nR_S1, nR_S2, 0.5, 0, solver='L-BFGS-B')['meta_da'] == first['meta_da']
+
+
+def test_version_invalidates(tmp_path):
+    computer = CountingComputer()
+    FitCache(str(tmp_path), version='a').fit_meta_d_MLE(computer, nR_S1, nR_S2, 0.5, 0, solver='L-BFGS-B')
+    cache = FitCache(str(tmp_path), version='b')
+    assert cache.key(nR_S1, nR_S2, 0.5, 0) != FitCache(version='a').key(nR_S1, nR_S2, 0.5, 0)
+    cache.fit_meta_d_MLE(computer, nR_S1, nR_S2, 0.5, 0, solver='L-BFGS-B')
+    assert computer.fits == 2 and cache.stats()['misses'] == 1
+
+
+def test_lambdas_are_not_cached(tmp_path):
+    computer = CountingComputer()
+    cache = FitCache(str(tmp_path))
+    for _ in range(2):
+        cache.fit_meta_d_MLE(computer, nR_S1, nR_S2, 0.5, 0, fncdf=lambda x, loc=0, scale=1: norm.cdf(x, loc, scale), fninv=norm.ppf, solver='L-BFGS-B')
+    assert cache.key(nR_S1, nR_S2, 0.5, 0, fncdf=lambda x: norm.cdf(x)) is None
+    assert cache.key(nR_S1, nR_S2, 0.5, 0, callback=print) is None
+    assert computer.fits == 2
+    assert cache.stats()['uncacheable'] == 2 and cache.stats()['memory_entries'] == 0
@@ -0,0 +1,62 @@
+import io
+import pickle
+import contextlib
+import warnings
+import numpy as np
+import pytest
+from fit_result import MetaDFit
+from meta_d_prime import Meta_d_prime
+
+
+def fit_table():
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return Meta_d_prime().fit_meta_d_MLE([26, 35, 33, 45, 14, 16, 16, 17], [9, 10, 13, 12, 27, 36, 34, 28],
+                                             0.5, 0, solver='L-BFGS-B')
+
+
+def assert_same(a, b):
+    assert a.keys() == b.keys()
+    for key in a:
+        if isinstance(a[key], dict):
+            assert_same(a[key], b[key])
+        else:
+            np.testing.assert_array_equal(a[key], b[key])
+            assert type(a[key]) is type(b[key])
+
+
+def test_dict_round_trip():
+    fit = fit_table()
+    fit['sweep'] = {'beta': 0.5, 'p': 0}
+    d = fit.to_dict()
+    again = MetaDFit.from_dict(d)
+    assert_same(again.to_dict(), d)
+    assert again['sweep'] == {'beta': 0.5, 'p': 0}
+    assert again['success'] == fit['success'] and again['solver'] == 'L-BFGS-B'
+    assert isinstance(d['est_HR2_rS1'], list)
+    assert d['S1units']['meta_d1'] == fit['S1units']['meta_d1']
+
+
+def test_pickle_round_trip():
+    fit = fit_table()
+    again = pickle.loads(pickle.dumps(fit))
+    assert_same(again.to_dict(), fit.to_dict())
+    assert again.telemetry == fit.telemetry
+
+
+def test_nested_assignments_write_back():
+    fit = fit_table()
+    fit['S1units']['d1'] = 1.25
+    assert fit.d1 == 1.25 and fit['S1units']['d1'] == 1.25
+    fit['S1units']['t2c1_rS1'][0] = -2.0
+    assert fit.t2c1_rS1[0] == -2.0
+    fit['est_HR2_rS1'][0] = 0.5
+    assert fit.est_HR2_rS1[0] == 0.5 and fit['est_HR2_rS1'][0] == 0.5
+    assert fit.to_dict()['est_HR2_rS1'][0] == 0.5
+    with pytest.raises(TypeError):
+        fit['est_HR2_rS1'].append(0.5)
+    with pytest.raises(TypeError):
+        del fit['S1units']['d1']
+    with pytest.raises(KeyError):
+        fit['S1units']['d2'] = 1.0
+    assert type(fit.to_dict()['S1units']) is dict and type(fit.to_dict()['est_HR2_rS1']) is list
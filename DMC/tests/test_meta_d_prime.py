@@ -0,0 +1,160 @@
+import io
+import contextlib
+import warnings
+import numpy as np
+import pytest
+import meta_d_prime
+from meta_d_prime import Meta_d_prime, type1_family
+from regression_near_empty import near_empty_tables
+from benchmark_fits import benchmark_batch
+
+
+TABLES = {name: (nR_S1, nR_S2) for name, nR_S1, nR_S2 in near_empty_tables(seed=0, n_simulated=31)}
+
+
+def quiet_fit(method, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return method(*args, **kwargs)
+
+
+@pytest.mark.parametrize('name, beta', [('ordinary_padded', 0.0), ('ordinary_padded', 0.5),
+                                        ('all_high_confidence', 0.5), ('padded_near_perfect', 0.5),
+                                        ('simulated_9', 0.5), ('simulated_30', 0.5)])
+def test_trust_constr_matches_lbfgsb_loss(name, beta):
+    # trust-constr on its own, without the L-BFGS-B reference_check
+    nR_S1, nR_S2 = TABLES[name]
+    computer = Meta_d_prime()
+    trust = quiet_fit(computer.fit_meta_d_MLE, nR_S1, nR_S2, beta, 0, solver='trust-constr', time_budget=60)
+    lbfgsb = quiet_fit(computer.fit_meta_d_MLE, nR_S1, nR_S2, beta, 0, solver='L-BFGS-B')
+    assert 'reference_loss' not in trust['telemetry']
+    assert trust['success'] and lbfgsb['success']
+    assert trust['logL'] <= 1.05 * lbfgsb['logL'] + 1e-4
+
+
+def test_reference_check_restarts_from_lbfgsb():
+    # at beta = 0 trust-constr alone stops at a local optimum on this table
+    nR_S1, nR_S2 = TABLES['simulated_6']
+    computer = Meta_d_prime()
+    plain = quiet_fit(computer.fit_meta_d_MLE, nR_S1, nR_S2, 0, 0)
+    checked = quiet_fit(computer.fit_meta_d_MLE, nR_S1, nR_S2, 0, 0, reference_check=True)
+    lbfgsb = quiet_fit(computer.fit_meta_d_MLE, nR_S1, nR_S2, 0, 0, solver='L-BFGS-B')
+    assert plain['logL'] > 2 * lbfgsb['logL']
+    assert checked['success']
+    assert checked['telemetry']['reference_loss'] == pytest.approx(lbfgsb['logL'])
+    assert checked['logL'] <= 1.05 * lbfgsb['logL'] + 1e-4
+    assert checked['telemetry']['nit'] > plain['telemetry']['nit']
+
+
+@pytest.mark.parametrize('time_budget', [None, 30.0])
+def test_reference_check_runs_within_the_time_budget(monkeypatch, time_budget):
+    budgets = []
+
+    class RecordingMonitor(meta_d_prime._FitMonitor):
+        def __init__(self, maxiter=None, time_budget=None, callback=None):
+            budgets.append(time_budget)
+            super().__init__(maxiter, time_budget, callback)
+
+    monkeypatch.setattr(meta_d_prime, '_FitMonitor', RecordingMonitor)
+    nR_S1, nR_S2 = TABLES['simulated_6']
+    quiet_fit(Meta_d_prime().fit_meta_d_MLE, nR_S1, nR_S2, 0, 0, reference_check=True, time_budget=time_budget)
+    # the fit's own monitor, then the one of the L-BFGS-B reference fit,
+    # which only gets what is left of the budget
+    assert len(budgets) == 2 and budgets[0] == time_budget
+    if time_budget is None:
+        assert budgets[1] is None
+    else:
+        assert 0 < budgets[1] < time_budget
+
+
+def test_ordinary_table_criteria_stay_inside():
+    # the table of the trust-constr regression: criteria ran off to +-8 / +-16
+    nR_S1, nR_S2 = TABLES['ordinary_padded']
+    fit = quiet_fit(Meta_d_prime().fit_meta_d_MLE, nR_S1, nR_S2, 0, 0)
+    assert fit['success']
+    assert fit['logL'] < 2e-3
+    assert np.all(np.abs(fit['t2ca_rS1']) < 5) and np.all(np.abs(fit['t2ca_rS2']) < 5)
+
+
+def test_batch_matches_single_fits():
+    names = ['ordinary_padded', 'empty_middle', 'padded_extreme', 'simulated_0', 'simulated_9']
+    nR_S1 = np.array([TABLES[name][0] for name in names], dtype=float)
+    nR_S2 = np.array([TABLES[name][1] for name in names], dtype=float)
+    computer = Meta_d_prime()
+    batch = quiet_fit(computer.fit_meta_d_MLE_batch, nR_S1, nR_S2, 0.5, 0)
+    for i in range(len(names)):
+        single = quiet_fit(computer.fit_meta_d_MLE, list(nR_S1[i]), list(nR_S2[i]), 0.5, 0)
+        assert batch['success'][i] == single['success']
+        assert batch['meta_da'][i] == pytest.approx(single['meta_da'], abs=1e-9)
+        assert batch['logL'][i] == pytest.approx(single['logL'], rel=1e-9, abs=1e-12)
+        np.testing.assert_allclose(batch['t2ca_rS1'][i], single['t2ca_rS1'], atol=1e-9)
+        np.testing.assert_allclose(batch['t2ca_rS2'][i], single['t2ca_rS2'], atol=1e-9)
+
+
+def test_unequal_variance_gaussian_is_not_a_family_name():
+    with pytest.raises(ValueError):
+        type1_family('unequal_variance_gaussian')
+    assert type1_family('Gaussian') == type1_family('normal')
+
+
+@pytest.mark.parametrize('family', ['normal', 'logistic', 'student_t(5)'])
+def test_quick_estimate_uses_the_type1_family(family):
+    nR_S1, nR_S2 = [60, 45, 30, 20, 10, 8, 5, 2], [2, 5, 8, 10, 20, 30, 45, 60]
+    computer = Meta_d_prime()
+    quick = computer.quick_estimate(nR_S1, nR_S2, fncdf=family)
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        fit = computer.fit_meta_d_MLE(nR_S1, nR_S2, 0, 0, fncdf=family, solver='L-BFGS-B')
+    assert quick['da'] == pytest.approx(fit['da'])
+    assert abs(quick['meta_da'] - fit['meta_da']) < 0.05
+
+
+def test_quick_estimate_rejects_asymmetric_cdfs():
+    from scipy.stats import gumbel_r
+    with pytest.raises(ValueError):
+        Meta_d_prime().quick_estimate([60, 45, 30, 20, 10, 8, 5, 2], [2, 5, 8, 10, 20, 30, 45, 60],
+                                      fncdf=gumbel_r.cdf, fninv=gumbel_r.ppf)
+
+
+def baseline_trials2counts(stimID, response, rating, nRatings, padCells=1, padAmount=None):
+    # the trial-by-trial loop trials2counts replaced
+    code = {'yes': 1, 'no': 0}
+    trials = [(code.get(s, s), code.get(rp, rp), rt) for s, rp, rt in zip(stimID, response, rating)]
+    trials = [(s, rp, rt) for s, rp, rt in trials if (s == 0 or s == 1) and (rp == 0 or rp == 1) and 1 <= rt <= nRatings]
+    if padAmount is None:
+        padAmount = 1/(2*nRatings)
+    nR_S1, nR_S2 = [], []
+    for rp, ratings in ((0, range(nRatings, 0, -1)), (1, range(1, nRatings+1))):
+        for r in ratings:
+            nR_S1.append(sum(1 for t in trials if t == (0, rp, r)))
+            nR_S2.append(sum(1 for t in trials if t == (1, rp, r)))
+    if padCells:
+        nR_S1 = [n + padAmount for n in nR_S1]
+        nR_S2 = [n + padAmount for n in nR_S2]
+    return nR_S1, nR_S2
+
+
+@pytest.mark.parametrize('padCells, padAmount', [(0, None), (1, None), (1, 0.25)])
+def test_trials2counts_matches_the_baseline_loop(padCells, padAmount):
+    rng = np.random.default_rng(padCells)
+    n, nRatings = 500, 4
+    values = [0, 1, 'yes', 'no', 2, -1]
+    stimID = [values[i] for i in rng.choice(len(values), n, p=[0.4, 0.4, 0.05, 0.05, 0.05, 0.05])]
+    response = [values[i] for i in rng.choice(len(values), n, p=[0.4, 0.4, 0.05, 0.05, 0.05, 0.05])]
+    rating = list(rng.choice([0, 1, 2, 3, 4, 5, 2.5], n, p=[0.05, 0.2, 0.2, 0.2, 0.2, 0.05, 0.1]))
+    expected = baseline_trials2counts(stimID, response, rating, nRatings, padCells, padAmount)
+    counts = Meta_d_prime().trials2counts(list(stimID), list(response), list(rating), nRatings, padCells, padAmount)
+    np.testing.assert_allclose(counts, expected)
+    # typed arrays, as compute_meta_d passes them
+    numeric = [(s, rp, rt) for s, rp, rt in zip(stimID, response, rating) if s in (0, 1) and rp in (0, 1)]
+    s, rp, rt = (np.array(column) for column in zip(*numeric))
+    counts = Meta_d_prime().trials2counts(s, rp, rt, nRatings, padCells, padAmount)
+    np.testing.assert_allclose(counts, baseline_trials2counts(s, rp, rt, nRatings, padCells, padAmount))
+
+
+def test_batch_is_faster_than_single_fits():
+    r = benchmark_batch(n_tables=16, beta=0.5)
+    assert r['same_success'] and r['max_meta_da_diff'] < 1e-9
+    # the lockstep batch shares the fncdf calls of up to 64 fits; timing
+    # noise aside it should never lose to the loop
+    assert r['batch_s'] < 1.1 * r['loop_s']
@@ -0,0 +1,51 @@
+import io
+import contextlib
+import numpy as np
+from power_analysis import model_probabilities, uniform_rating_criteria, plan_trials, report
+
+CANDIDATES = [25, 100, 400, 1600]
+
+
+def test_model_probabilities():
+    t2c_rS1, t2c_rS2 = uniform_rating_criteria(1.5, 1.0, 0.2, 4)
+    assert np.all(np.diff(t2c_rS1) > 0) and np.all(np.diff(t2c_rS2) > 0)
+    pS1, pS2 = model_probabilities(1.5, 1.0, 0.2, t2c_rS1, t2c_rS2)
+    np.testing.assert_allclose([pS1.sum(), pS2.sum()], 1)
+    # with equally frequent stimuli, every rating is as frequent as any other
+    # among the "S1" and among the "S2" responses
+    both = pS1 + pS2
+    np.testing.assert_allclose(both[:4], both[0])
+    np.testing.assert_allclose(both[4:], both[4])
+    # an unbiased observer is mirror-symmetric
+    pS1, pS2 = model_probabilities(1.5, 1.0, 0.0, *uniform_rating_criteria(1.5, 1.0, 0.0, 4))
+    np.testing.assert_allclose(pS1, pS2[::-1])
+
+
+def test_plan_trials():
+    plan = plan_trials(1.5, 1.0, 0.4, candidates=CANDIDATES, n_reps=60, n_jobs=1)
+    evaluated = {r['n_trials']: r for r in plan['evaluated']}
+    assert list(evaluated) == sorted(evaluated) and set(CANDIDATES) <= set(evaluated)
+    widths = [evaluated[n]['width'] for n in CANDIDATES]
+    assert np.all(np.diff(widths) < 0)
+
+    # the plan meets the target, and refinement brackets it to within 10%
+    n = plan['n_trials']
+    assert 100 < n <= 400 and plan['total_trials'] == 2 * n
+    assert evaluated[n]['width'] <= 0.4 and evaluated[n]['failure_rate'] < 0.5
+    missed = [m for m, r in evaluated.items() if m < n and r['width'] > 0.4]
+    assert max(missed) >= 0.9 * n
+
+    # the simulated tables depend on the seed only, not on n_jobs
+    pooled = plan_trials(1.5, 1.0, 0.4, candidates=CANDIDATES, n_reps=60, n_jobs=2, refine=False)
+    assert [r['width'] for r in pooled['evaluated']] == widths
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        report(plan)
+    assert f"{n} trials per stimulus" in output.getvalue()
+
+
+def test_plan_trials_unreachable_target():
+    plan = plan_trials(1.5, 1.0, 0.01, candidates=[25], n_reps=20, n_jobs=1)
+    assert plan['n_trials'] is None and plan['total_trials'] is None
+    assert len(plan['evaluated']) == 1
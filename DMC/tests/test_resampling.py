@@ -0,0 +1,105 @@
+import io
+import contextlib
+import warnings
+import numpy as np
+from scipy.stats import norm
+from meta_d_prime import Meta_d_prime
+
+nR_S1 = [26, 35, 33, 45, 14, 16, 16, 17]
+nR_S2 = [9, 10, 13, 12, 27, 36, 34, 28]
+
+
+def quiet_fit(method, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return method(*args, **kwargs)
+
+
+def bootstrap(**kwargs):
+    kwargs = {'n_boot': 60, 'padAmount': 0.5, 'seed': 1, 'n_jobs': 1, 'solver': 'L-BFGS-B', **kwargs}
+    return quiet_fit(Meta_d_prime().fit_meta_d_MLE_bootstrap, nR_S1, nR_S2, 0.5, 0, **kwargs)
+
+
+def test_bootstrap_intervals():
+    fit = bootstrap()
+    boot = fit['bootstrap']
+    assert boot['n_done'] == boot['n_boot'] == 60 and not boot['timed_out']
+    assert boot['n_success'] == np.sum(boot['success']) >= 55
+    for name in ['meta_da', 'M_ratio', 'M_diff']:
+        values = boot[name][boot['success']]
+        lower, upper = boot['ci_percentile'][name]
+        assert lower < fit[name] < upper
+        assert (lower, upper) == tuple(np.quantile(values, [0.025, 0.975]))
+        lower, upper = boot['ci_bca'][name]
+        assert values.min() <= lower < upper <= values.max()
+
+    # the same seed draws the same replicates
+    again = bootstrap()['bootstrap']
+    np.testing.assert_array_equal(again['meta_da'], boot['meta_da'])
+    assert again['ci_bca'] == boot['ci_bca']
+    assert not np.array_equal(bootstrap(seed=2)['bootstrap']['meta_da'], boot['meta_da'])
+
+
+def test_bootstrap_stops_at_time_budget():
+    fit = bootstrap(n_boot=500, time_budget=4)
+    boot = fit['bootstrap']
+    assert boot['timed_out'] and 0 < boot['n_done'] < 500
+    assert np.all(np.isnan(boot['meta_da'][boot['n_done']:]))
+    assert boot['elapsed'] < 6
+    lower, upper = boot['ci_percentile']['meta_da']
+    assert lower < upper
+
+
+def test_bca_interval():
+    bca_interval = Meta_d_prime()._Meta_d_prime__bca_interval
+    theta = norm.ppf(np.linspace(0.0005, 0.9995, 1000))
+    symmetric_jack, weights = np.array([-1.0, 0.0, 1.0]), np.ones(3)
+
+    # no bias and no skew: the percentile interval
+    np.testing.assert_allclose(bca_interval(theta, 0.0, symmetric_jack, weights, 0.1),
+                               np.quantile(theta, [0.05, 0.95]))
+    # replicates mostly below the estimate move the interval up
+    lower, upper = bca_interval(theta, 0.5, symmetric_jack, weights, 0.1)
+    assert lower > np.quantile(theta, 0.05) and upper > np.quantile(theta, 0.95)
+    # a skewed jackknife moves it as well; a weight counts as repeated values
+    skewed = bca_interval(theta, 0.0, np.array([-1.0, -1.0, -1.0, 3.0]), np.ones(4), 0.1)
+    assert not np.allclose(skewed, np.quantile(theta, [0.05, 0.95]))
+    np.testing.assert_allclose(bca_interval(theta, 0.0, np.array([-1.0, 3.0]), np.array([3.0, 1.0]), 0.1), skewed)
+    # nothing to go on
+    assert np.all(np.isnan(bca_interval(np.array([]), 0.0, symmetric_jack, weights, 0.1)))
+    assert np.all(np.isnan(bca_interval(theta, 0.0, np.array([]), np.array([]), 0.1)))
+
+
+def test_jackknife_tables_are_the_leave_one_trial_out_tables():
+    counts_S1, counts_S2 = np.array([3, 0, 1, 2.5]), np.array([0, 2, 1, 4])
+    jack_S1, jack_S2, weights = Meta_d_prime()._Meta_d_prime__jackknife_tables(counts_S1, counts_S2)
+    # one table per trial, by brute force; the 0.5 left in a padded cell is no trial
+    trials = np.repeat(np.arange(8), np.floor(np.concatenate((counts_S1, counts_S2))).astype(int))
+    brute = {}
+    for i in range(len(trials)):
+        table = np.concatenate((counts_S1, counts_S2))
+        table[trials[i]] -= 1
+        brute[tuple(table)] = brute.get(tuple(table), 0) + 1
+    jack = {tuple(np.concatenate((t1, t2))): w for t1, t2, w in zip(jack_S1, jack_S2, weights)}
+    assert jack == brute and sum(weights) == len(trials) == 13
+
+
+def test_jackknife_se_and_bias():
+    fit = quiet_fit(Meta_d_prime().fit_meta_d_MLE_jackknife, nR_S1, nR_S2, 0.5, 0, padAmount=0.5, n_jobs=1)
+    jack = fit['jackknife']
+    N = sum(nR_S1) + sum(nR_S2)
+    assert jack['n_fits'] == jack['n_success'] == 16 and jack['n_trials'] == N
+    for name in ['meta_da', 'M_ratio', 'M_diff']:
+        # the per-trial formulas, with every table repeated for each of its trials
+        theta = np.repeat(jack[name], jack['weights'].astype(int))
+        assert len(theta) == N
+        bias = (N - 1) * (theta.mean() - fit[name])
+        se = np.sqrt((N - 1) / N * np.sum((theta - theta.mean())**2))
+        np.testing.assert_allclose(jack['bias'][name], bias)
+        np.testing.assert_allclose(jack['se'][name], se)
+        assert jack['bias_corrected'][name] == fit[name] - jack['bias'][name]
+        assert 0 < se < 1
+
+    # the jackknife se is close to the spread of bootstrap replicates
+    boot = bootstrap(n_boot=100)['bootstrap']
+    assert 0.5 < jack['se']['meta_da'] / np.nanstd(boot['meta_da'][boot['success']]) < 2
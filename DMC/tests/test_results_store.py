@@ -0,0 +1,70 @@
+import os
+import numpy as np
+import pytest
+from results_store import ResultsStore
+
+
+def make_task(file_path, beta):
+    return {'dataset': 'A', 'confidence_extract_methods': 'verb_confidence', 'prompting': 'vanilla', 'beta': beta,
+            'p': 0, 'num_bins': 4, 'discre_type': 'equal_width', 'padCells': 1, 'file_path': file_path}
+
+
+def make_row(task, meta_da=1.0, error=None):
+    row = dict(task)
+    row.update({'n_trials': 10, 'accuracy': 0.8, 'da': np.float64(1.5), 'meta_da': np.float64(meta_da),
+                'M_ratio': meta_da / 1.5, 'M_diff': meta_da - 1.5, 'logL': 0.01, 'success': np.bool_(True),
+                'nR_S1': [1] * 8, 'nR_S2': [1] * 8, 'fit': None, 'error': error, 'time': 0.1})
+    return row
+
+
+@pytest.fixture
+def parsed_file(tmp_path):
+    path = tmp_path / 'parsed.jsonl'
+    path.write_text('{"answer": 1, "label": 1, "prob": 0.9}\n')
+    return str(path)
+
+
+def test_resume_after_reopening(tmp_path, parsed_file):
+    db = str(tmp_path / 'store' / 'results.db')
+    with ResultsStore(db) as store:
+        assert store.put(make_row(make_task(parsed_file, 0.0), meta_da=1.2))
+        # a stored key is not added again
+        assert not store.put(make_row(make_task(parsed_file, 0.0), meta_da=9.9))
+        # failed tasks are not stored, so they run again
+        assert not store.put(make_row(make_task(parsed_file, 0.5), error='ValueError: x'))
+    with ResultsStore(db) as store:
+        assert len(store) == 1
+        row = store.get(make_task(parsed_file, 0.0))
+        assert row['meta_da'] == 1.2
+        assert store.get(make_task(parsed_file, 0.5)) is None
+        assert list(store.to_frame()['meta_da']) == [1.2]
+
+
+def test_moved_file_keeps_results_and_edited_file_does_not(tmp_path, parsed_file):
+    with ResultsStore(str(tmp_path / 'results.db')) as store:
+        store.put(make_row(make_task(parsed_file, 0.0)))
+        moved = str(tmp_path / 'moved.jsonl')
+        os.rename(parsed_file, moved)
+        row = store.get(make_task(moved, 0.0))
+        assert row is not None and row['file_path'] == moved
+        with open(moved, 'a') as f:
+            f.write('{"answer": 0, "label": 1, "prob": 0.4}\n')
+        os.utime(moved, ns=(0, 0))
+        assert store.get(make_task(moved, 0.0)) is None
+
+
+def test_run_grid_skips_stored_tasks(tmp_path, parsed_file):
+    compute_meta_d = pytest.importorskip('compute_meta_d')
+    tasks = [make_task(parsed_file, 0.0), make_task(parsed_file, 0.5)]
+    with ResultsStore(str(tmp_path / 'results.db')) as store:
+        store.put(make_row(tasks[0], meta_da=1.2))
+        ran = []
+        original = compute_meta_d._run_task
+        compute_meta_d._run_task = lambda args: ran.append(args[0]['beta']) or make_row(args[0], meta_da=0.7)
+        try:
+            results = compute_meta_d.run_grid(tasks, n_jobs=1, progress=False, store=store)
+        finally:
+            compute_meta_d._run_task = original
+        assert ran == [0.5]
+        assert list(results['meta_da']) == [1.2, 0.7]
+        assert len(store) == 2